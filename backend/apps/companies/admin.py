@@ -22,6 +22,9 @@ class CompanyAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_counts()
 
 
 @admin.register(Contact)
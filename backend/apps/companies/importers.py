@@ -0,0 +1,195 @@
+import csv
+import time
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from apps.core.signals import bulk_saved
+
+from .models import Company, Contact
+from .serializers import CompanyImportSerializer, ContactImportSerializer
+
+
+def plain_errors(detail):
+    """ValidationError.detail with ErrorDetail instances turned into plain strings"""
+    if isinstance(detail, dict):
+        return {key: plain_errors(value) for key, value in detail.items()}
+    if isinstance(detail, list):
+        return [plain_errors(value) for value in detail]
+    return str(detail)
+
+
+class ImportReport:
+    """Counters of an import run, rejected rows are kept up to max_rejected"""
+    max_rejected = 1000
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.imported = 0
+        self.rejected_count = 0
+        self.rejected = []
+
+    def reject(self, line, errors):
+        self.rejected_count += 1
+        if len(self.rejected) < self.max_rejected:
+            self.rejected.append({'line': line, 'errors': errors})
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected_count': self.rejected_count,
+            'rejected': self.rejected,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class CSVImporter:
+    """
+    Stream a CSV file and upsert its rows in batches.
+
+    Each batch is validated with ``serializer_class`` and upserted with
+    ``bulk_create(update_conflicts=True)`` on ``unique_field``, one per set
+    of filled-in columns: only the non-empty cells of a row are updated on
+    an existing row, a blank cell keeps the stored value (new rows get the
+    model default). Invalid rows (and earlier duplicates of a key within a
+    batch) are rejected and reported with their line number.
+    """
+    model = None
+    serializer_class = None
+    unique_field = None
+    required_columns = []
+
+    def __init__(self, batch_size=1000, on_reject=None):
+        self.batch_size = batch_size
+        self.on_reject = on_reject
+
+    def get_serializer_context(self):
+        return {}
+
+    def get_update_fields(self, columns):
+        fields = [
+            field for field in self.serializer_class.Meta.fields
+            if field in columns and field != self.unique_field
+        ]
+        return fields + ['updated_at']
+
+    def build_instance(self, data):
+        return self.model(**data)
+
+    def reject(self, report, line, row, errors):
+        report.reject(line, errors)
+        if self.on_reject:
+            self.on_reject(line, row, errors)
+
+    def run(self, file, delimiter=','):
+        """Import a text file object, return an ImportReport"""
+        report = ImportReport()
+        reader = csv.DictReader(file, delimiter=delimiter)
+        columns = {column.strip() for column in reader.fieldnames or []}
+        missing = {self.unique_field, *self.required_columns} - columns
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(sorted(missing))}")
+
+        context = self.get_serializer_context()
+        # Line 1 is the header
+        line = 1
+        while True:
+            rows = list(islice(reader, self.batch_size))
+            if not rows:
+                break
+            lines = range(line + 1, line + 1 + len(rows))
+            line += len(rows)
+            report.rows += len(rows)
+            self.import_batch(report, rows, lines, context)
+        return report
+
+    def clean_row(self, row):
+        # Empty cells are left out: model default on insert, kept on update
+        return {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+
+    def import_batch(self, report, rows, lines, context):
+        # One serializer validates the whole batch, as ListSerializer does,
+        # but valid rows are kept when others fail
+        serializer = self.serializer_class(context=context)
+        valid = {}
+        for line, row in zip(lines, rows):
+            cleaned = self.clean_row(row)
+            try:
+                data = serializer.run_validation(cleaned)
+            except serializers.ValidationError as exc:
+                self.reject(report, line, row, plain_errors(exc.detail))
+                continue
+            # Keep the last occurrence of each key, ON CONFLICT cannot update a row twice
+            key = data[self.unique_field]
+            if key in valid:
+                previous_line, previous_row, _, _ = valid.pop(key)
+                self.reject(report, previous_line, previous_row, {
+                    self.unique_field: [f'Duplicate of line {line}, which was imported instead'],
+                })
+            valid[key] = (line, row, data, frozenset(cleaned))
+
+        # ON CONFLICT updates the same columns for every row of a statement:
+        # one per set of filled-in columns, usually a single one
+        groups = {}
+        for _, _, data, columns in valid.values():
+            groups.setdefault(columns, []).append(self.build_instance(data))
+        if not groups:
+            return
+        imported = []
+        with transaction.atomic():
+            for columns, instances in groups.items():
+                imported += self.model.objects.bulk_create(
+                    instances,
+                    update_conflicts=True,
+                    unique_fields=[self.unique_field],
+                    update_fields=self.get_update_fields(columns),
+                )
+            bulk_saved.send(sender=self.model, instances=imported, created=False)
+        report.imported += len(imported)
+
+
+class CompanyImporter(CSVImporter):
+    model = Company
+    serializer_class = CompanyImportSerializer
+    unique_field = 'legal_id'
+
+
+class ContactImporter(CSVImporter):
+    """Contacts reference their company by legal_id (``company_legal_id`` column)"""
+    model = Contact
+    serializer_class = ContactImportSerializer
+    unique_field = 'email'
+    required_columns = ['company_legal_id']
+
+    def get_serializer_context(self):
+        # legal_id -> pk of every company, resolved in memory instead of once per row
+        return {'company_ids': dict(Company.objects.values_list('legal_id', 'pk').iterator(chunk_size=10000))}
+
+    def get_update_fields(self, columns):
+        fields = super().get_update_fields(columns)
+        if 'company_legal_id' in fields:
+            fields[fields.index('company_legal_id')] = 'company'
+        return fields
+
+    def build_instance(self, data):
+        data = dict(data)
+        data['company_id'] = data.pop('company_legal_id')
+        return Contact(**data)
+
+
+IMPORTERS = {
+    'companies': CompanyImporter,
+    'contacts': ContactImporter,
+}
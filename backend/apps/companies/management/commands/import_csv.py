@@ -0,0 +1,58 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.companies.importers import IMPORTERS
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert companies (by legal_id) or contacts (by email, company given by '
+        'company_legal_id) from a CSV file, in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='CSV file with a header row')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument(
+            '--rejects', metavar='PATH',
+            help='Write the rejected rows to this CSV file, with their line number and errors',
+        )
+
+    def handle(self, *args, **options):
+        rejects_file = None
+        on_reject = None
+        if options['rejects']:
+            rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8')
+            writer = csv.writer(rejects_file)
+            writer.writerow(['line', 'errors', 'row'])
+
+            def write_reject(line, row, errors):
+                writer.writerow([line, json.dumps(errors), json.dumps(row)])
+
+            on_reject = write_reject
+
+        importer = IMPORTERS[options['kind']](batch_size=options['batch_size'], on_reject=on_reject)
+        try:
+            with open(options['path'], newline='', encoding=options['encoding']) as file:
+                report = importer.run(file, delimiter=options['delimiter'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        for rejected in report.rejected[:20]:
+            self.stdout.write(self.style.WARNING(f"Line {rejected['line']}: {rejected['errors']}"))
+        if report.rejected_count > 20:
+            self.stdout.write(self.style.WARNING(f'... and {report.rejected_count - 20} more rejected rows'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} of {report.rows} {options['kind']} rows "
+            f'in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s), '
+            f'{report.rejected_count} rejected'
+        ))
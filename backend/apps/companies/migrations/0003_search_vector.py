@@ -0,0 +1,75 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from apps.core.search import search_vector_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0002_list_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="company",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="contact",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="company",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="company_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="company",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="company_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="contact_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["last_name"],
+                name="contact_last_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        search_vector_trigger(
+            "companies_company",
+            [("name", "A"), ("legal_id", "A"), ("sector", "B"), ("notes", "C")],
+        ),
+        search_vector_trigger(
+            "companies_contact",
+            [
+                ("first_name", "A"),
+                ("last_name", "A"),
+                ("email", "A"),
+                ("role", "B"),
+                ("notes", "C"),
+            ],
+        ),
+    ]
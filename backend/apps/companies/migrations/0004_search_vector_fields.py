@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from apps.core.search import search_vector_trigger
+
+COMPANY_COLUMNS = [("name", "A"), ("legal_id", "A"), ("sector", "B")]
+CONTACT_COLUMNS = [("first_name", "A"), ("last_name", "A"), ("email", "A")]
+
+# Columns of 0003_search_vector, restored when migrating backwards
+OLD_COMPANY_COLUMNS = [*COMPANY_COLUMNS, ("notes", "C")]
+OLD_CONTACT_COLUMNS = [*CONTACT_COLUMNS, ("role", "B"), ("notes", "C")]
+
+
+def rebuild(table, columns, old_columns):
+    """Trigger over ``columns`` only, back to ``old_columns`` in reverse"""
+    return migrations.RunSQL(
+        search_vector_trigger(table, columns).sql,
+        search_vector_trigger(table, old_columns).sql,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    The vectors only cover the fields the views search (SEARCH_VECTOR_FIELDS),
+    so that a search never matches on notes or roles it does not declare.
+    """
+
+    dependencies = [
+        ("companies", "0003_search_vector"),
+    ]
+
+    operations = [
+        rebuild("companies_company", COMPANY_COLUMNS, OLD_COMPANY_COLUMNS),
+        rebuild("companies_contact", CONTACT_COLUMNS, OLD_CONTACT_COLUMNS),
+    ]
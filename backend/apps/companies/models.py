@@ -1,6 +1,22 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, IntegerField, Value, When
 from django.core.validators import RegexValidator, URLValidator
 
+from apps.core.expressions import related_count
+
+legal_id_validator = RegexValidator(r'^[A-Za-z0-9]+$', 'Legal ID must be alphanumeric')
+
+
+class CompanyQuerySet(models.QuerySet):
+    def with_counts(self):
+        """Annotate contacts_count and deals_count in the same query"""
+        return self.annotate(
+            contacts_count=related_count(self.model, 'contacts'),
+            deals_count=related_count(self.model, 'deals'),
+        )
+
 
 class Company(models.Model):
     name = models.CharField(max_length=255)
@@ -8,7 +24,7 @@ class Company(models.Model):
         max_length=50, 
         unique=True,
         help_text="SIREN number or similar legal identifier",
-        validators=[RegexValidator(r'^[A-Za-z0-9]+$', 'Legal ID must be alphanumeric')]
+        validators=[legal_id_validator]
     )
     country = models.CharField(max_length=100)
     website = models.URLField(blank=True, validators=[URLValidator()])
@@ -25,23 +41,64 @@ class Company(models.Model):
         default='medium'
     )
     notes = models.TextField(blank=True)
+    # Maintained by a database trigger over SEARCH_VECTOR_FIELDS (see
+    # migration 0004_search_vector_fields), which FullTextSearchFilter relies on
+    SEARCH_VECTOR_FIELDS = ['name', 'legal_id', 'sector']
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CompanyQuerySet.as_manager()
+    
     class Meta:
         verbose_name_plural = 'companies'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='company_name_idx'),
+            models.Index(fields=['sector', 'country'], name='company_sector_country_idx'),
+            models.Index(fields=['size', 'name'], name='company_size_name_idx'),
+            models.Index(fields=['-created_at'], name='company_created_idx'),
+            GinIndex(fields=['search_vector'], name='company_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='company_name_trgm_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
     @property
     def contacts_count(self):
+        """Annotated value when loaded through with_counts(), COUNT query otherwise"""
+        if '_contacts_count' in self.__dict__:
+            return self._contacts_count
         return self.contacts.count()
     
+    @contacts_count.setter
+    def contacts_count(self, value):
+        self._contacts_count = value
+    
     @property
     def deals_count(self):
+        """Annotated value when loaded through with_counts(), COUNT query otherwise"""
+        if '_deals_count' in self.__dict__:
+            return self._deals_count
         return self.deals.count()
+    
+    @deals_count.setter
+    def deals_count(self, value):
+        self._deals_count = value
+
+
+class ContactQuerySet(models.QuerySet):
+    SENIORITY_ORDER = ['c_level', 'vp', 'director', 'senior', 'mid', 'junior']
+    
+    def by_seniority(self):
+        """Most senior contacts first, then alphabetical"""
+        seniority_rank = Case(
+            *[When(seniority=value, then=Value(rank)) for rank, value in enumerate(self.SENIORITY_ORDER)],
+            default=Value(len(self.SENIORITY_ORDER)),
+            output_field=IntegerField(),
+        )
+        return self.order_by(seniority_rank, 'last_name', 'first_name', 'pk')
 
 
 class Contact(models.Model):
@@ -65,11 +122,24 @@ class Contact(models.Model):
     )
     linkedin_url = models.URLField(blank=True)
     notes = models.TextField(blank=True)
+    # Maintained by a database trigger over SEARCH_VECTOR_FIELDS (see
+    # migration 0004_search_vector_fields), which FullTextSearchFilter relies on
+    SEARCH_VECTOR_FIELDS = ['first_name', 'last_name', 'email']
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ContactQuerySet.as_manager()
+    
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='contact_name_idx'),
+            models.Index(fields=['company', 'last_name', 'first_name'], name='contact_company_name_idx'),
+            models.Index(fields=['seniority', 'last_name', 'first_name'], name='contact_seniority_name_idx'),
+            GinIndex(fields=['search_vector'], name='contact_search_idx'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='contact_last_name_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.company.name})"
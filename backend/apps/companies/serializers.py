@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from .models import Company, Contact
+from .models import Company, Contact, legal_id_validator
+from apps.core.bulk import BulkPrimaryKeyRelatedField
 
 
 class ContactSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     full_name = serializers.ReadOnlyField()
     company_name = serializers.CharField(source='company.name', read_only=True)
     
@@ -36,9 +38,49 @@ class CompanySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class CompanyListSerializer(CompanySerializer):
+    """
+    List representation: only the top contacts prefetched by the viewset
+    (see CompanyViewSet.list_contacts_limit), contacts_count keeps the total.
+    """
+    contacts = ContactSummarySerializer(source='top_contacts', many=True, read_only=True)
+    
+    class Meta(CompanySerializer.Meta):
+        pass
+
+
 class CompanySummarySerializer(serializers.ModelSerializer):
     """Lightweight company serializer for nested representations"""
     
     class Meta:
         model = Company
-        fields = ['id', 'name', 'sector', 'country']
\ No newline at end of file
+        fields = ['id', 'name', 'sector', 'country']
+
+
+class CompanyImportSerializer(serializers.ModelSerializer):
+    """CSV import row, legal_id is the upsert key so it must not be unique-validated"""
+    
+    class Meta:
+        model = Company
+        fields = ['legal_id', 'name', 'country', 'website', 'sector', 'size', 'notes']
+        extra_kwargs = {'legal_id': {'validators': [legal_id_validator]}}
+
+
+class ContactImportSerializer(serializers.ModelSerializer):
+    """
+    CSV import row, email is the upsert key and the company is given by
+    legal_id, resolved through the ``company_ids`` map of the context.
+    """
+    company_legal_id = serializers.CharField(write_only=True)
+    
+    class Meta:
+        model = Contact
+        fields = ['email', 'company_legal_id', 'first_name', 'last_name', 'phone', 'role',
+                 'seniority', 'linkedin_url', 'notes']
+        extra_kwargs = {'email': {'validators': []}}
+    
+    def validate_company_legal_id(self, value):
+        company_id = self.context['company_ids'].get(value)
+        if company_id is None:
+            raise serializers.ValidationError(f'Unknown company legal_id "{value}"')
+        return company_id
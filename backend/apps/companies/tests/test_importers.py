@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.test import TestCase
+
+from apps.companies.importers import CompanyImporter
+from apps.companies.models import Company
+
+
+class CompanyImporterTests(TestCase):
+    def run_import(self, text):
+        return CompanyImporter().run(StringIO(text))
+
+    def test_blank_cells_keep_the_stored_values(self):
+        Company.objects.create(
+            legal_id='AC001', name='Acme', country='France', sector='Industry', size='large', notes='Family owned',
+        )
+        report = self.run_import(
+            'legal_id,name,country,sector,size,notes\n'
+            'AC001,Acme Group,France,Industry,,\n'
+            'NW001,Newco,Spain,Retail,,\n'
+        )
+        self.assertEqual((report.imported, report.rejected_count), (2, 0))
+
+        existing = Company.objects.get(legal_id='AC001')
+        self.assertEqual(existing.name, 'Acme Group')
+        self.assertEqual(existing.size, 'large')
+        self.assertEqual(existing.notes, 'Family owned')
+        created = Company.objects.get(legal_id='NW001')
+        self.assertEqual(created.size, 'medium')
+        self.assertEqual(created.notes, '')
+
+    def test_filled_cells_are_updated(self):
+        Company.objects.create(legal_id='AC001', name='Acme', country='France', sector='Industry', size='large')
+        self.run_import(
+            'legal_id,name,country,sector,size,notes\n'
+            'AC001,Acme,France,Industry,small,Listed\n'
+        )
+        company = Company.objects.get(legal_id='AC001')
+        self.assertEqual((company.size, company.notes), ('small', 'Listed'))
@@ -1,29 +1,108 @@
-from rest_framework import viewsets, filters
+import csv
+import io
+
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from django.db.models import Prefetch
 
+from .importers import CompanyImporter, ContactImporter
 from .models import Company, Contact
-from .serializers import CompanySerializer, ContactSerializer
+from .serializers import CompanySerializer, CompanyListSerializer, ContactSerializer
+from apps.core.bulk import BulkModelMixin
+from apps.core.cache import cache_response
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.export import ExportMixin
+from apps.core.filters import FullTextSearchFilter
 from apps.users.permissions import IsAdminOrAssociateOrReadOnly
 
 
-class CompanyViewSet(viewsets.ModelViewSet):
-    queryset = Company.objects.all()
+def run_csv_import(request, importer_class):
+    """Run an importer on the uploaded ``file``, return the report"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    importer = importer_class()
+    try:
+        report = importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+    except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report.as_dict())
+
+
+class CompanyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Company.objects.with_counts().defer('search_vector')
+    etag_dependencies = [Contact, 'deals.deal']
     serializer_class = CompanySerializer
     permission_classes = [IsAdminOrAssociateOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['country', 'sector', 'size']
     search_fields = ['name', 'legal_id', 'sector']
+    search_trigram_fields = ['name']
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['name']
+    
+    # Number of contacts nested per company in list responses,
+    # overridable with ?contacts_limit= up to max_list_contacts_limit
+    list_contacts_limit = 5
+    max_list_contacts_limit = 50
+    summary_contact_fields = ['id', 'company_id', 'first_name', 'last_name', 'email', 'role']
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CompanyListSerializer
+        return CompanySerializer
+    
+    def get_contacts_limit(self):
+        try:
+            limit = int(self.request.query_params.get('contacts_limit', self.list_contacts_limit))
+        except ValueError:
+            limit = self.list_contacts_limit
+        return max(0, min(limit, self.max_list_contacts_limit))
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        contacts = Contact.objects.only(*self.summary_contact_fields)
+        
+        if self.action == 'list':
+            # Sliced prefetch: a single ROW_NUMBER() window query for the whole page
+            limit = self.get_contacts_limit()
+            return queryset.prefetch_related(
+                Prefetch('contacts', queryset=contacts.by_seniority()[:limit], to_attr='top_contacts')
+            )
+        return queryset.prefetch_related(Prefetch('contacts', queryset=contacts))
+    
+    @cache_response(Company, Contact, 'deals.deal', per_role=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """Upsert companies by legal_id from an uploaded CSV file"""
+        return run_csv_import(request, CompanyImporter)
 
 
-class ContactViewSet(viewsets.ModelViewSet):
-    queryset = Contact.objects.select_related('company').all()
+class ContactViewSet(ConditionalGetMixin, BulkModelMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Contact.objects.select_related('company').defer('search_vector', 'company__search_vector')
+    etag_dependencies = [Company]
     serializer_class = ContactSerializer
     permission_classes = [IsAdminOrAssociateOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['company', 'seniority']
     search_fields = ['first_name', 'last_name', 'email', 'company__name']
+    search_trigram_fields = ['last_name']
     ordering_fields = ['first_name', 'last_name', 'created_at', 'updated_at']
-    ordering = ['last_name', 'first_name']
\ No newline at end of file
+    ordering = ['last_name', 'first_name']
+    export_fields = [
+        'id', 'first_name', 'last_name', 'email', 'phone', 'role', 'seniority',
+        'company_id', 'company__name', 'linkedin_url', 'created_at', 'updated_at',
+    ]
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """Upsert contacts by email from an uploaded CSV file (company given by company_legal_id)"""
+        return run_csv_import(request, ContactImporter)
@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.urls import path
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+
+class AsyncActionsMixin:
+    """
+    Helpers for the ``async def a<action>`` methods of a viewset, served by
+    AsyncActionView. Anything that may query the database must either use
+    the async ORM (``acount()``, ``async for``, ...) or go through
+    sync_to_async, including building filtered querysets: FilterSet
+    validation looks up the related objects of the filter values.
+    """
+
+    async def apaginate_queryset(self, queryset):
+        """paginate_queryset with the async ORM (PageNumberPagination only)"""
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        assert isinstance(paginator, PageNumberPagination), 'Only PageNumberPagination is supported'
+        page_size = paginator.get_page_size(self.request)
+        if not page_size:
+            return None
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached_property: set it so that it is not computed synchronously
+        django_paginator.count = await queryset.acount()
+        page_number = paginator.get_page_number(self.request, django_paginator)
+        if page_number in paginator.last_page_strings:
+            page_number = django_paginator.num_pages
+        try:
+            number = django_paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+        paginator.page = django_paginator._get_page(objects, number, django_paginator)
+        paginator.request = self.request
+        if paginator.template is not None and django_paginator.num_pages > 1:
+            paginator.display_page_controls = True
+        return list(paginator.page)
+
+
+class AsyncActionView(View):
+    """
+    Native async Django view serving a read-only viewset action through the
+    viewset's ``a<action>`` coroutine.
+
+    DRF request processing (authentication, permissions, throttling,
+    content negotiation) and exception handling are sync: they run in a
+    worker thread, the action itself runs on the event loop. Under ASGI a
+    request waiting on the database or on a slow client then holds no
+    worker thread.
+    """
+    viewset_class = None
+    action = None
+
+    def get_viewset(self):
+        handler = getattr(self.viewset_class, self.action)
+        # Options of @action(...) (permission_classes, ...), as the router passes them
+        initkwargs = {'basename': None, 'detail': False, **getattr(handler, 'kwargs', {})}
+        viewset = self.viewset_class(**initkwargs)
+        viewset.action_map = {'get': self.action}
+        return viewset
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.get_viewset()
+        viewset.args = args
+        viewset.kwargs = kwargs
+        request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = request
+        viewset.headers = viewset.default_response_headers
+
+        try:
+            await sync_to_async(viewset.initial)(request, *args, **kwargs)
+            response = await getattr(viewset, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = await sync_to_async(viewset.handle_exception)(exc)
+        return viewset.finalize_response(request, response, *args, **kwargs)
+
+
+def async_action_path(route, viewset_class, action, name=None):
+    """
+    URL pattern serving ``viewset_class.a<action>`` at route. Give it the
+    name of the router's pattern it shadows (metrics are keyed by URL name).
+    """
+    return path(route, AsyncActionView.as_view(viewset_class=viewset_class, action=action), name=name)
@@ -0,0 +1,239 @@
+from django.db import IntegrityError, models, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .signals import bulk_saved
+
+PRELOADED_CONTEXT_KEY = 'bulk_preloaded'
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField resolving pks from the objects preloaded by
+    BulkModelMixin (one query per field for the whole batch) instead of
+    one query per item. Behaves as usual outside bulk requests.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get(PRELOADED_CONTEXT_KEY, {}).get(self.field_name)
+        if preloaded is not None and not self.pk_field:
+            obj = preloaded.get(str(data))
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+
+class BulkModelMixin:
+    """
+    Batch create / update / delete on ``<prefix>/bulk/``:
+
+    - POST: a list of objects to create
+    - PATCH: a list of partial objects, each with its ``id``
+    - DELETE: ``{"ids": [...]}``
+
+    The whole batch is validated first and written in one transaction with
+    bulk_create / bulk_update; if any item is invalid nothing is written and
+    the response lists the errors with the index of each failing item.
+    Items are validated one by one against the database, so unique values
+    are also checked across the batch (two new contacts with the same
+    email); a write still rejected by a constraint is answered with 409.
+    bulk_create / bulk_update send no post_save, so the ``bulk_saved``
+    signal is sent instead (search index, cache versions, ...).
+    """
+    bulk_max_items = 1000
+
+    def get_bulk_create_defaults(self):
+        """Attributes set on every created instance, like perform_create's save(**kwargs)"""
+        return {}
+
+    def bulk_error(self, message):
+        return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+
+    def bulk_errors(self, errors):
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    def bulk_conflict(self):
+        return Response(
+            {'error': 'The batch conflicts with existing objects, nothing was saved'},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    def get_unique_field_sets(self, model):
+        """Field name tuples whose values must be unique: unique fields, unique_together, UniqueConstraints"""
+        field_sets = [
+            (field.name,) for field in model._meta.concrete_fields if field.unique and not field.primary_key
+        ]
+        field_sets += [tuple(fields) for fields in model._meta.unique_together]
+        field_sets += [
+            tuple(constraint.fields) for constraint in model._meta.constraints
+            if isinstance(constraint, models.UniqueConstraint) and constraint.fields and constraint.condition is None
+        ]
+        return field_sets
+
+    def batch_unique_errors(self, instances, ids=None):
+        """Errors of the items repeating the unique values of an earlier item of the batch"""
+        errors = {}
+        for field_set in self.get_unique_field_sets(type(instances[0])):
+            attnames = [instances[0]._meta.get_field(name).attname for name in field_set]
+            seen = {}
+            for index, instance in enumerate(instances):
+                value = tuple(getattr(instance, attname) for attname in attnames)
+                # NULLs never conflict
+                if any(part is None for part in value):
+                    continue
+                if value in seen:
+                    key = field_set[0] if len(field_set) == 1 else 'non_field_errors'
+                    errors.setdefault(index, {}).setdefault(key, []).append(
+                        f"Same {', '.join(field_set)} as item {seen[value]} of the batch."
+                    )
+                else:
+                    seen[value] = index
+        return [
+            {'index': index, **({'id': ids[index]} if ids else {}), 'errors': item_errors}
+            for index, item_errors in sorted(errors.items())
+        ]
+
+    def get_bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return None
+        return items
+
+    def get_bulk_serializer_context(self, items):
+        """Serializer context with the related objects of every item preloaded"""
+        context = self.get_serializer_context()
+        preloaded = {}
+        for name, field in self.get_serializer().fields.items():
+            if not isinstance(field, BulkPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = {str(item[name]) for item in items if item.get(name) not in (None, '')}
+            if pks:
+                objects = field.get_queryset().in_bulk([pk for pk in pks if pk.isdigit()])
+                preloaded[name] = {str(pk): obj for pk, obj in objects.items()}
+        context[PRELOADED_CONTEXT_KEY] = preloaded
+        return context
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """Create, update (PATCH) or delete a batch of objects"""
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        items = self.get_bulk_items(request)
+        if items is None:
+            return self.bulk_error('Expected a list of objects')
+        if not items:
+            return self.bulk_error('The list is empty')
+        if len(items) > self.bulk_max_items:
+            return self.bulk_error(f'At most {self.bulk_max_items} objects per request')
+
+        if request.method == 'POST':
+            return self.bulk_create(request, items)
+        return self.bulk_update(request, items)
+
+    def bulk_create(self, request, items):
+        context = self.get_bulk_serializer_context(items)
+        serializer = self.get_serializer_class()(data=items, many=True, context=context)
+        if not serializer.is_valid():
+            return self.bulk_errors([
+                {'index': index, 'errors': errors}
+                for index, errors in enumerate(serializer.errors) if errors
+            ])
+
+        model = self.get_queryset().model
+        defaults = self.get_bulk_create_defaults()
+        instances = [model(**{**data, **defaults}) for data in serializer.validated_data]
+        errors = self.batch_unique_errors(instances)
+        if errors:
+            return self.bulk_errors(errors)
+        try:
+            with transaction.atomic():
+                instances = self.perform_bulk_create(instances)
+                bulk_saved.send(sender=model, instances=instances, created=True)
+        except IntegrityError:
+            # Written concurrently since validation
+            return self.bulk_conflict()
+
+        data = self.get_serializer(instances, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, instances):
+        return type(instances[0]).objects.bulk_create(instances)
+
+    def bulk_update(self, request, items):
+        ids = [item.get('id') for item in items]
+        if not all(isinstance(pk, int) for pk in ids):
+            return self.bulk_error('Every object needs an integer id')
+        if len(set(ids)) != len(ids):
+            return self.bulk_error('Duplicate ids')
+
+        instances = self.get_queryset().in_bulk(ids)
+        context = self.get_bulk_serializer_context(items)
+        serializer_class = self.get_serializer_class()
+        errors = []
+        validated = []
+        for index, item in enumerate(items):
+            instance = instances.get(item['id'])
+            if instance is None:
+                errors.append({'index': index, 'id': item['id'], 'errors': {'detail': 'Not found.'}})
+                continue
+            self.check_object_permissions(request, instance)
+            serializer = serializer_class(instance, data=item, partial=True, context=context)
+            if serializer.is_valid():
+                validated.append((instance, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'id': item['id'], 'errors': serializer.errors})
+        if errors:
+            return self.bulk_errors(errors)
+
+        model = self.get_queryset().model
+        # auto_now fields (updated_at) are only refreshed by save()
+        auto_now_fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        fields = {field.name for field in auto_now_fields}
+        for instance, data in validated:
+            for attr, value in data.items():
+                setattr(instance, attr, value)
+            for field in auto_now_fields:
+                field.pre_save(instance, add=False)
+            fields.update(data)
+
+        updated = [instance for instance, _ in validated]
+        errors = self.batch_unique_errors(updated, ids)
+        if errors:
+            return self.bulk_errors(errors)
+        try:
+            with transaction.atomic():
+                self.perform_bulk_update(updated, sorted(fields))
+                bulk_saved.send(sender=model, instances=updated, created=False)
+        except IntegrityError:
+            # Written concurrently since validation, or values swapped
+            # between items (unique constraints are checked row by row)
+            return self.bulk_conflict()
+
+        data = self.get_serializer(updated, many=True).data
+        return Response(data)
+
+    def perform_bulk_update(self, instances, fields):
+        type(instances[0]).objects.bulk_update(instances, fields)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return self.bulk_error('Expected {"ids": [...]} with integer ids')
+        if len(ids) > self.bulk_max_items:
+            return self.bulk_error(f'At most {self.bulk_max_items} objects per request')
+
+        instances = self.get_queryset().in_bulk(ids)
+        missing = [
+            {'index': index, 'id': pk, 'errors': {'detail': 'Not found.'}}
+            for index, pk in enumerate(ids) if pk not in instances
+        ]
+        if missing:
+            return self.bulk_errors(missing)
+        for instance in instances.values():
+            self.check_object_permissions(request, instance)
+
+        with transaction.atomic():
+            self.get_queryset().model.objects.filter(pk__in=instances).delete()
+        return Response({'deleted': len(instances)})
@@ -0,0 +1,198 @@
+import hashlib
+import inspect
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .db import use_primary
+
+KEY_PREFIX = 'api-cache'
+
+# Response headers stored with the data and replayed on hits
+CACHED_HEADERS = ['ETag', 'Last-Modified', 'Cache-Control', 'Vary']
+
+# name -> {'models': [...], 'timeout': ..., 'time_bucket': ...} for every cached action, filled
+# in by @cache_response at import time (used by the cache_stats command)
+CACHED_ACTIONS = {}
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def model_label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def version_key(label):
+    return f'{KEY_PREFIX}:version:{label}'
+
+
+def stats_key(name, outcome):
+    return f'{KEY_PREFIX}:stats:{name}:{outcome}'
+
+
+def fresh_version():
+    # Time based so that a version evicted from the cache never comes back
+    # with a value an older entry was stored under
+    return time.time_ns()
+
+
+def get_versions(labels):
+    """Current version of each model label, initialising missing ones"""
+    cache = get_cache()
+    keys = [version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*models):
+    """Invalidate every cached response depending on one of the models"""
+    cache = get_cache()
+    for model in models:
+        key = version_key(model_label(model))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, fresh_version(), timeout=None)
+
+
+def bump_versions_on_commit(*models):
+    transaction.on_commit(lambda: bump_versions(*models))
+
+
+def increment_counter(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats(name):
+    cache = get_cache()
+    values = cache.get_many([stats_key(name, 'hits'), stats_key(name, 'misses')])
+    return values.get(stats_key(name, 'hits'), 0), values.get(stats_key(name, 'misses'), 0)
+
+
+def reset_stats(name):
+    get_cache().delete_many([stats_key(name, 'hits'), stats_key(name, 'misses')])
+
+
+def cache_identity(user, per_role):
+    """
+    Admins and associates see the same data, so per-role actions share one
+    entry per role for them; analysts only see their own deals and always
+    get per-user entries.
+    """
+    if per_role and (user.is_admin() or user.is_associate()):
+        return f'role:{user.role}'
+    return f'user:{user.pk}'
+
+
+def get_cached_response(name, labels, request, per_role, time_bucket=None):
+    """Return (key, response): the cache key of the request and the cached response, or None"""
+    cache = get_cache()
+    versions = '.'.join(str(version) for version in get_versions(labels))
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    identity = cache_identity(request.user, per_role)
+    key = f'{KEY_PREFIX}:{name}:{identity}:{versions}:{url}'
+    if time_bucket:
+        key = f'{key}:{int(time.time() // time_bucket)}'
+
+    entry = cache.get(key)
+    if entry is None:
+        increment_counter(stats_key(name, 'misses'))
+        return key, None
+
+    increment_counter(stats_key(name, 'hits'))
+    data, headers = entry
+    response = None
+    if 'ETag' in headers:
+        response = get_conditional_response(request._request, etag=headers['ETag'])
+    if response is None:
+        response = Response(data)
+    for header, value in headers.items():
+        response[header] = value
+    response['X-Cache'] = 'HIT'
+    return key, response
+
+
+def store_response(key, response, timeout, time_bucket=None):
+    if response.status_code == 200:
+        headers = {header: response[header] for header in CACHED_HEADERS if header in response}
+        timeout = settings.API_CACHE_TIMEOUT if timeout is None else timeout
+        if time_bucket:
+            # The key is not requested anymore once its bucket is over
+            timeout = min(timeout, time_bucket - time.time() % time_bucket)
+        get_cache().set(key, (response.data, headers), timeout)
+    response['X-Cache'] = 'MISS'
+
+
+def cache_response(*models, timeout=None, per_role=False, time_bucket=None):
+    """
+    Cache the data of a successful GET viewset action.
+
+    Keys combine the action, the user (or role, see cache_identity), the
+    full request URL and the current version of each model the response
+    depends on. Saving or deleting an instance of one of those models bumps
+    its version (see apps.core.signals), which invalidates every entry built
+    from it without having to know the keys.
+
+    Responses holding values that change with time alone (``is_overdue``)
+    pass ``time_bucket``: the current bucket of that many seconds is part of
+    the key, so such a value is never served stale for longer.
+
+    Async actions (see apps.core.async_views) are supported, the cache is
+    then accessed from a worker thread.
+
+    Misses read from the primary database: an entry built from a lagging
+    read replica after a version bump would be served until it expires.
+    """
+    labels = sorted(model_label(model) for model in models)
+
+    def decorator(method):
+        name = method.__qualname__
+        CACHED_ACTIONS[name] = {'models': labels, 'timeout': timeout, 'time_bucket': time_bucket}
+
+        if inspect.iscoroutinefunction(method):
+            @wraps(method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                if request.method != 'GET' or not settings.API_CACHE_ENABLED:
+                    return await method(self, request, *args, **kwargs)
+
+                key, response = await sync_to_async(get_cached_response)(name, labels, request, per_role, time_bucket)
+                if response is None:
+                    with use_primary():
+                        response = await method(self, request, *args, **kwargs)
+                    await sync_to_async(store_response)(key, response, timeout, time_bucket)
+                return response
+
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or not settings.API_CACHE_ENABLED:
+                return method(self, request, *args, **kwargs)
+
+            key, response = get_cached_response(name, labels, request, per_role, time_bucket)
+            if response is None:
+                with use_primary():
+                    response = method(self, request, *args, **kwargs)
+                store_response(key, response, timeout, time_bucket)
+            return response
+
+        return wrapper
+
+    return decorator
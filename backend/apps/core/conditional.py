@@ -0,0 +1,154 @@
+import hashlib
+import time
+from contextlib import nullcontext
+
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .cache import get_versions, model_label
+from .db import use_primary
+
+
+def compute_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_response(request, etag, last_modified):
+    """304 (or 412) when the request preconditions match, None otherwise"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Let clients keep the payload but revalidate it on every poll
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    Lists are validated with MAX(updated_at) and COUNT(*) of the filtered
+    queryset, detail views with the object's updated_at, so a matching
+    If-None-Match is answered with 304 before anything is serialized.
+
+    Only detail responses carry Last-Modified: a list changes without its
+    MAX(updated_at) moving (a row deleted or leaving the filter), which
+    If-Modified-Since would answer with a stale 304. Its ETag covers it.
+
+    Views whose filtered querysets are too large to aggregate on every poll
+    (keyset paginated timelines) set ``etag_from_page``: the page is fetched
+    first and validated from its rows and links, skipping serialization only.
+
+    Serialized fields coming from other models (company names, annotated
+    counts, ...) are covered by ``etag_dependencies``: their cache versions
+    (see apps.core.cache) are part of the ETag, so they must be models
+    listed in apps.core.signals.CACHE_INVALIDATING_MODELS. Those versions are
+    bumped as soon as the write commits, so such views read from the primary
+    database: a lagging read replica would pair the new version with the
+    old rows, and the stale payload would then be revalidated with 304.
+
+    Boolean annotations that change with time alone (``is_overdue``) are
+    listed in ``etag_time_dependent``: how many rows are true is part of
+    the list ETag, the object's value part of the detail ETag.
+
+    Payloads holding values that expire (signed download URLs) return their
+    lifetime from ``get_etag_lifetime``: the ETag then changes every that
+    many seconds, and detail responses drop Last-Modified, so a revalidated
+    payload is never held past the expiry of the values it was built with.
+    """
+    last_modified_field = 'updated_at'
+    etag_dependencies = []
+    etag_from_page = False
+    etag_time_dependent = []
+
+    def etag_reads(self):
+        """Database routing of the reads the ETag and the payload are built from"""
+        return use_primary() if self.etag_dependencies else nullcontext()
+
+    def get_etag_lifetime(self):
+        """Seconds the serialized values stay valid, None if they do not expire"""
+        return None
+
+    def get_etag(self, last_modified, *state):
+        request = self.request
+        labels = sorted(model_label(model) for model in self.etag_dependencies)
+        lifetime = self.get_etag_lifetime()
+        return compute_etag(
+            request.user.pk,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            last_modified.isoformat() if last_modified else '',
+            int(time.time() // lifetime) if lifetime else '',
+            *state,
+            *get_versions(labels),
+        )
+
+    def get_page_validators(self, page):
+        last_modified = max((getattr(obj, self.last_modified_field) for obj in page), default=None)
+        rows = ','.join(
+            f'{obj.pk}@{getattr(obj, self.last_modified_field).isoformat()}'
+            + ''.join(f':{getattr(obj, name)}' for name in self.etag_time_dependent)
+            for obj in page
+        )
+        links = (self.paginator.get_next_link(), self.paginator.get_previous_link())
+        return last_modified, self.get_etag(last_modified, rows, *links, getattr(self.paginator, 'count', None))
+
+    def get_queryset_validators(self, queryset):
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field),
+            count=Count('pk'),
+            **{f'{name}_count': Count('pk', filter=Q(**{name: True})) for name in self.etag_time_dependent},
+        )
+        last_modified = state.pop('last_modified')
+        return last_modified, self.get_etag(last_modified, *state.values())
+
+    def list(self, request, *args, **kwargs):
+        with self.etag_reads():
+            return self.build_list(request)
+
+    def build_list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = None
+        if self.etag_from_page:
+            page = self.paginate_queryset(queryset)
+        if page is not None:
+            last_modified, etag = self.get_page_validators(page)
+        else:
+            last_modified, etag = self.get_queryset_validators(queryset)
+
+        response = conditional_response(request, etag, None)
+        if response is None:
+            if page is None:
+                page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                response = self.get_paginated_response(serializer.data)
+            else:
+                serializer = self.get_serializer(queryset, many=True)
+                response = Response(serializer.data)
+        return set_validators(response, etag, None)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.etag_reads():
+            return self.build_detail(request)
+
+    def build_detail(self, request):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field)
+        etag = self.get_etag(last_modified, *(getattr(instance, name) for name in self.etag_time_dependent))
+        if self.get_etag_lifetime():
+            last_modified = None
+        response = conditional_response(request, etag, last_modified)
+        if response is None:
+            serializer = self.get_serializer(instance)
+            response = Response(serializer.data)
+        return set_validators(response, etag, last_modified)
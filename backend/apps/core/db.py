@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+
+
+class RoutingState:
+    """Database routing of the current request (see ReplicaRoutingMiddleware)"""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def set_routing_state(state):
+    return _routing_state.set(state)
+
+
+def reset_routing_state(token):
+    _routing_state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Send the reads of the block to the primary"""
+    token = _routing_state.set(RoutingState(use_replica=False))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to the replica only within a request allowed to use it (a
+    safe-method request not pinned to the primary, see
+    ReplicaRoutingMiddleware) and outside of transactions. Everything else,
+    management commands included, reads from and writes to the primary.
+
+    The first write of a request pins its remaining reads to the primary,
+    so that a view reads back what it has just written.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return 'default'
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both databases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,19 @@
+from django.db.models import IntegerField, OuterRef, Subquery
+
+
+class SubqueryCount(Subquery):
+    """Correlated COUNT(*) over a subquery, usable as an annotation"""
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+
+
+def related_count(model, related_name):
+    """
+    Count the objects behind a reverse relation of ``model`` without joins,
+    e.g. ``Company.objects.annotate(deals_count=related_count(Company, 'deals'))``
+    """
+    relation = model._meta.get_field(related_name)
+    queryset = relation.related_model._base_manager.filter(
+        **{relation.field.name: OuterRef('pk')}
+    )
+    return SubqueryCount(queryset.order_by().values('pk'))
@@ -0,0 +1,97 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import SearchRank, TrigramSimilarity
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Coalesce
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .search import prefix_search_query, search_words
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for SearchFilter backed by the trigger-maintained
+    ``search_vector`` columns (GIN indexed) instead of ILIKE '%term%'.
+
+    The ``search_fields`` declared on a model are matched through its
+    search_vector when they are exactly the model's SEARCH_VECTOR_FIELDS
+    (the columns its trigger indexes); any other field, e.g. a lone
+    ``company__name``, falls back to icontains. As with SearchFilter, every
+    word must match one of them.
+    ``search_trigram_fields`` optionally adds pg_trgm fuzzy matching
+    (e.g. misspelled company names).
+
+    Results are annotated with ``search_rank`` and ordered by relevance
+    unless the client asked for an explicit ``ordering``, so the backend
+    must come after OrderingFilter in ``filter_backends``.
+    """
+    rank_annotation = 'search_rank'
+    vector_field = 'search_vector'
+
+    def get_trigram_fields(self, view):
+        return getattr(view, 'search_trigram_fields', [])
+
+    def get_vector_paths(self, model, search_fields):
+        """
+        Split search_fields into the search_vector lookups covering them and
+        the fields left to icontains.
+
+        A vector is only used when the fields declared on its model are
+        exactly its SEARCH_VECTOR_FIELDS: a vector covering more columns
+        would match on fields the view does not search.
+        """
+        groups = {}
+        for search_field in search_fields:
+            *relations, name = search_field.split('__')
+            groups.setdefault(tuple(relations), []).append((search_field, name))
+
+        vector_paths = []
+        fallback_fields = []
+        for relations, fields in groups.items():
+            related = model
+            try:
+                for relation in relations:
+                    related = related._meta.get_field(relation).related_model
+            except FieldDoesNotExist:
+                related = None
+            names = {name for _, name in fields}
+            if related is not None and sorted(names) == sorted(getattr(related, 'SEARCH_VECTOR_FIELDS', [])):
+                vector_paths.append('__'.join([*relations, self.vector_field]))
+            else:
+                fallback_fields.extend(search_field for search_field, _ in fields)
+        return vector_paths, fallback_fields
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        words = search_words(self.get_search_terms(request))
+        if not search_fields or not words:
+            return queryset
+
+        vector_paths, fallback_fields = self.get_vector_paths(queryset.model, search_fields)
+
+        # Every word must match one of the vectors (or fallback fields)
+        condition = reduce(operator.and_, (
+            reduce(operator.or_, [
+                *(Q(**{path: prefix_search_query([word])}) for path in vector_paths),
+                *(Q(**{self.construct_search(field): word}) for field in fallback_fields),
+            ])
+            for word in words
+        ))
+        query = prefix_search_query(words)
+        ranks = [Coalesce(SearchRank(F(path), query), Value(0.0)) for path in vector_paths]
+
+        search_text = ' '.join(words)
+        for field in self.get_trigram_fields(view):
+            condition |= Q(**{f'{field}__trigram_similar': search_text})
+            ranks.append(Coalesce(TrigramSimilarity(field, search_text), Value(0.0)))
+
+        queryset = queryset.filter(condition).annotate(**{
+            self.rank_annotation: reduce(operator.add, ranks) if ranks else Value(0.0, output_field=FloatField())
+        })
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(f'-{self.rank_annotation}', *queryset.query.order_by)
+        return queryset
@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the latency of an endpoint while slow clients hold connections '
+        'open (request headers sent a byte at a time), against a running server. '
+        'Run it against the sync (WSGI) and the ASGI stacks to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Endpoint to measure, e.g. http://127.0.0.1:8000/api/v1/users/me/')
+        parser.add_argument('--token', help='JWT access token sent as Authorization: Bearer')
+        parser.add_argument('--requests', type=int, default=200, help='Requests sent by the fast clients')
+        parser.add_argument('--concurrency', type=int, default=10, help='Fast clients')
+        parser.add_argument('--slow-clients', type=int, default=10)
+        parser.add_argument('--slow-seconds', type=float, default=10, help='Time a slow client takes to send its request')
+        parser.add_argument('--timeout', type=float, default=15, help='Fast request timeout in seconds')
+
+    def build_request(self, url, token):
+        target = url.path or '/'
+        if url.query:
+            target += f'?{url.query}'
+        lines = [f'GET {target} HTTP/1.1', f'Host: {url.netloc}', 'Connection: close']
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def slow_client(self, url, request, seconds):
+        try:
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        except OSError:
+            return
+        try:
+            delay = seconds / len(request)
+            for index in range(len(request)):
+                writer.write(request[index:index + 1])
+                await writer.drain()
+                await asyncio.sleep(delay)
+            await reader.read()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def fast_request(self, url, request, timeout):
+        """(status, seconds), status None on timeout or connection error"""
+        started = time.monotonic()
+
+        async def fetch():
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            try:
+                writer.write(request)
+                await writer.drain()
+                response = await reader.read()
+            finally:
+                writer.close()
+            return int(response.split(b' ', 2)[1])
+
+        try:
+            status = await asyncio.wait_for(fetch(), timeout)
+        except (asyncio.TimeoutError, OSError, IndexError, ValueError):
+            status = None
+        return status, time.monotonic() - started
+
+    async def run(self, url, options):
+        request = self.build_request(url, options['token'])
+        slow = [
+            asyncio.create_task(self.slow_client(url, request, options['slow_seconds']))
+            for _ in range(options['slow_clients'])
+        ]
+        # Let the slow clients take their connections first
+        await asyncio.sleep(min(1, options['slow_seconds'] / 4))
+
+        results = []
+        remaining = iter(range(options['requests']))
+
+        async def fast_client():
+            for _ in remaining:
+                results.append(await self.fast_request(url, request, options['timeout']))
+
+        started = time.monotonic()
+        await asyncio.gather(*(fast_client() for _ in range(options['concurrency'])))
+        elapsed = time.monotonic() - started
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        return results, elapsed
+
+    def percentile(self, values, fraction):
+        return values[min(len(values) - 1, int(len(values) * fraction))]
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Only http:// URLs are supported')
+
+        results, elapsed = asyncio.run(self.run(url, options))
+        ok = sorted(seconds for status, seconds in results if status is not None and status < 400)
+        failed = len(results) - len(ok)
+        statuses = sorted({str(status) for status, _ in results})
+
+        self.stdout.write(
+            f"{options['slow_clients']} slow clients ({options['slow_seconds']:g}s each), "
+            f"{options['concurrency']} fast clients, {len(results)} requests in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.1f} req/s), statuses {', '.join(statuses)}"
+        )
+        if ok:
+            self.stdout.write(
+                f'latency ms: p50 {statistics.median(ok) * 1000:.0f}, '
+                f'p95 {self.percentile(ok, 0.95) * 1000:.0f}, '
+                f'p99 {self.percentile(ok, 0.99) * 1000:.0f}, max {ok[-1] * 1000:.0f}'
+            )
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'{failed} failed or timed out'))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from apps.core.cache import CACHED_ACTIONS, get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the cached API actions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        # Importing the URLconf imports every viewset, registering its cached actions
+        get_resolver().url_patterns
+
+        for name, config in sorted(CACHED_ACTIONS.items()):
+            hits, misses = get_stats(name)
+            total = hits + misses
+            ratio = f'{hits / total:.1%}' if total else '-'
+            timeout = settings.API_CACHE_TIMEOUT if config['timeout'] is None else config['timeout']
+            bucket = f", {config['time_bucket']}s time buckets" if config['time_bucket'] else ''
+            self.stdout.write(
+                f"{name}: {hits} hits, {misses} misses, hit ratio {ratio} "
+                f"(timeout {timeout}s{bucket}, depends on {', '.join(config['models'])})"
+            )
+            if options['reset']:
+                reset_stats(name)
@@ -0,0 +1,134 @@
+import re
+from importlib import import_module
+from itertools import combinations
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+User = get_user_model()
+
+SEQ_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+
+def iter_registered_viewsets():
+    """Yield (prefix, viewset) for every router registered in apps.*.urls"""
+    for app_config in apps.get_app_configs():
+        if not app_config.name.startswith('apps.'):
+            continue
+        try:
+            module = import_module(f'{app_config.name}.urls')
+        except ModuleNotFoundError:
+            continue
+        router = getattr(module, 'router', None)
+        if router is None:
+            continue
+        for prefix, viewset, basename in router.registry:
+            yield prefix, viewset
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the standard list queries of every API viewset '
+        '(default ordering, each filterset field and each pair of them, per role) '
+        'and report sequential scans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--role', action='append', dest='roles',
+            help='Role(s) to explain the queries for (default: admin and analyst)',
+        )
+        parser.add_argument(
+            '--natural', action='store_true',
+            help='Keep the planner defaults instead of disabling seq scans. '
+                 'By default enable_seqscan is off so that any remaining Seq Scan '
+                 'means no usable index exists, whatever the table size.',
+        )
+        parser.add_argument(
+            '--ignore-table', action='append', default=[], dest='ignored_tables',
+            help='Table allowed to be sequentially scanned (e.g. small lookup tables)',
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='Exit with an error when a sequential scan is found',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_queries requires PostgreSQL')
+
+        self.natural = options['natural']
+        ignored_tables = set(options['ignored_tables'])
+        roles = options['roles'] or ['admin', 'analyst']
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+
+        offenders = []
+        for role in roles:
+            user = User.objects.filter(role=role).first()
+            if user is None:
+                self.stdout.write(self.style.WARNING(f'No {role} user, skipping role'))
+                continue
+
+            for prefix, viewset in iter_registered_viewsets():
+                view = self.get_view(viewset, user)
+                base = view.get_queryset()
+                if getattr(view, 'ordering', None):
+                    base = base.order_by(*view.ordering)
+
+                for filters in self.get_filter_combinations(view, base.model):
+                    queryset = base.filter(**filters)[:page_size]
+                    label = f"{prefix} [{role}] {', '.join(filters) or 'default'}"
+                    plan = self.explain(queryset)
+                    tables = sorted(set(SEQ_SCAN_RE.findall(plan)) - ignored_tables)
+                    if tables:
+                        offenders.append(label)
+                        self.stdout.write(self.style.ERROR(
+                            f"{label}: Seq Scan on {', '.join(tables)}"
+                        ))
+                    else:
+                        self.stdout.write(f'{label}: ok')
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(plan)
+
+        if offenders:
+            message = f'{len(offenders)} list queries use sequential scans'
+            if options['fail_on_seq_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans found'))
+
+    def get_view(self, viewset, user):
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        return viewset(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+
+    def get_filter_combinations(self, view, model):
+        """Default list, each filterset field alone, then each pair"""
+        samples = {}
+        for field in getattr(view, 'filterset_fields', None) or []:
+            value = (
+                model._base_manager
+                .exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True)
+                .first()
+            )
+            if value is not None:
+                samples[field] = value
+
+        yield {}
+        for size in (1, 2):
+            for fields in combinations(samples, size):
+                yield {field: samples[field] for field in fields}
+
+    def explain(self, queryset):
+        with transaction.atomic():
+            if not self.natural:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
@@ -0,0 +1,227 @@
+import hmac
+import random
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import URLResolver, get_resolver
+
+from .cache import get_cache
+
+KEY_PREFIX = 'metrics'
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+
+# Counters summed per view, in microseconds for the durations (cache
+# increments are integers)
+SUMS = ('duration_us', 'queries', 'db_us', 'render_us')
+
+UNMATCHED = 'unmatched'
+
+# Not recorded: scraping would skew its own numbers
+METRICS_VIEW_NAME = 'metrics'
+
+
+class RequestMetrics:
+    """SQL, rendering and total time of one request"""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def end_render(self):
+        if self.render_started is not None:
+            self.render_time += time.perf_counter() - self.render_started
+            self.render_started = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Server-Timing header value, durations in milliseconds"""
+        app = max(total - self.db_time - self.render_time, 0)
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+def start_request_metrics():
+    """
+    (metrics, token) for a request to instrument, (None, None) otherwise: a
+    METRICS_SAMPLE_RATE share of the requests is recorded, every request is
+    instrumented when METRICS_SERVER_TIMING is set
+    """
+    sampled = random.random() < settings.METRICS_SAMPLE_RATE
+    if not sampled and not settings.METRICS_SERVER_TIMING:
+        return None, None
+    metrics = RequestMetrics(sampled)
+    return metrics, _current_metrics.set(metrics)
+
+
+def stop_request_metrics(token):
+    _current_metrics.reset(token)
+
+
+def get_request_metrics():
+    return _current_metrics.get()
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper counting and timing the queries of instrumented requests"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver: every connection, in every thread, times its queries"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def view_label(request):
+    """Resolved URL name of the request (``deal-kanban``, ``admin:index``...)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNMATCHED
+    return match.view_name
+
+
+def metric_key(label, name):
+    return f'{KEY_PREFIX}:{label}:{name}'
+
+
+def increment(cache, key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, delta)
+
+
+def record(label, status_code, metrics, total):
+    """Add a sampled request to the counters shared by every worker"""
+    cache = get_cache()
+    status = f'{status_code // 100}xx'
+    bucket = bisect_left(DURATION_BUCKETS, total)
+    increment(cache, metric_key(label, f'requests:{status}'))
+    increment(cache, metric_key(label, f'bucket:{bucket}'))
+    values = {
+        'duration_us': int(total * 1e6),
+        'queries': metrics.queries,
+        'db_us': int(metrics.db_time * 1e6),
+        'render_us': int(metrics.render_time * 1e6),
+    }
+    for name, value in values.items():
+        if value:
+            increment(cache, metric_key(label, name), value)
+
+
+def iter_view_names(patterns, namespace=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from iter_view_names(pattern.url_patterns, prefix)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def get_labels():
+    labels = set(iter_view_names(get_resolver().url_patterns))
+    labels.discard(METRICS_VIEW_NAME)
+    return sorted(labels | {UNMATCHED})
+
+
+def collect():
+    """{label: {counter name: value}} of the views with recorded requests"""
+    labels = get_labels()
+    names = [f'requests:{status}' for status in STATUS_CLASSES]
+    names += [f'bucket:{index}' for index in range(len(DURATION_BUCKETS) + 1)]
+    names += SUMS
+    values = get_cache().get_many([metric_key(label, name) for label in labels for name in names])
+
+    collected = {}
+    for label in labels:
+        counters = {name: values.get(metric_key(label, name), 0) for name in names}
+        if any(counters[f'requests:{status}'] for status in STATUS_CLASSES):
+            collected[label] = counters
+    return collected
+
+
+def render_metrics(collected):
+    """Prometheus text exposition format"""
+    lines = [
+        '# HELP crm_metrics_sample_rate Share of the requests recorded in the metrics below',
+        '# TYPE crm_metrics_sample_rate gauge',
+        f'crm_metrics_sample_rate {settings.METRICS_SAMPLE_RATE}',
+        '# HELP crm_http_requests_total Sampled requests by view and status class',
+        '# TYPE crm_http_requests_total counter',
+    ]
+    for label, counters in collected.items():
+        for status in STATUS_CLASSES:
+            if counters[f'requests:{status}']:
+                lines.append(
+                    f'crm_http_requests_total{{view="{label}",status="{status}"}} {counters[f"requests:{status}"]}'
+                )
+
+    lines += [
+        '# HELP crm_http_request_duration_seconds Latency of the sampled requests',
+        '# TYPE crm_http_request_duration_seconds histogram',
+    ]
+    for label, counters in collected.items():
+        count = 0
+        for index, bound in enumerate(DURATION_BUCKETS + ('+Inf',)):
+            count += counters[f'bucket:{index}']
+            lines.append(f'crm_http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {count}')
+        lines.append(f'crm_http_request_duration_seconds_sum{{view="{label}"}} {counters["duration_us"] / 1e6}')
+        lines.append(f'crm_http_request_duration_seconds_count{{view="{label}"}} {count}')
+
+    for metric, value, description in [
+        ('crm_db_queries_total', lambda counters: counters['queries'], 'SQL queries of the sampled requests'),
+        ('crm_db_query_duration_seconds_total', lambda counters: counters['db_us'] / 1e6,
+         'SQL time of the sampled requests'),
+        ('crm_render_duration_seconds_total', lambda counters: counters['render_us'] / 1e6,
+         'Response rendering time of the sampled requests'),
+    ]:
+        lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+        for label, counters in collected.items():
+            lines.append(f'{metric}{{view="{label}"}} {value(counters)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires ``Authorization: Bearer
+    <METRICS_TOKEN>``; without a token configured it is only served in DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,128 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .db import RoutingState, reset_routing_state, set_routing_state
+from .metrics import (
+    METRICS_VIEW_NAME, get_request_metrics, record, start_request_metrics, stop_request_metrics, view_label,
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe-method requests read from the read replica (see
+    apps.core.db.PrimaryReplicaRouter).
+
+    A request that wrote to the database sets a short-lived cookie pinning
+    the client's following requests to the primary for
+    DB_REPLICA_PIN_SECONDS, longer than the replication lag, so that a
+    client reads its own writes. Responses streamed after the view returned
+    read from the primary.
+    """
+    cookie_name = 'db_primary_pin'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_state(self, request):
+        use_replica = request.method in SAFE_METHODS and self.cookie_name not in request.COOKIES
+        return RoutingState(use_replica=use_replica)
+
+    def process_response(self, request, response, state):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.DB_REPLICA_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.get_state(request)
+        token = set_routing_state(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_routing_state(token)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        token = set_routing_state(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_routing_state(token)
+        return self.process_response(request, response, state)
+
+
+class MetricsMiddleware:
+    """
+    Per request SQL count and time, rendering time and total latency (see
+    apps.core.metrics), keyed by the resolved view name.
+
+    Sampled requests (METRICS_SAMPLE_RATE) are added to the counters served
+    by /metrics; the other requests only pay for a random number. With
+    METRICS_SERVER_TIMING, every request is instrumented and gets a
+    Server-Timing header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def process_template_response(self, request, response):
+        # Called right before DRF responses are rendered
+        metrics = get_request_metrics()
+        if metrics is not None:
+            metrics.start_render()
+            response.add_post_render_callback(lambda rendered: metrics.end_render())
+        return response
+
+    def should_record(self, request, metrics):
+        return metrics.sampled and view_label(request) != METRICS_VIEW_NAME
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request_metrics()
+        if metrics is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_metrics(token)
+        total = metrics.elapsed()
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total)
+        if self.should_record(request, metrics):
+            record(view_label(request), response.status_code, metrics, total)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token = start_request_metrics()
+        if metrics is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_metrics(token)
+        total = metrics.elapsed()
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total)
+        if self.should_record(request, metrics):
+            # Blocking cache (Redis) calls
+            await sync_to_async(record)(view_label(request), response.status_code, metrics, total)
+        return response
@@ -0,0 +1,210 @@
+import base64
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without the millisecond truncation of datetimes"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the queryset ordering (as set by the view's
+    ``ordering`` / OrderingFilter) plus the primary key as a tiebreak.
+
+    Pages are fetched with a ``WHERE (a, b, id) < (...)``-style condition
+    instead of OFFSET, and no COUNT(*) is run, so page 10,000 costs the same
+    as page 1. The ordering fields must be non-nullable.
+
+    ``?count=estimate`` opts into an approximate total: pg_class.reltuples
+    for unfiltered querysets, otherwise a COUNT capped at ``count_cap``.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cap = 10000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        self.count = self.get_count(queryset) if self.count_requested(request) else None
+
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_condition(values, reverse))
+        if reverse:
+            queryset = queryset.order_by(*(self.order_string(field, not desc) for field, desc in self.ordering))
+        else:
+            queryset = queryset.order_by(*(self.order_string(field, desc) for field, desc in self.ordering))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Going forward there is a previous page whenever we came from a cursor,
+        # going backward there always is a next page (the one we came from)
+        has_next = has_more if not reverse else True
+        has_previous = values is not None if not reverse else has_more
+        self.next_values = self.get_row_values(results[-1]) if results and has_next else None
+        self.previous_values = self.get_row_values(results[0]) if results and has_previous else None
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = True
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Only with ?count=estimate'},
+                'count_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """[(field, descending)] from the queryset ordering, with a pk tiebreak"""
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        fields = []
+        for field in ordering:
+            if not isinstance(field, str) or field == '?':
+                raise ImproperlyConfigured('KeysetPagination only supports ordering by field names')
+            fields.append((field.lstrip('-'), field.startswith('-')))
+        if not any(field in ('pk', 'id') for field, _ in fields):
+            fields.append(('pk', fields[-1][1] if fields else False))
+        return fields
+
+    def order_string(self, field, descending):
+        return f'-{field}' if descending else field
+
+    def get_keyset_condition(self, values, reverse):
+        """(a, b, pk) after/before the cursor row, honouring each field direction"""
+        conditions = []
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {prefix_field: values[i] for i, (prefix_field, _) in enumerate(self.ordering[:index])}
+            conditions.append(Q(**equal, **{f'{field}__{lookup}': values[index]}))
+        # Redundant bound on the leading field so the planner can range-scan its index
+        field, descending = self.ordering[0]
+        bound = Q(**{f"{field}__{'lte' if descending != reverse else 'gte'}": values[0]})
+        return bound & reduce(operator.or_, conditions)
+
+    def get_row_values(self, obj):
+        values = []
+        for field, _ in self.ordering:
+            value = obj
+            for part in field.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def to_python(self, model, field, value):
+        """Cast a JSON-decoded cursor value back using the model field"""
+        *relations, name = field.split('__')
+        try:
+            for relation in relations:
+                model = model._meta.get_field(relation).related_model
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation, e.g. search_rank
+            return value
+        return model_field.to_python(value)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = cursor['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            values = [self.to_python(self.model, field, value) for (field, _), value in zip(self.ordering, values)]
+            return values, bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse):
+        payload = {'v': values}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, cls=CursorEncoder, separators=(',', ':'))
+        url = replace_query_param(self.base_url, self.cursor_query_param, base64.urlsafe_b64encode(raw.encode()).decode())
+        return remove_query_param(url, 'page')
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) == 'estimate'
+
+    def get_count(self, queryset):
+        if not queryset.query.where:
+            estimate = self.get_table_estimate(queryset)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by()[:self.count_cap].count()
+
+    def get_table_estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been vacuumed/analyzed
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
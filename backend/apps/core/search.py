@@ -0,0 +1,86 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import migrations
+
+# Text search configuration used by the search_vector triggers and queries.
+# 'simple' does no stemming, which keeps French and English content alike
+# searchable; prefix matching on each term covers most inflections.
+SEARCH_CONFIG = 'simple'
+
+EDGE_PUNCTUATION = re.compile(r'^\W+|\W+$')
+
+
+def search_words(terms):
+    """
+    Split search terms into the words a tsquery can match. Punctuated words
+    (e-mails, domains, hyphenated names) are kept whole, see prefix_search_query
+    """
+    words = []
+    for term in terms:
+        for word in term.lower().split():
+            word = EDGE_PUNCTUATION.sub('', word)
+            if word:
+                words.append(word)
+    return words
+
+
+def prefix_lexeme(word):
+    escaped = word.replace('\\', '\\\\').replace("'", "''")
+    return f"'{escaped}':*"
+
+
+def prefix_search_query(words):
+    """
+    Prefix tsquery matching every word, e.g. ['acq', 'tech'] -> 'acq:* & tech:*'.
+
+    The parser indexes an e-mail or a host name as a single lexeme
+    ('john.doe@acme.com'), a hyphenated word both whole and by parts: a
+    punctuated word matches all of its parts or the whole word, e.g.
+    ('john':* & 'doe':* & 'acme':* & 'com':* | 'john.doe@acme.com':*)
+    """
+    terms = []
+    for word in words:
+        parts = re.findall(r'\w+', word)
+        if parts == [word]:
+            terms.append(prefix_lexeme(word))
+        else:
+            terms.append(f"({' & '.join(map(prefix_lexeme, parts))} | {prefix_lexeme(word)})")
+    raw = ' & '.join(terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_vector_trigger(table, weighted_columns):
+    """
+    Migration operation keeping ``<table>.search_vector`` up to date with a
+    BEFORE INSERT/UPDATE trigger, and backfilling existing rows.
+
+    ``weighted_columns`` is a list of (column, weight) pairs, weight in A-D.
+    """
+    function = f'{table}_search_vector_update'
+    trigger = f'{table}_search_vector_trigger'
+    columns = [column for column, _ in weighted_columns]
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.{column}::text, '')), '{weight}')"
+        for column, weight in weighted_columns
+    )
+    forward = f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vector};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS {trigger} ON {table};
+        CREATE TRIGGER {trigger}
+            BEFORE INSERT OR UPDATE OF {', '.join(columns)} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {function}();
+
+        UPDATE {table} SET {columns[0]} = {columns[0]};
+    """
+    reverse = f"""
+        DROP TRIGGER IF EXISTS {trigger} ON {table};
+        DROP FUNCTION IF EXISTS {function}();
+    """
+    return migrations.RunSQL(forward, reverse)
@@ -0,0 +1,44 @@
+from django.apps import apps
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from .cache import bump_versions_on_commit
+from .metrics import install_query_timer
+
+# Sent after bulk_create / bulk_update writes, which send no post_save.
+# Arguments: sender (model), instances, created
+bulk_saved = Signal()
+
+# Models whose changes invalidate cached API responses (see cache_response)
+CACHE_INVALIDATING_MODELS = [
+    'deals.Deal',
+    'deals.Stage',
+    'deals.Task',
+    'companies.Company',
+    'companies.Contact',
+    'interactions.Interaction',
+    'documents.Document',
+    'users.User',
+]
+
+
+def invalidate_cached_responses(sender, raw=False, **kwargs):
+    if not raw:
+        bump_versions_on_commit(sender)
+
+
+def invalidate_bulk_saved(sender, **kwargs):
+    if sender._meta.label in CACHE_INVALIDATING_MODELS:
+        bump_versions_on_commit(sender)
+
+
+bulk_saved.connect(invalidate_bulk_saved, dispatch_uid='api_cache_bulk_saved')
+
+for label in CACHE_INVALIDATING_MODELS:
+    model = apps.get_model(label)
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'api_cache_save_{label}')
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'api_cache_delete_{label}')
+
+# Query counts and times of the instrumented requests (see apps.core.metrics)
+connection_created.connect(install_query_timer, dispatch_uid='metrics_query_timer')
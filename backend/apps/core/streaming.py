@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+async def aiter_blocks(blocks, thread_sensitive=True):
+    """
+    Async iterator over a sync one, each block produced in a worker thread.
+
+    Iterators using the database (ORM ``iterator()``) must stay
+    ``thread_sensitive``: they then run in the request's sync thread, whose
+    connection is closed at the end of the request. Other threads would
+    each open a connection of their own and never close it. Storage reads
+    can use any thread (``thread_sensitive=False``).
+    """
+    blocks = iter(blocks)
+    try:
+        while (block := await sync_to_async(next, thread_sensitive=thread_sensitive)(blocks, None)) is not None:
+            yield block
+    finally:
+        close = getattr(blocks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+
+def streaming_content(request, blocks, thread_sensitive=True):
+    """
+    ``blocks`` as the content of a StreamingHttpResponse. Under ASGI Django
+    reads a sync iterator whole before sending anything: it gets an async
+    one instead (see aiter_blocks), so that one block at a time is in
+    memory there too.
+    """
+    if isinstance(request, ASGIRequest):
+        return aiter_blocks(blocks, thread_sensitive)
+    return blocks
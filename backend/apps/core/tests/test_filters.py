@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from apps.companies.models import Company, Contact
+from apps.core.filters import FullTextSearchFilter
+from apps.deals.models import Deal
+
+
+class FullTextSearchFilterTests(SimpleTestCase):
+    def vector_paths(self, model, search_fields):
+        return FullTextSearchFilter().get_vector_paths(model, search_fields)
+
+    def test_vector_used_when_it_covers_exactly_the_declared_fields(self):
+        self.assertEqual(
+            self.vector_paths(Company, ['name', 'legal_id', 'sector']),
+            (['search_vector'], []),
+        )
+
+    def test_partially_covered_model_falls_back_to_icontains(self):
+        # The company vector also covers legal_id and sector, which a deal
+        # search does not declare
+        self.assertEqual(
+            self.vector_paths(Deal, ['title', 'company__name', 'description']),
+            (['search_vector'], ['company__name']),
+        )
+        self.assertEqual(
+            self.vector_paths(Contact, ['first_name', 'last_name', 'email', 'company__name']),
+            (['search_vector'], ['company__name']),
+        )
+        self.assertEqual(self.vector_paths(Deal, ['title']), ([], ['title']))
+
+    def test_prefixed_fields_fall_back_to_their_lookup(self):
+        self.assertEqual(self.vector_paths(Deal, ['=title', 'description']), ([], ['=title', 'description']))
@@ -0,0 +1,450 @@
+"""
+Query budgets of the API endpoints.
+
+Every list, detail and GET action registered on the API routers is requested
+as each role against a seeded dataset, with two page sizes: the number of
+queries must stay within the endpoint's budget and must not change with the
+page size (an N+1 shows up as a difference). A new endpoint fails
+test_every_read_endpoint_has_a_budget until it gets a budget in
+READ_BUDGETS. The budgets do not include authentication (the clients are
+force-authenticated) and are measured with the API cache disabled, on
+PostgreSQL like the application: its migrations install search triggers and
+extensions, and several endpoints use PostgreSQL-only SQL.
+
+Timings (median of TIMING_RUNS requests per endpoint and role) are written
+to the JSON file named by the QUERY_BUDGET_TIMINGS environment variable.
+QUERY_BUDGET_BASELINE names a previous file to compare against: endpoints
+slower than QUERY_BUDGET_SLOWDOWN times (1.5 by default) their baseline are
+reported.
+
+    QUERY_BUDGET_TIMINGS=timings.json python manage.py test apps.core.tests.test_query_budget
+"""
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import cycle
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient, APITestCase
+
+from apps.companies.models import Company, Contact
+from apps.core.pagination import KeysetPagination
+from apps.deals.models import Deal, Stage, Task
+from apps.deals.snapshots import PipelineSnapshotRefresh
+from apps.documents.models import NDA, Document, DocumentUpload
+from apps.interactions.models import Interaction
+from apps.users.models import User
+
+# Queries per request of each GET endpoint (URL name), whatever the role
+# and the page size
+READ_BUDGETS = {
+    'company-list': 4,
+    'company-detail': 2,
+    'contact-list': 3,
+    'contact-detail': 1,
+    'contact-export': 1,
+    'deal-list': 3,
+    'deal-detail': 2,
+    'deal-kanban': 3,
+    'deal-analytics': 1,
+    'deal-analytics-trend': 1,
+    'deal-analytics-velocity': 3,
+    'deal-export': 1,
+    'deal-documents-archive': 2,
+    'stage-list': 3,
+    'stage-detail': 1,
+    'task-list': 3,
+    'task-detail': 1,
+    'task-my-tasks': 2,
+    'interaction-list': 1,
+    'interaction-detail': 1,
+    'interaction-export': 1,
+    'document-list': 1,
+    'document-detail': 1,
+    'document-download': 1,
+    'document-content-search': 1,
+    'documentupload-list': 2,
+    'documentupload-detail': 1,
+    'nda-list': 3,
+    'nda-detail': 1,
+    'user-list': 3,
+    'user-detail': 1,
+    'user-me': 0,
+    'search-list': 1,
+}
+
+# Writes, by scenario (see the test_* methods below)
+WRITE_BUDGETS = {
+    'deal-move-stage': 10,
+    'document-upload': 5,
+    'documentupload-create': 2,
+    'documentupload-append': 3,
+    'documentupload-complete': 8,
+}
+
+# Endpoints sized by a query param of their own instead of the pagination
+SIZE_PARAMS = {
+    'deal-kanban': 'limit',
+    'search-list': 'limit',
+    'document-content-search': 'limit',
+}
+
+# Extra query params an endpoint needs
+ENDPOINT_PARAMS = {
+    'search-list': {'q': 'deal'},
+    'document-content-search': {'q': 'deal'},
+}
+
+# Endpoints only available on PostgreSQL (full text search, GROUPING SETS,
+# percentile_cont)
+POSTGRES_ONLY = {'search-list', 'document-content-search', 'deal-analytics', 'deal-analytics-velocity'}
+
+SMALL_PAGE = 2
+LARGE_PAGE = 25
+TIMING_RUNS = 3
+ROLES = ['admin', 'associate', 'analyst']
+
+
+def iter_viewset_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_viewset_patterns(pattern.url_patterns)
+        elif pattern.name and getattr(pattern.callback, 'actions', None):
+            yield pattern
+
+
+def get_read_endpoints():
+    """{url name: detail} of the viewset routes answering GET"""
+    endpoints = {}
+    for pattern in iter_viewset_patterns(get_resolver().url_patterns):
+        if 'get' in pattern.callback.actions and pattern.name not in endpoints:
+            endpoints[pattern.name] = pattern.callback.initkwargs.get('detail', False)
+    return endpoints
+
+
+def page_size(size):
+    """Patch the page size of both pagination classes"""
+    patches = [
+        mock.patch.object(PageNumberPagination, 'page_size', size),
+        mock.patch.object(KeysetPagination, 'page_size', size),
+    ]
+    for patch in patches:
+        patch.start()
+    return patches
+
+
+@override_settings(API_CACHE_ENABLED=False, METRICS_SAMPLE_RATE=0)
+class QueryBudgetTests(APITestCase):
+    companies = 30
+    contacts_per_company = 4
+    deals = 60
+    interactions_per_deal = 3
+    documents_per_deal = 2
+    tasks_per_deal = 2
+
+    timings = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(
+            MEDIA_ROOT=cls.media_root, DOCUMENT_UPLOAD_DIR=os.path.join(cls.media_root, 'uploads'),
+        )
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        cls.write_timings()
+
+    @classmethod
+    def setUpTestData(cls):
+        # Stages, one user per role and a few rows of each model
+        call_command('seed_mvp', stdout=StringIO())
+        cls.users = {role: User.objects.get(role=role, email=f'{role}@example.com') for role in ROLES}
+        stages = list(Stage.objects.order_by('order'))
+        owners = cycle(cls.users.values())
+        now = timezone.now()
+
+        companies = Company.objects.bulk_create([
+            Company(name=f'Company {i}', legal_id=f'QB{i:06d}', country='France', sector=f'Sector {i % 6}')
+            for i in range(cls.companies)
+        ])
+        Contact.objects.bulk_create([
+            Contact(
+                company=company,
+                first_name=f'First {i}',
+                last_name=f'Last {i}',
+                email=f'contact{company.pk}.{i}@example.com',
+                seniority=['c_level', 'vp', 'director', 'mid'][i % 4],
+            )
+            for company in companies for i in range(cls.contacts_per_company)
+        ])
+        deals = Deal.objects.bulk_create([
+            Deal(
+                title=f'Deal {i}',
+                company=companies[i % len(companies)],
+                owner=next(owners),
+                stage=stages[i % len(stages)],
+                amount_estimate=Decimal(100000 * (i + 1)),
+                next_action_at=now + timedelta(days=i % 20 - 10),
+            )
+            for i in range(cls.deals)
+        ])
+        Interaction.objects.bulk_create([
+            Interaction(
+                deal=deal,
+                company=deal.company,
+                type='note',
+                subject=f'Note {i} on {deal.title}',
+                body='Follow-up',
+                occurred_at=now - timedelta(days=i),
+                author=deal.owner,
+            )
+            for deal in deals for i in range(cls.interactions_per_deal)
+        ])
+        content = b'%PDF-1.4 memo '.ljust(1024, b'.')
+        documents = Document.objects.bulk_create([
+            Document(
+                deal=deal,
+                filename=f'memo-{deal.pk}-{i}.pdf',
+                file=default_storage.save(f'documents/{deal.pk}/memo-{deal.pk}-{i}.pdf', ContentFile(content)),
+                size=len(content),
+                content_type='application/pdf',
+                crc32=zlib.crc32(content),
+                uploaded_by=deal.owner,
+            )
+            for deal in deals for i in range(cls.documents_per_deal)
+        ])
+        NDA.objects.bulk_create([
+            NDA(deal=document.deal, counterparty='target', status='signed', file=document, signed_at=now)
+            for document in documents[::cls.documents_per_deal * 2]
+        ])
+        # An upload in progress of each user, for documentupload-detail
+        DocumentUpload.objects.bulk_create([
+            DocumentUpload(
+                deal=next(deal for deal in deals if deal.owner_id == user.pk),
+                filename=f'data-room-{user.role}.zip',
+                size=len(content) * 4,
+                received=len(content),
+                uploaded_by=user,
+            )
+            for user in cls.users.values()
+        ])
+        Task.objects.bulk_create([
+            Task(
+                deal=deal,
+                title=f'Task {i} on {deal.title}',
+                due_at=now + timedelta(days=i - 1),
+                assignee=deal.owner,
+                created_by=deal.owner,
+            )
+            for deal in deals for i in range(cls.tasks_per_deal)
+        ])
+
+        PipelineSnapshotRefresh().run()
+        if connection.vendor == 'postgresql':
+            call_command('rebuild_search_index', stdout=StringIO())
+
+    def client_for(self, role):
+        client = APIClient()
+        client.force_authenticate(self.users[role])
+        return client
+
+    def request(self, client, method, url, **kwargs):
+        """(response, captured queries, seconds)"""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response, queries, elapsed
+
+    def assert_budget(self, name, budget, response, queries):
+        if response.status_code >= 400:
+            self.fail(f'{name}: {response.status_code} {response.data}')
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertLessEqual(
+            len(queries), budget, f'{name}: {len(queries)} queries for a budget of {budget}\n{sql}',
+        )
+
+    def record_timing(self, name, role, queries, timings):
+        self.timings[f'{name}:{role}'] = {
+            'queries': len(queries),
+            'ms': round(statistics.median(timings) * 1000, 2),
+        }
+
+    def get_detail_url(self, client, name):
+        """URL of the first object of the role's list"""
+        basename = name.split('-', 1)[0]
+        response = client.get(reverse(f'{basename}-list'))
+        data = response.data
+        results = data['results'] if isinstance(data, dict) else data
+        if not results:
+            return None
+        return reverse(name, kwargs={'pk': results[0]['id']})
+
+    def measure_read(self, client, name, url, size):
+        params = dict(ENDPOINT_PARAMS.get(name, {}))
+        patches = []
+        if name in SIZE_PARAMS:
+            params[SIZE_PARAMS[name]] = size
+        else:
+            patches = page_size(size)
+        try:
+            return self.request(client, 'get', url, data=params)
+        finally:
+            for patch in patches:
+                patch.stop()
+
+    def test_every_read_endpoint_has_a_budget(self):
+        endpoints = set(get_read_endpoints())
+        missing = sorted(endpoints - set(READ_BUDGETS))
+        self.assertEqual(missing, [], 'Add the query budget of these endpoints to READ_BUDGETS')
+        self.assertEqual(sorted(set(READ_BUDGETS) - endpoints), [], 'Unknown endpoints in READ_BUDGETS')
+
+    def test_read_endpoints(self):
+        for name, detail in sorted(get_read_endpoints().items()):
+            if name not in READ_BUDGETS:
+                continue
+            for role in ROLES:
+                with self.subTest(endpoint=name, role=role):
+                    if name in POSTGRES_ONLY and connection.vendor != 'postgresql':
+                        self.skipTest(f'{name} needs PostgreSQL')
+                    client = self.client_for(role)
+                    url = self.get_detail_url(client, name) if detail else reverse(name)
+                    if url is None:
+                        self.skipTest(f'No object visible to {role}')
+
+                    response, small, elapsed = self.measure_read(client, name, url, SMALL_PAGE)
+                    self.assert_budget(name, READ_BUDGETS[name], response, small)
+                    timings = [elapsed]
+                    for _ in range(TIMING_RUNS):
+                        response, large, elapsed = self.measure_read(client, name, url, LARGE_PAGE)
+                        timings.append(elapsed)
+                    self.assert_budget(name, READ_BUDGETS[name], response, large)
+                    self.assertEqual(
+                        len(small), len(large),
+                        f'{name}: {len(small)} queries for {SMALL_PAGE} items, {len(large)} for {LARGE_PAGE}',
+                    )
+                    self.record_timing(name, role, large, timings[1:])
+
+    def test_move_stage(self):
+        stages = list(Stage.objects.order_by('order'))
+        for role in ROLES:
+            with self.subTest(role=role):
+                deal = Deal.objects.filter(owner=self.users[role]).first()
+                url = reverse('deal-move-stage', kwargs={'pk': deal.pk})
+                timings = []
+                for stage in stages[:TIMING_RUNS]:
+                    response, queries, elapsed = self.request(
+                        self.client_for(role), 'patch', url, data={'stage_id': stage.pk}, format='json',
+                    )
+                    self.assert_budget('deal-move-stage', WRITE_BUDGETS['deal-move-stage'], response, queries)
+                    timings.append(elapsed)
+                self.record_timing('deal-move-stage', role, queries, timings)
+
+    def test_upload(self):
+        for role in ROLES:
+            with self.subTest(role=role):
+                deal = Deal.objects.filter(owner=self.users[role]).first()
+                timings = []
+                for i in range(TIMING_RUNS):
+                    upload = SimpleUploadedFile(f'notes-{i}.txt', b'Management presentation notes', 'text/plain')
+                    response, queries, elapsed = self.request(
+                        self.client_for(role), 'post', reverse('document-upload'),
+                        data={'deal': deal.pk, 'file': upload}, format='multipart',
+                    )
+                    self.assert_budget('document-upload', WRITE_BUDGETS['document-upload'], response, queries)
+                    timings.append(elapsed)
+                self.record_timing('document-upload', role, queries, timings)
+
+    def test_chunked_upload(self):
+        content = b'Data room index ' * 4096
+        chunk_size = len(content) // 4
+        for role in ROLES:
+            with self.subTest(role=role):
+                client = self.client_for(role)
+                deal = Deal.objects.filter(owner=self.users[role]).first()
+                response, queries, elapsed = self.request(
+                    client, 'post', reverse('documentupload-list'),
+                    data={'filename': 'index.pdf', 'size': len(content), 'deal': deal.pk}, format='json',
+                )
+                self.assert_budget('documentupload-create', WRITE_BUDGETS['documentupload-create'], response, queries)
+                self.record_timing('documentupload-create', role, queries, [elapsed])
+
+                upload_id = response.data['id']
+                url = reverse('documentupload-append', kwargs={'pk': upload_id})
+                timings = []
+                for offset in range(0, len(content), chunk_size):
+                    response, queries, elapsed = self.request(
+                        client, 'put', f'{url}?offset={offset}',
+                        data=content[offset:offset + chunk_size], content_type='application/octet-stream',
+                    )
+                    self.assert_budget(
+                        'documentupload-append', WRITE_BUDGETS['documentupload-append'], response, queries,
+                    )
+                    timings.append(elapsed)
+                self.record_timing('documentupload-append', role, queries, timings)
+
+                response, queries, elapsed = self.request(
+                    client, 'post', reverse('documentupload-complete', kwargs={'pk': upload_id}),
+                )
+                self.assert_budget(
+                    'documentupload-complete', WRITE_BUDGETS['documentupload-complete'], response, queries,
+                )
+                self.record_timing('documentupload-complete', role, queries, [elapsed])
+
+    @classmethod
+    def write_timings(cls):
+        path = os.environ.get('QUERY_BUDGET_TIMINGS')
+        if path and cls.timings:
+            report = {
+                'vendor': connection.vendor,
+                'dataset': {
+                    'companies': cls.companies,
+                    'contacts': cls.companies * cls.contacts_per_company,
+                    'deals': cls.deals,
+                    'interactions': cls.deals * cls.interactions_per_deal,
+                    'documents': cls.deals * cls.documents_per_deal,
+                    'tasks': cls.deals * cls.tasks_per_deal,
+                },
+                'endpoints': dict(sorted(cls.timings.items())),
+            }
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+
+        baseline_path = os.environ.get('QUERY_BUDGET_BASELINE')
+        if baseline_path and cls.timings:
+            with open(baseline_path) as file:
+                baseline = json.load(file)['endpoints']
+            slowdown = float(os.environ.get('QUERY_BUDGET_SLOWDOWN', 1.5))
+            for key, timing in sorted(cls.timings.items()):
+                previous = baseline.get(key)
+                if previous and timing['ms'] > previous['ms'] * slowdown:
+                    sys.stderr.write(
+                        f"Slower: {key} {timing['ms']}ms ({timing['queries']} queries), "
+                        f"baseline {previous['ms']}ms ({previous['queries']} queries)\n"
+                    )
@@ -8,9 +8,13 @@ class StageAdmin(admin.ModelAdmin):
     list_filter = ('is_closed', 'is_won')
     ordering = ('order',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_deals_count()
+    
     def deals_count(self, obj):
-        return obj.deals.count()
+        return obj.deals_count
     deals_count.short_description = 'Deals Count'
+    deals_count.admin_order_field = 'deals_count'
 
 
 @admin.register(Deal)
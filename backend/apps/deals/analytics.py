@@ -0,0 +1,231 @@
+from django.db import connections
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F
+from django.db.models.functions import Cast, TruncMonth
+
+from .models import DealStageTransition, Stage
+
+# GROUPING(stage_pk, owner_pk, sector, month) of each grouping set: a bit is
+# set for every column the row is *not* grouped by
+DIMENSIONS = {
+    0b0111: 'by_stage',
+    0b1011: 'by_owner',
+    0b1101: 'by_sector',
+    0b1110: 'by_month',
+    0b1111: 'totals',
+}
+
+ANALYTICS_SQL = """
+    SELECT
+        GROUPING(stage_pk, owner_pk, sector, month) AS grouping_id,
+        stage_pk, stage_label, stage_position,
+        owner_pk, owner_first_name, owner_last_name, owner_email,
+        sector,
+        month,
+        COUNT(*) AS count,
+        COALESCE(SUM(amount), 0) AS amount_total,
+        COALESCE(SUM(expected_value), 0) AS expected_value_total,
+        COUNT(*) FILTER (WHERE closed) AS closed_count,
+        COUNT(*) FILTER (WHERE closed AND won) AS won_count
+    FROM ({deals}) AS deals
+    GROUP BY GROUPING SETS (
+        (stage_pk, stage_label, stage_position),
+        (owner_pk, owner_first_name, owner_last_name, owner_email),
+        (sector),
+        (month),
+        ()
+    )
+"""
+
+
+class PipelineAnalytics:
+    """
+    Pipeline totals of a (filtered, role scoped) deal queryset by stage,
+    owner, company sector and creation month, computed in a single
+    GROUPING SETS query (PostgreSQL).
+
+    Each group has its deal count, unweighted (amount_estimate) and
+    weighted (amount_estimate * probability) totals, and a win rate:
+    deals in won stages over deals in closed stages.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def get_deals_queryset(self):
+        """One row per deal with the grouping keys and the measures"""
+        return self.queryset.order_by().values(
+            stage_pk=F('stage_id'),
+            stage_label=F('stage__name'),
+            stage_position=F('stage__order'),
+            owner_pk=F('owner_id'),
+            owner_first_name=F('owner__first_name'),
+            owner_last_name=F('owner__last_name'),
+            owner_email=F('owner__email'),
+            sector=F('company__sector'),
+            # A date from the database itself: the raw query skips the
+            # converters that would turn DATE_TRUNC's timestamp into one
+            month=Cast(TruncMonth('created_at'), DateField()),
+            amount=F('amount_estimate'),
+            expected_value=ExpressionWrapper(
+                F('amount_estimate') * F('probability'),
+                output_field=DecimalField(max_digits=20, decimal_places=4),
+            ),
+            closed=F('stage__is_closed'),
+            won=F('stage__is_won'),
+        )
+
+    def fetch(self):
+        deals = self.get_deals_queryset()
+        sql, params = deals.query.sql_with_params()
+        with connections[deals.db].cursor() as cursor:
+            cursor.execute(ANALYTICS_SQL.format(deals=sql), params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def metrics(self, row):
+        closed = row['closed_count']
+        return {
+            'count': row['count'],
+            'amount_total': row['amount_total'],
+            'expected_value_total': row['expected_value_total'],
+            'closed_count': closed,
+            'won_count': row['won_count'],
+            'win_rate': row['won_count'] / closed if closed else None,
+        }
+
+    def assemble(self, rows):
+        result = {dimension: [] for dimension in DIMENSIONS.values()}
+        result['totals'] = self.metrics({
+            'count': 0, 'amount_total': 0, 'expected_value_total': 0, 'closed_count': 0, 'won_count': 0,
+        })
+        for row in rows:
+            dimension = DIMENSIONS[row['grouping_id']]
+            if dimension == 'totals':
+                result['totals'] = self.metrics(row)
+            elif dimension == 'by_stage':
+                result['by_stage'].append({
+                    'stage_id': row['stage_pk'],
+                    'stage_name': row['stage_label'],
+                    'order': row['stage_position'],
+                    **self.metrics(row),
+                })
+            elif dimension == 'by_owner':
+                name = f"{row['owner_first_name']} {row['owner_last_name']}".strip()
+                result['by_owner'].append({
+                    'owner_id': row['owner_pk'],
+                    'owner_name': name or row['owner_email'],
+                    **self.metrics(row),
+                })
+            elif dimension == 'by_sector':
+                result['by_sector'].append({'sector': row['sector'], **self.metrics(row)})
+            else:
+                result['by_month'].append({'month': row['month'], **self.metrics(row)})
+
+        result['by_stage'].sort(key=lambda group: group['order'])
+        result['by_owner'].sort(key=lambda group: group['expected_value_total'], reverse=True)
+        result['by_sector'].sort(key=lambda group: group['expected_value_total'], reverse=True)
+        result['by_month'].sort(key=lambda group: group['month'])
+        return result
+
+    def build(self):
+        return self.assemble(self.fetch())
+
+
+# One row per stage visit: when the deal entered the stage, when it left it
+# and for which stage (LEAD over the deal's transitions, in time order)
+VELOCITY_SQL = """
+    WITH visits AS (
+        SELECT
+            transition.stage_id,
+            transition.at,
+            LEAD(transition.at) OVER deal_timeline AS left_at,
+            LEAD(transition.stage_id) OVER deal_timeline AS next_stage_id
+        FROM {transitions} AS transition
+        WHERE transition.deal_id IN ({deals})
+        WINDOW deal_timeline AS (PARTITION BY transition.deal_id ORDER BY transition.at, transition.id)
+    )
+    SELECT
+        visits.stage_id,
+        COUNT(*) AS entered,
+        COUNT(visits.left_at) AS exited,
+        COUNT(*) FILTER (WHERE next_stage."order" > stage."order") AS advanced,
+        percentile_cont(0.5) WITHIN GROUP (
+            ORDER BY EXTRACT(EPOCH FROM visits.left_at - visits.at)
+        ) AS median_seconds,
+        AVG(EXTRACT(EPOCH FROM visits.left_at - visits.at)) AS avg_seconds
+    FROM visits
+    JOIN {stages} AS stage ON stage.id = visits.stage_id
+    LEFT JOIN {stages} AS next_stage ON next_stage.id = visits.next_stage_id
+    WHERE %s::timestamptz IS NULL OR visits.at >= %s::timestamptz
+    GROUP BY visits.stage_id
+"""
+
+SECONDS_PER_DAY = 86400
+
+
+class StageVelocity:
+    """
+    Time in stage and stage-to-stage conversion of a (filtered, role scoped)
+    deal queryset, from the DealStageTransition history (PostgreSQL).
+
+    For each stage: visits that entered it (since ``since``, if given), how
+    many left it and how many of those moved to a later stage (advanced),
+    and the median / average days spent in it by the visits that left it.
+    ``transitions`` counts the moves between each pair of stages.
+    """
+
+    def __init__(self, queryset, since=None):
+        self.queryset = queryset
+        self.since = since
+
+    def get_deal_ids_queryset(self):
+        return self.queryset.order_by().values('pk')
+
+    def fetch_stages(self):
+        deals = self.get_deal_ids_queryset()
+        sql, params = deals.query.sql_with_params()
+        query = VELOCITY_SQL.format(
+            transitions=DealStageTransition._meta.db_table,
+            stages=Stage._meta.db_table,
+            deals=sql,
+        )
+        with connections[deals.db].cursor() as cursor:
+            cursor.execute(query, (*params, self.since, self.since))
+            columns = [column[0] for column in cursor.description]
+            return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+    def fetch_transitions(self):
+        transitions = DealStageTransition.objects.filter(
+            deal__in=self.get_deal_ids_queryset(), from_stage__isnull=False,
+        )
+        if self.since:
+            transitions = transitions.filter(at__gte=self.since)
+        return transitions.order_by().values('from_stage_id', 'stage_id').annotate(count=Count('*'))
+
+    def days(self, seconds):
+        return round(float(seconds) / SECONDS_PER_DAY, 2) if seconds is not None else None
+
+    def build(self):
+        rows = self.fetch_stages()
+        stages = []
+        for stage in Stage.objects.all():
+            row = rows.get(stage.pk, {})
+            entered = row.get('entered', 0)
+            advanced = row.get('advanced', 0)
+            stages.append({
+                'stage_id': stage.pk,
+                'stage_name': stage.name,
+                'order': stage.order,
+                'entered': entered,
+                'exited': row.get('exited', 0),
+                'advanced': advanced,
+                'conversion_rate': advanced / entered if entered else None,
+                'median_days_in_stage': self.days(row.get('median_seconds')),
+                'avg_days_in_stage': self.days(row.get('avg_seconds')),
+            })
+        transitions = [
+            {'from_stage_id': row['from_stage_id'], 'to_stage_id': row['stage_id'], 'count': row['count']}
+            for row in self.fetch_transitions()
+        ]
+        transitions.sort(key=lambda transition: transition['count'], reverse=True)
+        return {'stages': stages, 'transitions': transitions}
@@ -0,0 +1,82 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Deal, Task
+
+
+class ActionDigest:
+    """
+    Overdue and upcoming (within ``days``) open tasks and deal next actions
+    of every user, with the first ``limit`` items of each, built with a
+    fixed number of grouped queries whatever the number of users:
+
+    - task counts per assignee, deal counts per owner (COUNT ... FILTER)
+    - the first items per user (ROW_NUMBER() over each user's items)
+    - the users themselves
+    """
+
+    def __init__(self, days=7, limit=5, now=None):
+        self.now = now or timezone.now()
+        self.horizon = self.now + timedelta(days=days)
+        self.limit = limit
+
+    def get_tasks_queryset(self):
+        # Served by the task_open_due_idx partial index
+        return Task.objects.filter(due_at__lt=self.horizon).exclude(status='done')
+
+    def get_deals_queryset(self):
+        # Served by the deal_next_action_idx partial index
+        return Deal.objects.filter(next_action_at__lt=self.horizon)
+
+    def count_by_user(self, queryset, user_field, date_field):
+        overdue = Q(**{f'{date_field}__lt': self.now})
+        rows = queryset.order_by().values(user_field).annotate(
+            overdue=Count('pk', filter=overdue),
+            upcoming=Count('pk', filter=~overdue),
+        )
+        return {row[user_field]: (row['overdue'], row['upcoming']) for row in rows}
+
+    def first_by_user(self, queryset, user_field, date_field, fields):
+        rows = queryset.annotate(
+            user_rank=Window(RowNumber(), partition_by=F(user_field), order_by=[F(date_field).asc(), F('pk').asc()]),
+        ).filter(user_rank__lte=self.limit).order_by(user_field, 'user_rank').values(user_field, *fields)
+
+        items = defaultdict(list)
+        for row in rows:
+            user_id = row.pop(user_field)
+            row['is_overdue'] = row[date_field] < self.now
+            items[user_id].append(row)
+        return items
+
+    def build(self):
+        """One entry per user with something due, sorted by email"""
+        tasks = self.get_tasks_queryset()
+        deals = self.get_deals_queryset()
+        task_counts = self.count_by_user(tasks, 'assignee_id', 'due_at')
+        deal_counts = self.count_by_user(deals, 'owner_id', 'next_action_at')
+        first_tasks = self.first_by_user(tasks, 'assignee_id', 'due_at', ['id', 'title', 'due_at', 'deal__title'])
+        first_deals = self.first_by_user(
+            deals, 'owner_id', 'next_action_at', ['id', 'title', 'next_action_at', 'company__name'],
+        )
+
+        users = get_user_model().objects.in_bulk(set(task_counts) | set(deal_counts))
+        digests = []
+        for user_id, user in users.items():
+            overdue_tasks, upcoming_tasks = task_counts.get(user_id, (0, 0))
+            overdue_deals, upcoming_deals = deal_counts.get(user_id, (0, 0))
+            digests.append({
+                'user': user,
+                'overdue_tasks': overdue_tasks,
+                'upcoming_tasks': upcoming_tasks,
+                'overdue_deals': overdue_deals,
+                'upcoming_deals': upcoming_deals,
+                'tasks': first_tasks.get(user_id, []),
+                'deals': first_deals.get(user_id, []),
+            })
+        digests.sort(key=lambda digest: digest['user'].email)
+        return digests
@@ -0,0 +1,23 @@
+from django_filters import rest_framework as filters
+
+from .models import Deal, Task
+
+
+class OverdueFilterSet(filters.FilterSet):
+    """``?is_overdue=true|false``, through the queryset's overdue condition (partial indexes)"""
+    is_overdue = filters.BooleanFilter(method='filter_is_overdue')
+
+    def filter_is_overdue(self, queryset, name, value):
+        return queryset.overdue(value)
+
+
+class DealFilter(OverdueFilterSet):
+    class Meta:
+        model = Deal
+        fields = ['stage', 'owner', 'company', 'is_overdue']
+
+
+class TaskFilter(OverdueFilterSet):
+    class Meta:
+        model = Task
+        fields = ['status', 'assignee', 'deal', 'is_overdue']
@@ -0,0 +1,138 @@
+import base64
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .models import Stage
+
+
+def encode_cursor(stage_id, offset):
+    """Opaque cursor pointing at the next slice of a kanban column"""
+    raw = f"{stage_id}:{offset}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Return (stage_id, offset) for a cursor, raise ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        stage_id, offset = (int(part) for part in raw.split(':'))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if offset < 0:
+        raise ValueError('Invalid cursor')
+    return stage_id, offset
+
+
+class KanbanBoard:
+    """
+    Build the pipeline board in a constant number of queries:
+
+    - one query for the stages (with their global deals count)
+    - one aggregate query for per-stage count / amount / expected value
+    - one ordered query for the visible deals, grouped in Python by stage_id
+
+    When ``limit`` is set, each column only loads its first ``limit`` deals
+    (ranked with a window function) and exposes a ``next_cursor`` to fetch
+    the following slice of that column.
+    """
+
+    rank_alias = 'kanban_rank'
+
+    def __init__(self, queryset, limit=None, cursor=None):
+        self.queryset = queryset
+        self.limit = limit
+        self.stage_id = None
+        self.offset = 0
+        if cursor:
+            self.stage_id, self.offset = decode_cursor(cursor)
+            self.queryset = self.queryset.filter(stage_id=self.stage_id)
+
+    def get_stages_queryset(self):
+        queryset = Stage.objects.with_deals_count()
+        if self.stage_id is not None:
+            queryset = queryset.filter(pk=self.stage_id)
+        return queryset
+
+    def get_totals_queryset(self):
+        return (
+            self.queryset
+            .order_by()
+            .values('stage_id')
+            .annotate(
+                count=Count('pk'),
+                amount_total=Sum('amount_estimate'),
+                expected_value_total=Sum(F('amount_estimate') * F('probability')),
+            )
+        )
+
+    def get_ordering(self):
+        ordering = list(self.queryset.query.order_by)
+        if not ordering and self.queryset.query.default_ordering:
+            ordering = list(self.queryset.model._meta.ordering)
+        expressions = []
+        for field in ordering:
+            if not isinstance(field, str):
+                expressions.append(field)
+            elif field.startswith('-'):
+                expressions.append(F(field[1:]).desc())
+            else:
+                expressions.append(F(field).asc())
+        expressions.append(F('pk').asc())
+        return expressions
+
+    def get_deals_queryset(self):
+        if not self.limit and not self.offset:
+            return self.queryset
+
+        queryset = self.queryset.annotate(**{
+            self.rank_alias: Window(
+                expression=RowNumber(),
+                partition_by=[F('stage_id')],
+                order_by=self.get_ordering(),
+            )
+        })
+        bounds = {f'{self.rank_alias}__gt': self.offset}
+        if self.limit:
+            bounds[f'{self.rank_alias}__lte'] = self.offset + self.limit
+        return queryset.filter(**bounds).order_by('stage_id', self.rank_alias)
+
+    def assemble(self, stages, totals, deals):
+        totals_by_stage = {row['stage_id']: row for row in totals}
+        deals_by_stage = defaultdict(list)
+        for deal in deals:
+            deals_by_stage[deal.stage_id].append(deal)
+
+        columns = []
+        for stage in stages:
+            stage_totals = totals_by_stage.get(stage.pk, {})
+            count = stage_totals.get('count', 0)
+            loaded = self.offset + len(deals_by_stage[stage.pk])
+            next_cursor = None
+            if self.limit and loaded < count:
+                next_cursor = encode_cursor(stage.pk, loaded)
+            columns.append({
+                'stage': stage,
+                'deals': deals_by_stage[stage.pk],
+                'count': count,
+                'amount_total': stage_totals.get('amount_total') or 0,
+                'expected_value_total': stage_totals.get('expected_value_total') or 0,
+                'next_cursor': next_cursor,
+            })
+        return columns
+
+    def build(self):
+        return self.assemble(
+            self.get_stages_queryset(),
+            self.get_totals_queryset(),
+            self.get_deals_queryset(),
+        )
+
+    async def abuild(self):
+        """build() with the async ORM"""
+        return self.assemble(
+            [stage async for stage in self.get_stages_queryset()],
+            [row async for row in self.get_totals_queryset()],
+            [deal async for deal in self.get_deals_queryset()],
+        )
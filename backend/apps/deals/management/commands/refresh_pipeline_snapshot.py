@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.deals.snapshots import PipelineSnapshotRefresh
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh the pipeline snapshot of today (or --date) from the deals '
+        'changed since the previous run. Meant to run daily, or more often.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Snapshot day (YYYY-MM-DD), today by default')
+        parser.add_argument(
+            '--overlap', type=int, default=5, metavar='MINUTES',
+            help='Also re-read deals updated this long before the previous run',
+        )
+
+    def handle(self, *args, **options):
+        refresh = PipelineSnapshotRefresh(date=options['date'], overlap=timedelta(minutes=options['overlap']))
+        try:
+            result = refresh.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pipeline snapshot of {result['date']}: {result['changed']} changed deals, "
+            f"{result['removed']} deleted deals applied"
+        ))
@@ -124,11 +124,11 @@ class Command(BaseCommand):
             'Closing': Stage.objects.get(name='Closing'),
         }
         deals_data = [
-            {'title': 'TechCorp Acquisition', 'company': created_companies, 'stage': stages['Due Diligence'], 'amount_estimate': Decimal('5000000.00'), 'description': 'Strategic acquisition of tech company for market expansion'},
-            {'title': 'FinanceFirst Merger', 'company': created_companies, 'stage': stages['LOI'], 'amount_estimate': Decimal('15000000.00'), 'description': 'Merger opportunity in financial services sector'},
-            {'title': 'HealthTech Investment', 'company': created_companies, 'stage': stages['Contacted'], 'amount_estimate': Decimal('2000000.00'), 'description': 'Investment in healthcare technology startup'},
-            {'title': 'Manufacturing Buyout', 'company': created_companies, 'stage': stages['Sourcing'], 'amount_estimate': Decimal('25000000.00'), 'description': 'Management buyout opportunity in manufacturing'},
-            {'title': 'Retail Chain Expansion', 'company': created_companies, 'stage': stages['Closing'], 'amount_estimate': Decimal('8000000.00'), 'description': 'Acquisition for retail chain expansion'},
+            {'title': 'TechCorp Acquisition', 'company': created_companies[0], 'stage': stages['Due Diligence'], 'amount_estimate': Decimal('5000000.00'), 'description': 'Strategic acquisition of tech company for market expansion'},
+            {'title': 'FinanceFirst Merger', 'company': created_companies[1], 'stage': stages['LOI'], 'amount_estimate': Decimal('15000000.00'), 'description': 'Merger opportunity in financial services sector'},
+            {'title': 'HealthTech Investment', 'company': created_companies[2], 'stage': stages['Contacted'], 'amount_estimate': Decimal('2000000.00'), 'description': 'Investment in healthcare technology startup'},
+            {'title': 'Manufacturing Buyout', 'company': created_companies[3], 'stage': stages['Sourcing'], 'amount_estimate': Decimal('25000000.00'), 'description': 'Management buyout opportunity in manufacturing'},
+            {'title': 'Retail Chain Expansion', 'company': created_companies[4], 'stage': stages['Closing'], 'amount_estimate': Decimal('8000000.00'), 'description': 'Acquisition for retail chain expansion'},
         ]
         created_deals = []
         for d in deals_data:
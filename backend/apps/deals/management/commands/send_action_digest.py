@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from apps.deals.digest import ActionDigest
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the overdue / upcoming tasks and deal next actions digest of '
+        'every user and print it, or email it with --email.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Upcoming window in days')
+        parser.add_argument('--limit', type=int, default=5, help='Items listed per section')
+        parser.add_argument('--email', action='store_true', help='Email each user their digest')
+
+    def format_item(self, item, date_field, context_field):
+        flag = 'OVERDUE ' if item['is_overdue'] else ''
+        context = f" ({item[context_field]})" if item[context_field] else ''
+        return f"  - {flag}{item[date_field]:%Y-%m-%d %H:%M} {item['title']}{context}"
+
+    def format_digest(self, digest):
+        lines = [
+            f"Tasks: {digest['overdue_tasks']} overdue, {digest['upcoming_tasks']} upcoming",
+            *(self.format_item(task, 'due_at', 'deal__title') for task in digest['tasks']),
+            f"Deal next actions: {digest['overdue_deals']} overdue, {digest['upcoming_deals']} upcoming",
+            *(self.format_item(deal, 'next_action_at', 'company__name') for deal in digest['deals']),
+        ]
+        return '\n'.join(lines)
+
+    def handle(self, *args, **options):
+        digests = ActionDigest(days=options['days'], limit=options['limit']).build()
+
+        if not options['email']:
+            for digest in digests:
+                self.stdout.write(self.style.MIGRATE_HEADING(digest['user'].email))
+                self.stdout.write(self.format_digest(digest))
+            self.stdout.write(self.style.SUCCESS(f'{len(digests)} digests'))
+            return
+
+        messages = [
+            EmailMessage(
+                subject=(
+                    f"{digest['overdue_tasks'] + digest['overdue_deals']} overdue, "
+                    f"{digest['upcoming_tasks'] + digest['upcoming_deals']} upcoming actions"
+                ),
+                body=self.format_digest(digest),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[digest['user'].email],
+            )
+            for digest in digests if digest['user'].is_active and digest['user'].email
+        ]
+        # One SMTP connection for every message
+        sent = get_connection().send_messages(messages)
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent or 0} of {len(messages)} digests'))
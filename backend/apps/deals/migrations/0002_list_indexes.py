@@ -0,0 +1,71 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0002_list_indexes"),
+        ("deals", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["stage", "owner"], name="deal_stage_owner_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["owner", "-created_at"], name="deal_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["stage", "-created_at"], name="deal_stage_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(
+                fields=["company", "-created_at"], name="deal_company_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["-created_at"], name="deal_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["assignee", "status", "due_at"],
+                name="task_assignee_status_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["status", "due_at"], name="task_status_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["deal", "due_at"], name="task_deal_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["due_at", "-created_at"], name="task_due_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status", "done"), _negated=True),
+                fields=["assignee", "due_at"],
+                name="task_open_assignee_due_idx",
+            ),
+        ),
+    ]
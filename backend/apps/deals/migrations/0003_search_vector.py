@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+from apps.core.search import search_vector_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0003_search_vector"),
+        ("deals", "0002_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deal",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="deal_search_idx"
+            ),
+        ),
+        search_vector_trigger("deals_deal", [("title", "A"), ("description", "B")]),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("deals", "0003_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stage",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
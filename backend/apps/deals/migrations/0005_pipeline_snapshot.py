@@ -0,0 +1,111 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0003_search_vector"),
+        ("deals", "0004_stage_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DealSnapshotLine",
+            fields=[
+                ("deal_id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, max_digits=15, null=True),
+                ),
+                (
+                    "expected_value",
+                    models.DecimalField(decimal_places=4, max_digits=20, null=True),
+                ),
+                ("deal_updated_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PipelineSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("deal_count", models.PositiveIntegerField(default=0)),
+                (
+                    "amount_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                (
+                    "expected_value_total",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=20),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["updated_at"], name="deal_updated_idx"),
+        ),
+        migrations.AddField(
+            model_name="dealsnapshotline",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="dealsnapshotline",
+            name="stage",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="deals.stage",
+            ),
+        ),
+        migrations.AddField(
+            model_name="pipelinesnapshot",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pipeline_snapshots",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="pipelinesnapshot",
+            name="stage",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="snapshots",
+                to="deals.stage",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pipelinesnapshot",
+            index=models.Index(
+                fields=["owner", "date"], name="pipeline_snapshot_owner_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="pipelinesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("date", "stage", "owner"), name="pipeline_snapshot_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("deals", "0005_pipeline_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DealStageTransition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "deal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stage_transitions",
+                        to="deals.deal",
+                    ),
+                ),
+                (
+                    "from_stage",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Previous stage, empty for the stage a deal was created in",
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="deals.stage",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="transitions",
+                        to="deals.stage",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["deal", "at"], name="deal_transition_deal_at_idx"
+                    ),
+                    models.Index(
+                        fields=["stage", "at"], name="deal_transition_stage_at_idx"
+                    ),
+                ],
+            },
+        ),
+        # Existing deals start with the stage they are in now, entered when
+        # they were created (earlier moves were not recorded)
+        migrations.RunSQL(
+            """
+            INSERT INTO deals_dealstagetransition (deal_id, from_stage_id, stage_id, at)
+            SELECT id, NULL, stage_id, created_at FROM deals_deal
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
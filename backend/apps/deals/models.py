@@ -1,8 +1,71 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import DEFERRED, BooleanField, Case, Q, Value, When
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from apps.core.expressions import related_count
+
+
+class StageQuerySet(models.QuerySet):
+    def with_deals_count(self):
+        return self.annotate(deals_count=related_count(self.model, 'deals'))
+
+
+class OverdueQuerySetMixin:
+    """
+    ``is_overdue`` computed by the database (annotation / filter) from the
+    ``overdue_condition(now)`` Q object each queryset using it defines, so
+    it can be filtered and sorted on. Filters use the condition itself
+    rather than the annotation, so that they are served by the partial
+    indexes.
+    """
+    
+    def with_overdue(self, now=None):
+        return self.annotate(is_overdue=Case(
+            When(self.overdue_condition(now), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+    
+    def overdue(self, overdue=True, now=None):
+        condition = self.overdue_condition(now)
+        return self.filter(condition) if overdue else self.exclude(condition)
+
+
+class DealQuerySet(OverdueQuerySetMixin, models.QuerySet):
+    def overdue_condition(self, now=None):
+        return Q(next_action_at__lt=now or timezone.now())
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(): apply the stage default probability
+        # and record the stage transitions here too
+        objs = list(objs)
+        for deal in objs:
+            deal.apply_default_probability()
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            DealStageTransition.objects.using(self.db).record(objs)
+        return objs
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            if 'stage' in fields or 'stage_id' in fields:
+                DealStageTransition.objects.using(self.db).record(objs)
+        return rows
+    
+    def with_related_counts(self):
+        """Annotate interactions_count, documents_count and tasks_count"""
+        return self.annotate(
+            interactions_count=related_count(self.model, 'interactions'),
+            documents_count=related_count(self.model, 'documents'),
+            tasks_count=related_count(self.model, 'tasks'),
+        )
+
 
 class Stage(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -16,6 +79,9 @@ class Stage(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(1)]
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = StageQuerySet.as_manager()
     
     class Meta:
         ordering = ['order']
@@ -24,6 +90,11 @@ class Stage(models.Model):
         return self.name
 
 
+class TaskQuerySet(OverdueQuerySetMixin, models.QuerySet):
+    def overdue_condition(self, now=None):
+        return Q(due_at__lt=now or timezone.now()) & ~Q(status='done')
+
+
 class Deal(models.Model):
     title = models.CharField(max_length=255)
     company = models.ForeignKey(
@@ -57,22 +128,63 @@ class Deal(models.Model):
         help_text="When the next action is due"
     )
     description = models.TextField(blank=True)
+    # Maintained by a database trigger over SEARCH_VECTOR_FIELDS (see
+    # migration 0003_search_vector), which FullTextSearchFilter relies on
+    SEARCH_VECTOR_FIELDS = ['title', 'description']
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DealQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['stage', 'owner'], name='deal_stage_owner_idx'),
+            models.Index(fields=['owner', '-created_at'], name='deal_owner_created_idx'),
+            models.Index(fields=['stage', '-created_at'], name='deal_stage_created_idx'),
+            models.Index(fields=['company', '-created_at'], name='deal_company_created_idx'),
+            models.Index(fields=['-created_at'], name='deal_created_idx'),
+            # Incremental pipeline snapshot refresh (deals changed since the last run)
+            models.Index(fields=['updated_at'], name='deal_updated_idx'),
+            # Deals with a next action only (is_overdue filter, digest)
+            models.Index(
+                fields=['next_action_at'],
+                condition=Q(next_action_at__isnull=False),
+                name='deal_next_action_idx',
+            ),
+            models.Index(
+                fields=['owner', 'next_action_at'],
+                condition=Q(next_action_at__isnull=False),
+                name='deal_owner_next_action_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='deal_search_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.company.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stage as loaded, to detect stage changes on save
+        instance._loaded_stage_id = instance.__dict__.get('stage_id', DEFERRED)
+        return instance
+    
     @property
     def is_overdue(self):
         """Check if next action is overdue"""
+        if '_is_overdue' in self.__dict__:
+            # Annotated by DealQuerySet.with_overdue()
+            return self._is_overdue
         if not self.next_action_at:
             return False
         return timezone.now() > self.next_action_at
     
+    @is_overdue.setter
+    def is_overdue(self, value):
+        self._is_overdue = value
+    
     @property
     def expected_value(self):
         """Calculate expected value (amount * probability)"""
@@ -80,12 +192,106 @@ class Deal(models.Model):
             return None
         return self.amount_estimate * self.probability
     
-    def save(self, *args, **kwargs):
-        # Set default probability from stage if not explicitly set
+    def apply_default_probability(self):
+        """Set default probability from stage if not explicitly set"""
         if self._state.adding and hasattr(self, 'stage') and self.stage:
             if self.probability == 0.00:  # Only if not explicitly set
                 self.probability = self.stage.default_probability
-        super().save(*args, **kwargs)
+    
+    def save(self, *args, **kwargs):
+        self.apply_default_probability()
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if update_fields is None or {'stage', 'stage_id'} & set(update_fields):
+                DealStageTransition.objects.using(self._state.db).record([self])
+
+
+class DealStageTransitionQuerySet(models.QuerySet):
+    def record(self, deals):
+        """
+        Append a transition for each saved deal whose stage differs from the
+        one it was loaded (or created) with
+        """
+        now = timezone.now()
+        transitions = []
+        for deal in deals:
+            loaded = getattr(deal, '_loaded_stage_id', None)
+            if loaded is DEFERRED or loaded == deal.stage_id or deal.pk is None:
+                continue
+            transitions.append(DealStageTransition(deal=deal, from_stage_id=loaded, stage_id=deal.stage_id, at=now))
+            deal._loaded_stage_id = deal.stage_id
+        return self.bulk_create(transitions)
+
+
+class DealStageTransition(models.Model):
+    """Append-only history of the stages a deal entered, and when"""
+    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name='stage_transitions')
+    from_stage = models.ForeignKey(
+        Stage,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Previous stage, empty for the stage a deal was created in"
+    )
+    stage = models.ForeignKey(Stage, on_delete=models.PROTECT, related_name='transitions')
+    at = models.DateTimeField(default=timezone.now)
+    
+    objects = DealStageTransitionQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['at', 'id']
+        indexes = [
+            models.Index(fields=['deal', 'at'], name='deal_transition_deal_at_idx'),
+            models.Index(fields=['stage', 'at'], name='deal_transition_stage_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.deal_id}: {self.from_stage_id} -> {self.stage_id}"
+
+
+class PipelineSnapshot(models.Model):
+    """Pipeline totals of one stage and owner on a given day (see apps.deals.snapshots)"""
+    date = models.DateField()
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, related_name='snapshots')
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='pipeline_snapshots'
+    )
+    deal_count = models.PositiveIntegerField(default=0)
+    amount_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    expected_value_total = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'stage', 'owner'], name='pipeline_snapshot_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'date'], name='pipeline_snapshot_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.stage_id} - {self.owner_id}"
+
+
+class DealSnapshotLine(models.Model):
+    """
+    What a deal adds to the latest pipeline snapshot, so that a refresh can
+    take back the old contribution of a changed or deleted deal. deal_id is
+    not a foreign key: lines of deleted deals must outlive them.
+    """
+    deal_id = models.BigIntegerField(primary_key=True)
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, related_name='+')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=15, decimal_places=2, null=True)
+    expected_value = models.DecimalField(max_digits=20, decimal_places=4, null=True)
+    deal_updated_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Deal {self.deal_id}"
 
 
 class Task(models.Model):
@@ -119,8 +325,24 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaskQuerySet.as_manager()
+    
     class Meta:
         ordering = ['due_at', '-created_at']
+        indexes = [
+            models.Index(fields=['assignee', 'status', 'due_at'], name='task_assignee_status_due_idx'),
+            models.Index(fields=['status', 'due_at'], name='task_status_due_idx'),
+            models.Index(fields=['deal', 'due_at'], name='task_deal_due_idx'),
+            models.Index(fields=['due_at', '-created_at'], name='task_due_created_idx'),
+            # Open tasks only: most task screens hide the done ones
+            models.Index(
+                fields=['assignee', 'due_at'],
+                condition=~Q(status='done'),
+                name='task_open_assignee_due_idx',
+            ),
+            # Overdue / upcoming open tasks of everyone (is_overdue filter, digest)
+            models.Index(fields=['due_at'], condition=~Q(status='done'), name='task_open_due_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -128,6 +350,13 @@ class Task(models.Model):
     @property
     def is_overdue(self):
         """Check if task is overdue"""
+        if '_is_overdue' in self.__dict__:
+            # Annotated by TaskQuerySet.with_overdue()
+            return self._is_overdue
         if not self.due_at or self.status == 'done':
             return False
-        return timezone.now() > self.due_at
\ No newline at end of file
+        return timezone.now() > self.due_at
+    
+    @is_overdue.setter
+    def is_overdue(self, value):
+        self._is_overdue = value
\ No newline at end of file
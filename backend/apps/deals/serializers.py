@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Stage, Deal, Task
 from apps.companies.serializers import CompanySummarySerializer
 from apps.users.serializers import UserSerializer
+from apps.core.bulk import BulkPrimaryKeyRelatedField
 
 
 class StageSerializer(serializers.ModelSerializer):
@@ -10,10 +11,12 @@ class StageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stage
         fields = ['id', 'name', 'order', 'is_closed', 'is_won', 'default_probability', 
-                 'deals_count', 'created_at']
-        read_only_fields = ['id', 'created_at']
+                 'deals_count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_deals_count(self, obj):
+        if hasattr(obj, 'deals_count'):
+            return obj.deals_count
         return obj.deals.count()
 
 
@@ -54,17 +57,24 @@ class DealDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_interactions_count(self, obj):
+        if hasattr(obj, 'interactions_count'):
+            return obj.interactions_count
         return obj.interactions.count()
     
     def get_documents_count(self, obj):
+        if hasattr(obj, 'documents_count'):
+            return obj.documents_count
         return obj.documents.count()
     
     def get_tasks_count(self, obj):
+        if hasattr(obj, 'tasks_count'):
+            return obj.tasks_count
         return obj.tasks.count()
 
 
 class DealCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating and updating deals"""
+    serializer_related_field = BulkPrimaryKeyRelatedField
     
     class Meta:
         model = Deal
@@ -79,6 +89,7 @@ class DealCreateUpdateSerializer(serializers.ModelSerializer):
 
 
 class TaskSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
     deal_title = serializers.CharField(source='deal.title', read_only=True)
     assignee_name = serializers.CharField(source='assignee.full_name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
@@ -101,4 +112,107 @@ class KanbanDealSerializer(serializers.ModelSerializer):
     class Meta:
         model = Deal
         fields = ['id', 'title', 'company_name', 'owner_name', 'amount_estimate',
-                 'probability', 'next_action_at', 'is_overdue']
\ No newline at end of file
+                 'probability', 'next_action_at', 'is_overdue']
+
+
+class KanbanColumnSerializer(serializers.Serializer):
+    """One stage column of the kanban board"""
+    stage = StageSerializer(read_only=True)
+    deals = KanbanDealSerializer(many=True, read_only=True)
+    count = serializers.IntegerField(read_only=True)
+    amount_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    expected_value_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    next_cursor = serializers.CharField(read_only=True, allow_null=True)
+
+
+class PipelineMetricsSerializer(serializers.Serializer):
+    """Totals of one analytics group"""
+    count = serializers.IntegerField(read_only=True)
+    amount_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    expected_value_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    closed_count = serializers.IntegerField(read_only=True)
+    won_count = serializers.IntegerField(read_only=True)
+    win_rate = serializers.FloatField(read_only=True, allow_null=True)
+
+
+class StageMetricsSerializer(PipelineMetricsSerializer):
+    stage_id = serializers.IntegerField(read_only=True)
+    stage_name = serializers.CharField(read_only=True)
+    order = serializers.IntegerField(read_only=True)
+
+
+class OwnerMetricsSerializer(PipelineMetricsSerializer):
+    owner_id = serializers.IntegerField(read_only=True)
+    owner_name = serializers.CharField(read_only=True)
+
+
+class SectorMetricsSerializer(PipelineMetricsSerializer):
+    sector = serializers.CharField(read_only=True)
+
+
+class MonthMetricsSerializer(PipelineMetricsSerializer):
+    month = serializers.DateField(read_only=True)
+
+
+class PipelineAnalyticsSerializer(serializers.Serializer):
+    """Pipeline totals computed by PipelineAnalytics"""
+    totals = PipelineMetricsSerializer(read_only=True)
+    by_stage = StageMetricsSerializer(many=True, read_only=True)
+    by_owner = OwnerMetricsSerializer(many=True, read_only=True)
+    by_sector = SectorMetricsSerializer(many=True, read_only=True)
+    by_month = MonthMetricsSerializer(many=True, read_only=True)
+
+
+class PipelineTrendQuerySerializer(serializers.Serializer):
+    """Query parameters of the pipeline trend"""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=['stage', 'owner'], required=False)
+    stage = serializers.IntegerField(required=False)
+    owner = serializers.IntegerField(required=False)
+    
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must be before end')
+        return attrs
+
+
+class PipelineTrendPointSerializer(serializers.Serializer):
+    """Snapshot totals of one day (and stage or owner)"""
+    date = serializers.DateField(read_only=True)
+    stage_id = serializers.IntegerField(read_only=True, required=False)
+    stage_name = serializers.CharField(read_only=True, required=False)
+    owner_id = serializers.IntegerField(read_only=True, required=False)
+    owner_name = serializers.CharField(read_only=True, required=False)
+    deal_count = serializers.IntegerField(read_only=True)
+    amount_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+    expected_value_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+
+
+class PipelineVelocityQuerySerializer(serializers.Serializer):
+    """Query parameters of the pipeline velocity"""
+    since = serializers.DateField(required=False)
+
+
+class StageVelocitySerializer(serializers.Serializer):
+    stage_id = serializers.IntegerField(read_only=True)
+    stage_name = serializers.CharField(read_only=True)
+    order = serializers.IntegerField(read_only=True)
+    entered = serializers.IntegerField(read_only=True)
+    exited = serializers.IntegerField(read_only=True)
+    advanced = serializers.IntegerField(read_only=True)
+    conversion_rate = serializers.FloatField(read_only=True, allow_null=True)
+    median_days_in_stage = serializers.FloatField(read_only=True, allow_null=True)
+    avg_days_in_stage = serializers.FloatField(read_only=True, allow_null=True)
+
+
+class StageFlowSerializer(serializers.Serializer):
+    from_stage_id = serializers.IntegerField(read_only=True)
+    to_stage_id = serializers.IntegerField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+
+class PipelineVelocitySerializer(serializers.Serializer):
+    """Time in stage and conversions computed by StageVelocity"""
+    stages = StageVelocitySerializer(many=True, read_only=True)
+    transitions = StageFlowSerializer(many=True, read_only=True)
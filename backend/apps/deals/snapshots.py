@@ -0,0 +1,194 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from apps.core.cache import bump_versions_on_commit
+
+from .models import Deal, DealSnapshotLine, PipelineSnapshot
+
+ZERO = Decimal('0')
+
+
+class PipelineSnapshotRefresh:
+    """
+    Bring the pipeline snapshot of ``date`` (today by default) up to date.
+
+    The latest snapshot is carried forward to ``date`` if needed, then only
+    deals whose ``updated_at`` moved since the previous run are read: their
+    previous contribution (DealSnapshotLine) is taken back from the totals
+    and the new one added. Deleted deals are found by an anti-join on the
+    lines and taken back as well. The deals are never aggregated again.
+
+    ``overlap`` re-reads deals updated shortly before the previous run, for
+    transactions that had not committed yet at that point; deals whose line
+    is already up to date are skipped, so they are not counted twice.
+    Deals changed through ``QuerySet.update()`` (which leaves ``updated_at``
+    alone) are only picked up on their next save.
+    """
+    chunk_size = 2000
+
+    def __init__(self, date=None, overlap=timedelta(minutes=5)):
+        self.date = date or timezone.localdate()
+        self.overlap = overlap
+        self.changed = 0
+        self.removed = 0
+
+    def lock(self):
+        # Two concurrent refreshes would apply the same deltas twice
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {PipelineSnapshot._meta.db_table} IN EXCLUSIVE MODE')
+
+    def carry_forward(self):
+        """Copy the latest snapshot to self.date if that day has none yet"""
+        latest = PipelineSnapshot.objects.aggregate(date=Max('date'))['date']
+        if latest is None or latest == self.date:
+            return
+        if latest > self.date:
+            raise ValueError(f'A snapshot exists for a later day ({latest})')
+        PipelineSnapshot.objects.bulk_create([
+            PipelineSnapshot(
+                date=self.date,
+                stage_id=row['stage_id'],
+                owner_id=row['owner_id'],
+                deal_count=row['deal_count'],
+                amount_total=row['amount_total'],
+                expected_value_total=row['expected_value_total'],
+            )
+            for row in PipelineSnapshot.objects.filter(date=latest).values(
+                'stage_id', 'owner_id', 'deal_count', 'amount_total', 'expected_value_total',
+            )
+        ])
+
+    def get_changed_deals(self):
+        watermark = DealSnapshotLine.objects.aggregate(latest=Max('deal_updated_at'))['latest']
+        deals = Deal.objects.order_by()
+        if watermark is not None:
+            deals = deals.filter(updated_at__gte=watermark - self.overlap)
+        return deals.values_list('pk', 'stage_id', 'owner_id', 'amount_estimate', 'probability', 'updated_at')
+
+    def add(self, deltas, line, sign):
+        delta = deltas[(line.stage_id, line.owner_id)]
+        delta[0] += sign
+        delta[1] += sign * (line.amount or ZERO)
+        delta[2] += sign * (line.expected_value or ZERO)
+
+    def collect_deltas(self):
+        """(stage_id, owner_id) -> [count, amount, expected value] changes, lines updated on the way"""
+        deltas = defaultdict(lambda: [0, ZERO, ZERO])
+        deals = self.get_changed_deals().iterator(chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(deals, self.chunk_size))
+            if not chunk:
+                break
+            lines = DealSnapshotLine.objects.in_bulk([row[0] for row in chunk])
+            updated = []
+            for pk, stage_id, owner_id, amount, probability, updated_at in chunk:
+                old = lines.get(pk)
+                if old is not None and old.deal_updated_at == updated_at:
+                    continue
+                new = DealSnapshotLine(
+                    deal_id=pk,
+                    stage_id=stage_id,
+                    owner_id=owner_id,
+                    amount=amount,
+                    expected_value=amount * probability if amount is not None else None,
+                    deal_updated_at=updated_at,
+                )
+                if old is not None:
+                    self.add(deltas, old, -1)
+                self.add(deltas, new, 1)
+                updated.append(new)
+            if updated:
+                DealSnapshotLine.objects.bulk_create(
+                    updated,
+                    update_conflicts=True,
+                    unique_fields=['deal_id'],
+                    update_fields=['stage', 'owner', 'amount', 'expected_value', 'deal_updated_at'],
+                )
+                self.changed += len(updated)
+
+        deleted = DealSnapshotLine.objects.exclude(deal_id__in=Deal.objects.values('pk'))
+        removed = []
+        for line in deleted.iterator(chunk_size=self.chunk_size):
+            self.add(deltas, line, -1)
+            removed.append(line.pk)
+        DealSnapshotLine.objects.filter(pk__in=removed).delete()
+        self.removed = len(removed)
+        return deltas
+
+    def apply(self, deltas):
+        rows = {
+            (row.stage_id, row.owner_id): row
+            for row in PipelineSnapshot.objects.filter(date=self.date)
+        }
+        created, updated, emptied = [], [], []
+        for key, (count, amount, expected_value) in deltas.items():
+            if not count and not amount and not expected_value:
+                continue
+            row = rows.get(key)
+            if row is None:
+                row = PipelineSnapshot(date=self.date, stage_id=key[0], owner_id=key[1])
+                created.append(row)
+            elif row.deal_count + count == 0:
+                emptied.append(row.pk)
+                continue
+            else:
+                updated.append(row)
+            row.deal_count += count
+            row.amount_total += amount
+            row.expected_value_total += expected_value
+
+        PipelineSnapshot.objects.bulk_create(created)
+        PipelineSnapshot.objects.bulk_update(updated, ['deal_count', 'amount_total', 'expected_value_total'])
+        PipelineSnapshot.objects.filter(pk__in=emptied).delete()
+
+    def run(self):
+        with transaction.atomic():
+            self.lock()
+            self.carry_forward()
+            self.apply(self.collect_deltas())
+            bump_versions_on_commit(PipelineSnapshot)
+        return {'date': self.date, 'changed': self.changed, 'removed': self.removed}
+
+
+def pipeline_trend(snapshots, group_by=None):
+    """
+    Daily totals of a PipelineSnapshot queryset, overall or by ``stage`` or
+    ``owner``. Only reads snapshot rows (indexed on date and owner).
+    """
+    keys = ['date']
+    ordering = ['date']
+    if group_by == 'stage':
+        keys += ['stage_id', 'stage__name', 'stage__order']
+        ordering += ['stage__order']
+    elif group_by == 'owner':
+        keys += ['owner_id', 'owner__first_name', 'owner__last_name', 'owner__email']
+        ordering += ['owner_id']
+
+    rows = snapshots.order_by().values(*keys).annotate(
+        deal_count_sum=Sum('deal_count'),
+        amount_sum=Sum('amount_total'),
+        expected_value_sum=Sum('expected_value_total'),
+    ).order_by(*ordering)
+
+    points = []
+    for row in rows:
+        point = {
+            'date': row['date'],
+            'deal_count': row['deal_count_sum'],
+            'amount_total': row['amount_sum'],
+            'expected_value_total': row['expected_value_sum'],
+        }
+        if group_by == 'stage':
+            point.update(stage_id=row['stage_id'], stage_name=row['stage__name'])
+        elif group_by == 'owner':
+            name = f"{row['owner__first_name']} {row['owner__last_name']}".strip()
+            point.update(owner_id=row['owner_id'], owner_name=name or row['owner__email'])
+        points.append(point)
+    return points
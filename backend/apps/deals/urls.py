@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import StageViewSet, DealViewSet, TaskViewSet
+from apps.core.async_views import async_action_path
 
 router = DefaultRouter()
 router.register(r'stages', StageViewSet)
@@ -9,4 +11,11 @@ router.register(r'tasks', TaskViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_API_VIEWS:
+    # Async versions of the read hot paths, matched before the router's
+    urlpatterns = [
+        async_action_path('deals/kanban/', DealViewSet, 'kanban', name='deal-kanban'),
+        async_action_path('tasks/my_tasks/', TaskViewSet, 'my_tasks', name='task-my-tasks'),
+    ] + urlpatterns
@@ -1,45 +1,92 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.settings import api_settings
 from django.db.models import Q
+from django.utils import timezone
 
-from .models import Stage, Deal, Task
+from .models import Stage, Deal, Task, PipelineSnapshot
 from .serializers import (
     StageSerializer, DealListSerializer, DealDetailSerializer, 
-    DealCreateUpdateSerializer, TaskSerializer, KanbanDealSerializer
+    DealCreateUpdateSerializer, TaskSerializer, KanbanColumnSerializer, PipelineAnalyticsSerializer,
+    PipelineTrendQuerySerializer, PipelineTrendPointSerializer, PipelineVelocityQuerySerializer,
+    PipelineVelocitySerializer
 )
+from .analytics import PipelineAnalytics, StageVelocity
+from .filters import DealFilter, TaskFilter
+from .kanban import KanbanBoard
+from .snapshots import pipeline_trend
+from apps.core.async_views import AsyncActionsMixin
+from apps.core.bulk import BulkModelMixin
+from apps.core.cache import cache_response
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.export import ExportMixin
+from apps.core.filters import FullTextSearchFilter
+from apps.documents.archive import DocumentArchive, ZipRenderer, archive_response, missing_checksums
+from apps.documents.models import NDA
 from apps.users.permissions import IsAdminOrAssociateOrReadOnly, CanAccessDeal
 
+# Seconds a cached kanban or my_tasks response may show is_overdue stale
+OVERDUE_CACHE_BUCKET = 60
+
 
-class StageViewSet(viewsets.ModelViewSet):
-    queryset = Stage.objects.all()
+class StageViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Stage.objects.with_deals_count()
+    etag_dependencies = [Deal]
     serializer_class = StageSerializer
     permission_classes = [IsAdminOrAssociateOrReadOnly]
     ordering = ['order']
+    
+    @cache_response(Stage, Deal, per_role=True)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response(Stage, Deal, per_role=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
-class DealViewSet(viewsets.ModelViewSet):
-    queryset = Deal.objects.select_related('company', 'owner', 'stage').all()
+class DealViewSet(AsyncActionsMixin, ConditionalGetMixin, BulkModelMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Deal.objects.select_related('company', 'owner', 'stage').defer(
+        'search_vector', 'company__search_vector',
+    )
+    etag_dependencies = [
+        'companies.company', Stage, 'users.user', Task, 'interactions.interaction', 'documents.document',
+    ]
+    etag_time_dependent = ['is_overdue']
     permission_classes = [CanAccessDeal]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['stage', 'owner', 'company']
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
+    filterset_class = DealFilter
     search_fields = ['title', 'company__name', 'description']
-    ordering_fields = ['title', 'amount_estimate', 'probability', 'next_action_at', 'created_at']
+    ordering_fields = ['title', 'amount_estimate', 'probability', 'next_action_at', 'is_overdue', 'created_at']
     ordering = ['-created_at']
+    export_fields = [
+        'id', 'title', 'company_id', 'company__name', 'owner__email', 'stage__name',
+        'amount_estimate', 'probability', 'next_action_at', 'created_at', 'updated_at',
+    ]
+    trend_default_days = 90
     
     def get_serializer_class(self):
-        if self.action == 'list' or self.action == 'kanban':
+        if self.action in [
+            'list', 'kanban', 'export', 'analytics', 'analytics_trend', 'analytics_velocity', 'documents_archive',
+        ]:
             return DealListSerializer
-        elif self.action in ['create', 'update', 'partial_update']:
+        elif self.action in ['create', 'update', 'partial_update', 'bulk']:
             return DealCreateUpdateSerializer
         return DealDetailSerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().with_overdue()
         user = self.request.user
         
+        if self.get_serializer_class() is DealDetailSerializer:
+            queryset = queryset.with_related_counts()
+        
         # Apply role-based filtering
         if user.is_admin():
             return queryset
@@ -59,29 +106,108 @@ class DealViewSet(viewsets.ModelViewSet):
         else:
             serializer.save()
     
+    def get_kanban_board(self, request):
+        """KanbanBoard of the filtered deals, ValueError on an invalid limit or cursor"""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if limit < 1:
+                    raise ValueError
+            except ValueError:
+                raise ValueError('limit must be a positive integer')
+
+        return KanbanBoard(queryset, limit=limit, cursor=request.query_params.get('cursor'))
+    
     @action(detail=False, methods=['get'])
+    @cache_response(Deal, Stage, 'companies.company', 'users.user', per_role=True, time_bucket=OVERDUE_CACHE_BUCKET)
     def kanban(self, request):
-        """Return deals grouped by stage for kanban view"""
-        queryset = self.get_queryset()
-        
-        # Apply filters
-        queryset = self.filter_queryset(queryset)
+        """
+        Return deals grouped by stage for kanban view.
+
+        Optional query params:
+        - limit: max number of deals loaded per column
+        - cursor: next_cursor of a column, loads the following slice of it
+        """
+        try:
+            board = self.get_kanban_board(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = KanbanColumnSerializer(board.build(), many=True)
+        return Response(serializer.data)
+    
+    @cache_response(Deal, Stage, 'companies.company', 'users.user', per_role=True, time_bucket=OVERDUE_CACHE_BUCKET)
+    async def akanban(self, request):
+        """kanban with the async ORM (ASYNC_API_VIEWS)"""
+        try:
+            board = await sync_to_async(self.get_kanban_board)(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = KanbanColumnSerializer(await board.abuild(), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Pipeline totals (count, amount, expected value, win rate) by stage,
+        owner, company sector and month of creation, over the filtered deals.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = PipelineAnalyticsSerializer(PipelineAnalytics(queryset).build())
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='analytics/trend')
+    @cache_response(PipelineSnapshot, per_role=True)
+    def analytics_trend(self, request):
+        """
+        Daily pipeline totals from the snapshots (refresh_pipeline_snapshot).
+
+        Optional query params:
+        - start, end: date range, the last 90 days by default
+        - group_by: stage or owner
+        - stage, owner: only the totals of one stage or owner
+        """
+        params = PipelineTrendQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        end = params.validated_data.get('end') or timezone.localdate()
+        start = params.validated_data.get('start') or end - timedelta(days=self.trend_default_days)
         
-        # Group deals by stage
-        stages = Stage.objects.all()
-        kanban_data = []
+        snapshots = PipelineSnapshot.objects.filter(date__range=(start, end))
+        user = request.user
+        if user.is_analyst():
+            # Analysts only see their own deals
+            snapshots = snapshots.filter(owner=user)
+        elif not (user.is_admin() or user.is_associate()):
+            snapshots = snapshots.none()
+        for field in ['stage', 'owner']:
+            if field in params.validated_data:
+                snapshots = snapshots.filter(**{f'{field}_id': params.validated_data[field]})
         
-        for stage in stages:
-            stage_deals = queryset.filter(stage=stage)
-            deals_data = KanbanDealSerializer(stage_deals, many=True).data
-            
-            kanban_data.append({
-                'stage': StageSerializer(stage).data,
-                'deals': deals_data,
-                'count': len(deals_data)
-            })
+        points = pipeline_trend(snapshots, params.validated_data.get('group_by'))
+        return Response(PipelineTrendPointSerializer(points, many=True).data)
+    
+    @action(detail=False, methods=['get'], url_path='analytics/velocity')
+    def analytics_velocity(self, request):
+        """
+        Median / average days in each stage and stage-to-stage conversion
+        of the filtered deals, from their stage transition history.
+
+        Optional query params:
+        - since: only stage visits that started on or after this date
+        """
+        params = PipelineVelocityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data.get('since')
+        if since is not None:
+            since = timezone.make_aware(datetime.combine(since, time.min))
         
-        return Response(kanban_data)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = PipelineVelocitySerializer(StageVelocity(queryset, since=since).build())
+        return Response(serializer.data)
     
     @action(detail=True, methods=['patch'])
     def move_stage(self, request, pk=None):
@@ -111,19 +237,70 @@ class DealViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='documents/archive',
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ZipRenderer],
+    )
+    def documents_archive(self, request, pk=None):
+        """
+        Zip of the deal's documents, built from storage as it is sent (see
+        apps.documents.archive.DocumentArchive). Range requests resume an
+        interrupted download.
+
+        Query params (comma separated values):
+        - content_type: only the documents of these MIME types
+        - nda_status: only the documents of the deal's NDAs with these statuses
+        """
+        deal = self.get_object()
+        documents = deal.documents.exclude(file='').only(
+            'id', 'deal', 'filename', 'file', 'size', 'crc32', 'uploaded_at',
+        ).order_by('filename', 'pk')
+        
+        content_types = [value for value in request.query_params.get('content_type', '').split(',') if value]
+        if content_types:
+            documents = documents.filter(content_type__in=content_types)
+        nda_statuses = [value for value in request.query_params.get('nda_status', '').split(',') if value]
+        if nda_statuses:
+            unknown = set(nda_statuses) - dict(NDA.STATUS_CHOICES).keys()
+            if unknown:
+                return Response(
+                    {'error': f"Unknown NDA status: {', '.join(sorted(unknown))}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            documents = documents.filter(
+                nda_references__deal=deal, nda_references__status__in=nda_statuses,
+            ).distinct()
+        
+        documents = list(documents)
+        missing = missing_checksums(documents)
+        if missing:
+            return Response(
+                {
+                    'error': 'Some documents are not ready to be archived, retry later',
+                    'documents': [document.pk for document in missing],
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        archive = DocumentArchive(documents)
+        return archive_response(request, archive, f'{deal.title}.zip')
 
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.select_related('deal', 'assignee', 'created_by').all()
+
+class TaskViewSet(AsyncActionsMixin, ConditionalGetMixin, BulkModelMixin, viewsets.ModelViewSet):
+    queryset = Task.objects.select_related('deal', 'assignee', 'created_by').defer('deal__search_vector')
+    etag_dependencies = [Deal, 'users.user']
+    etag_time_dependent = ['is_overdue']
     serializer_class = TaskSerializer
     permission_classes = [CanAccessDeal]  # Tasks follow deal access rules
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'assignee', 'deal']
+    filterset_class = TaskFilter
     search_fields = ['title', 'description']
-    ordering_fields = ['title', 'due_at', 'created_at']
+    ordering_fields = ['title', 'due_at', 'is_overdue', 'created_at']
     ordering = ['due_at', '-created_at']
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().with_overdue()
         user = self.request.user
         
         # Apply role-based filtering similar to deals
@@ -142,11 +319,18 @@ class TaskViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    def get_bulk_create_defaults(self):
+        return {'created_by': self.request.user}
+    
+    def get_my_tasks_queryset(self):
+        queryset = self.get_queryset().filter(assignee=self.request.user)
+        return self.filter_queryset(queryset)
+    
     @action(detail=False, methods=['get'])
+    @cache_response(Task, Deal, 'users.user', time_bucket=OVERDUE_CACHE_BUCKET)
     def my_tasks(self, request):
         """Get tasks assigned to current user"""
-        queryset = self.get_queryset().filter(assignee=request.user)
-        queryset = self.filter_queryset(queryset)
+        queryset = self.get_my_tasks_queryset()
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -154,4 +338,17 @@ class TaskViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(serializer.data)
         
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+    
+    @cache_response(Task, Deal, 'users.user', time_bucket=OVERDUE_CACHE_BUCKET)
+    async def amy_tasks(self, request):
+        """my_tasks with the async ORM (ASYNC_API_VIEWS)"""
+        queryset = await sync_to_async(self.get_my_tasks_queryset)()
+        
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer([task async for task in queryset], many=True)
+        return Response(serializer.data)
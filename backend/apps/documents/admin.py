@@ -4,16 +4,20 @@ from .models import Document, NDA
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ('filename', 'deal', 'size_human', 'content_type', 'uploaded_by', 'uploaded_at')
-    list_filter = ('content_type', 'uploaded_by', 'uploaded_at')
+    list_display = ('filename', 'deal', 'size_human', 'content_type', 'status', 'uploaded_by', 'uploaded_at')
+    list_filter = ('status', 'content_type', 'uploaded_by', 'uploaded_at')
     search_fields = ('filename', 'deal__title')
     ordering = ('-uploaded_at',)
-    readonly_fields = ('size', 'content_type', 'uploaded_at', 'size_human', 'file_extension')
+    readonly_fields = ('size', 'content_type', 'uploaded_at', 'size_human', 'file_extension',
+                       'status', 'page_count', 'thumbnail')
     
     fieldsets = (
         ('File Information', {
             'fields': ('filename', 'file', 'size_human', 'content_type', 'file_extension')
         }),
+        ('Processing', {
+            'fields': ('status', 'page_count', 'thumbnail')
+        }),
         ('Association', {
             'fields': ('deal', 'uploaded_by')
         }),
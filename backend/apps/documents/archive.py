@@ -0,0 +1,299 @@
+import hashlib
+import logging
+import re
+import struct
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.core.export import ExportRenderer
+from apps.core.streaming import streaming_content
+
+from .storage import read_file
+
+logger = logging.getLogger(__name__)
+
+# Beyond these, sizes / offsets / entry counts go to ZIP64 records, the
+# classic fields holding the markers
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+ZIP64_EXTRA = 0x0001
+
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+# Made by: Unix (file permissions in the external attributes), spec 4.5
+MADE_BY = (3 << 8) | ZIP64_VERSION
+UTF8_NAMES = 0x0800
+STORED = 0
+FILE_ATTRIBUTES = 0o100644 << 16
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class ZipRenderer(ExportRenderer):
+    media_type = 'application/zip'
+    format = 'zip'
+
+
+def dos_datetime(value):
+    """(time, date) fields of a zip entry, local time"""
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    return (
+        (value.hour << 11) | (value.minute << 5) | (value.second // 2),
+        ((value.year - 1980) << 9) | (value.month << 5) | value.day,
+    )
+
+
+def entry_names(documents):
+    """Unique file names of the documents in the archive: report.pdf, report (2).pdf..."""
+    taken = set()
+    names = []
+    for document in documents:
+        name = re.sub(r'[/\\\x00-\x1f]', '_', document.filename).strip(' .') or f'document-{document.pk}'
+        base, dot, extension = name.rpartition('.')
+        if not dot:
+            base, extension = name, ''
+        candidate = name
+        number = 2
+        while candidate.lower() in taken:
+            candidate = f'{base} ({number}).{extension}' if dot else f'{base} ({number})'
+            number += 1
+        taken.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def missing_checksums(documents):
+    """
+    Documents without a CRC-32 (stored before it was computed at upload),
+    queued by the checksum_documents command: reading them whole to compute
+    it would hold the request for as long as the files take to download
+    """
+    return [document for document in documents if document.crc32 is None]
+
+
+class ArchiveEntry:
+    def __init__(self, document, name):
+        self.document = document
+        self.name = name.encode()
+        self.size = document.size
+        self.crc32 = document.crc32
+        self.time, self.date = dos_datetime(document.uploaded_at)
+        self.offset = 0
+
+    def local_header(self):
+        zip64 = self.size >= ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', ZIP64_EXTRA, 16, self.size, self.size) if zip64 else b''
+        size = ZIP64_MARKER if zip64 else self.size
+        return struct.pack(
+            '<IHHHHHIIIHH',
+            0x04034B50,
+            ZIP64_VERSION if zip64 else ZIP_VERSION,
+            UTF8_NAMES,
+            STORED,
+            self.time,
+            self.date,
+            self.crc32,
+            size,
+            size,
+            len(self.name),
+            len(extra),
+        ) + self.name + extra
+
+    def central_header(self):
+        values = []
+        size = offset = None
+        if self.size >= ZIP64_LIMIT:
+            values += [self.size, self.size]
+            size = ZIP64_MARKER
+        if self.offset >= ZIP64_LIMIT:
+            values.append(self.offset)
+            offset = ZIP64_MARKER
+        extra = struct.pack(f'<HH{len(values)}Q', ZIP64_EXTRA, 8 * len(values), *values) if values else b''
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII',
+            0x02014B50,
+            MADE_BY,
+            ZIP64_VERSION if values else ZIP_VERSION,
+            UTF8_NAMES,
+            STORED,
+            self.time,
+            self.date,
+            self.crc32,
+            self.size if size is None else size,
+            self.size if size is None else size,
+            len(self.name),
+            len(extra),
+            0,
+            0,
+            0,
+            FILE_ATTRIBUTES,
+            self.offset if offset is None else offset,
+        ) + self.name + extra
+
+
+def end_records(count, directory_size, directory_offset):
+    """End of central directory record, preceded by the ZIP64 ones when needed"""
+    if count < ZIP64_COUNT_LIMIT and directory_size < ZIP64_LIMIT and directory_offset < ZIP64_LIMIT:
+        return struct.pack(
+            '<IHHHHIIH', 0x06054B50, 0, 0, count, count, directory_size, directory_offset, 0,
+        )
+    zip64_offset = directory_offset + directory_size
+    return struct.pack(
+        '<IQHHIIQQQQ',
+        0x06064B50,
+        44,
+        MADE_BY,
+        ZIP64_VERSION,
+        0,
+        0,
+        count,
+        count,
+        directory_size,
+        directory_offset,
+    ) + struct.pack('<IIQI', 0x07064B50, 0, zip64_offset, 1) + struct.pack(
+        '<IHHHHIIH', 0x06054B50, 0, 0, ZIP64_COUNT_MARKER, ZIP64_COUNT_MARKER, ZIP64_MARKER, ZIP64_MARKER, 0,
+    )
+
+
+class DocumentArchive:
+    """
+    Zip archive of documents, streamed from storage as it is sent.
+
+    Entries are stored, not deflated: PDFs and Office files (zip themselves)
+    are already compressed, and a stored entry's size is known without
+    reading it. The whole layout, hence the archive size and every byte
+    offset, is then known before the first byte goes out, so the response
+    has a Content-Length and any byte range can be served (resumed
+    downloads) by reading only the files it covers. CRC-32s come from the
+    documents (Document.crc32): every document must have one, see
+    missing_checksums.
+
+    Memory use does not depend on the size of the archive: file contents
+    are read by blocks, only headers are kept in memory.
+    """
+
+    def __init__(self, documents):
+        self.entries = [ArchiveEntry(document, name) for document, name in zip(documents, entry_names(documents))]
+        # (offset, bytes or entry): the headers and files, in archive order
+        self.parts = []
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            header = entry.local_header()
+            self.parts.append((offset, header))
+            offset += len(header)
+            self.parts.append((offset, entry))
+            offset += entry.size
+        directory = b''.join(entry.central_header() for entry in self.entries)
+        self.directory = directory + end_records(len(self.entries), len(directory), offset)
+        self.parts.append((offset, self.directory))
+        self.size = offset + len(self.directory)
+
+    @property
+    def etag(self):
+        """Strong ETag: the central directory has every name, size, CRC and offset"""
+        return f'"{hashlib.sha256(self.directory).hexdigest()[:32]}"'
+
+    def iter_range(self, start, stop):
+        """Bytes start to stop (excluded) of the archive, by blocks"""
+        for offset, part in self.parts:
+            if isinstance(part, bytes):
+                length = len(part)
+            else:
+                length = part.size
+            if offset + length <= start:
+                continue
+            if offset >= stop:
+                break
+            first = max(start, offset) - offset
+            last = min(stop, offset + length) - offset
+            if isinstance(part, bytes):
+                yield part[first:last]
+                continue
+            expected = last - first
+            for block in read_file(part.document.file.name, first, expected, READ_BLOCK_SIZE):
+                # Never send more than the layout says, whatever the storage returns
+                block = block[:expected]
+                expected -= len(block)
+                yield block
+            if expected:
+                # The stored file is shorter than Document.size: the archive
+                # would be corrupt, abort the response
+                name = part.document.file.name
+                logger.error('Document %s: %d bytes missing from %s', part.document.pk, expected, name)
+                raise OSError(f'{name} is shorter than its recorded size')
+
+
+def parse_range(header, size):
+    """
+    (start, stop) of a single ``bytes=`` range of a resource of ``size``
+    bytes; None when the whole resource should be sent (no header, invalid
+    or several ranges). ValueError if the range is not satisfiable.
+    """
+    match = RANGE_PATTERN.fullmatch(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        if int(last) == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - int(last), 0), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Range starts past the end')
+    return start, min(int(last) + 1, size) if last else size
+
+
+def archive_response(request, archive, filename):
+    """
+    Response sending ``archive`` (a DocumentArchive) as ``filename``: the
+    requested byte range (206) when there is a satisfiable Range header and
+    If-Range, if any, is the archive's ETag; the whole archive otherwise
+    """
+    try:
+        byte_range = parse_range(request.headers.get('Range'), archive.size)
+    except ValueError:
+        response = Response(
+            {'error': 'Range not satisfiable'}, status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        response['Content-Range'] = f'bytes */{archive.size}'
+        return response
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != archive.etag:
+        # The documents changed since the first part was downloaded
+        byte_range = None
+
+    start, stop = byte_range or (0, archive.size)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type='application/zip')
+    else:
+        # Storage reads only: any thread will do
+        content = streaming_content(request._request, archive.iter_range(start, stop), thread_sensitive=False)
+        response = StreamingHttpResponse(content, content_type='application/zip')
+    if byte_range:
+        response.status_code = status.HTTP_206_PARTIAL_CONTENT
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+    response['Content-Length'] = stop - start
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    # Stream to the client at its pace instead of nginx spooling up to 1GB
+    # of the archive to disk
+    response['X-Accel-Buffering'] = 'no'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import BigIntegerField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+from apps.documents.models import CHECKSUM_TASK, Document
+from apps.jobs.models import Job
+from apps.jobs.queue import enqueue_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue the CRC-32 computation of the documents stored without one (uploaded '
+        'before it was computed at upload), unless already queued: deal document '
+        'archives are refused until every document has one. Run by the run_jobs workers.'
+    )
+
+    def handle(self, *args, **options):
+        queued = (
+            Job.objects.filter(task=CHECKSUM_TASK).exclude(status=Job.FAILED)
+            .annotate(document_id=Cast(KT('payload__document_id'), BigIntegerField()))
+            .values('document_id')
+        )
+        document_ids = (
+            Document.objects.filter(crc32__isnull=True).exclude(file='')
+            .exclude(pk__in=queued)
+            .values_list('pk', flat=True)
+        )
+        jobs = enqueue_many(CHECKSUM_TASK, [{'document_id': pk} for pk in document_ids.iterator()])
+        self.stdout.write(self.style.SUCCESS(f'{len(jobs)} documents queued for checksumming'))
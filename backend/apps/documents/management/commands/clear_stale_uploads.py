@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.documents.models import DocumentUpload
+
+
+class Command(BaseCommand):
+    help = 'Delete the uploads (and their staged or uploaded data) left without a new chunk for --hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = DocumentUpload.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for upload in stale.iterator():
+            if upload.storage_key:
+                default_storage.delete(upload.storage_key)
+            else:
+                upload.delete_staging_file()
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count} stale uploads deleted'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import BigIntegerField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+from apps.documents.models import PROCESS_TASK, Document
+from apps.jobs.models import Job
+from apps.jobs.queue import enqueue_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue the processing (MIME type, text, pages, thumbnail) of the documents '
+        'in --status (pending by default, e.g. those uploaded before processing '
+        'existed), unless already queued. Run by the run_jobs workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status', nargs='+', default=[Document.PENDING],
+            choices=[choice for choice, _ in Document.STATUS_CHOICES],
+        )
+
+    def handle(self, *args, **options):
+        queued = (
+            Job.objects.filter(task=PROCESS_TASK).exclude(status=Job.FAILED)
+            .annotate(document_id=Cast(KT('payload__document_id'), BigIntegerField()))
+            .values('document_id')
+        )
+        document_ids = (
+            Document.objects.filter(status__in=options['status'])
+            .exclude(pk__in=queued)
+            .values_list('pk', flat=True)
+        )
+        jobs = enqueue_many(PROCESS_TASK, [{'document_id': pk} for pk in document_ids.iterator()])
+        self.stdout.write(self.style.SUCCESS(f'{len(jobs)} documents queued for processing'))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("deals", "0002_list_indexes"),
+        ("documents", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["deal", "-uploaded_at"], name="document_deal_uploaded_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["uploaded_by", "-uploaded_at"], name="document_uploader_upl_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["content_type", "-uploaded_at"],
+                name="document_type_uploaded_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(fields=["-uploaded_at"], name="document_uploaded_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="nda",
+            index=models.Index(
+                fields=["deal", "-created_at"], name="nda_deal_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="nda",
+            index=models.Index(
+                fields=["status", "-created_at"], name="nda_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="nda",
+            index=models.Index(fields=["-created_at"], name="nda_created_idx"),
+        ),
+    ]
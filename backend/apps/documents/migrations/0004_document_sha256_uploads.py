@@ -0,0 +1,81 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:24
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("deals", "0007_overdue_indexes"),
+        ("documents", "0003_document_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255)),
+                ("size", models.PositiveIntegerField(help_text="Total size in bytes")),
+                ("received", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(fields=["sha256"], name="document_sha256_idx"),
+        ),
+        migrations.AddField(
+            model_name="documentupload",
+            name="deal",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="uploads",
+                to="deals.deal",
+            ),
+        ),
+        migrations.AddField(
+            model_name="documentupload",
+            name="uploaded_by",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="document_uploads",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="documentupload",
+            index=models.Index(
+                fields=["uploaded_by", "-created_at"], name="document_upload_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="documentupload",
+            index=models.Index(
+                fields=["updated_at"], name="document_upload_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:29
+
+import apps.documents.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0004_document_sha256_uploads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="documentupload",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="documentupload",
+            name="storage_key",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name="document",
+            name="file",
+            field=models.FileField(
+                max_length=500, upload_to=apps.documents.models.document_upload_path
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:41
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from apps.core.search import search_vector_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0006_document_processing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="documentcontent",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="documentcontent",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="document_content_search_idx"
+            ),
+        ),
+        search_vector_trigger("documents_documentcontent", [("text", "A")]),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0007_document_content_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="crc32",
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
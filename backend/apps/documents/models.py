@@ -1,8 +1,21 @@
+import hashlib
+import mimetypes
 import os
-import magic
+import uuid
+import zlib
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+from apps.jobs.queue import enqueue
+
+# Tâche de traitement des documents (apps.jobs)
+PROCESS_TASK = 'apps.documents.processing.process_document'
+# CRC-32 des documents stockés avant qu'il soit calculé à l'upload
+CHECKSUM_TASK = 'apps.documents.processing.checksum_document'
 
 
 def document_upload_path(instance, filename):
@@ -13,7 +26,35 @@ def document_upload_path(instance, filename):
     return f"documents/{instance.deal.id if instance.deal else 'general'}/{filename}"
 
 
+def file_checksums(file):
+    """Empreinte SHA-256 (hex) et CRC-32 d'un fichier, lus en une passe par blocs."""
+    digest = hashlib.sha256()
+    crc = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        crc = zlib.crc32(chunk, crc)
+    file.seek(0)
+    return digest.hexdigest(), crc
+
+
+def file_sha256(file):
+    """Empreinte SHA-256 (hex) d'un fichier, lu par blocs."""
+    return file_checksums(file)[0]
+
+
 class Document(models.Model):
+    # Traitement en tâche de fond (apps.documents.processing)
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
     deal = models.ForeignKey(
         'deals.Deal',
         on_delete=models.CASCADE,
@@ -22,32 +63,55 @@ class Document(models.Model):
         blank=True,
     )
     filename = models.CharField(max_length=255)
-    file = models.FileField(upload_to=document_upload_path)
+    # Documents with the same content share one stored blob (see save()):
+    # never delete a document's file without checking the other references
+    file = models.FileField(upload_to=document_upload_path, max_length=500)
     size = models.PositiveIntegerField(help_text="File size in bytes")
     content_type = models.CharField(max_length=100)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # CRC-32 du contenu, pour les archives zip (apps.documents.archive)
+    crc32 = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.FileField(upload_to='thumbnails/', max_length=500, blank=True)
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='uploaded_documents',
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['deal', '-uploaded_at'], name='document_deal_uploaded_idx'),
+            models.Index(fields=['uploaded_by', '-uploaded_at'], name='document_uploader_upl_idx'),
+            models.Index(fields=['content_type', '-uploaded_at'], name='document_type_uploaded_idx'),
+            models.Index(fields=['-uploaded_at'], name='document_uploaded_idx'),
+            models.Index(fields=['sha256'], name='document_sha256_idx'),
+        ]
 
     def __str__(self):
         return self.filename
 
     def save(self, *args, **kwargs):
         """
-        À chaque sauvegarde:
+        Pour un nouveau fichier (pas encore stocké):
         - Met à jour filename à partir de file.name
         - Calcule size (avec fallback si .size indisponible)
-        - Détecte content_type via python-magic (fallback application/octet-stream)
+        - Devine content_type d'après l'extension, en attendant le traitement
+        - Calcule sha256 (et crc32) et réutilise le blob d'un document au contenu identique
+          au lieu de stocker le fichier une deuxième fois
+
+        Nouveau document ou nouveau fichier: le type MIME réel, le texte, le
+        nombre de pages et la vignette sont calculés en tâche de fond
+        (apps.documents.processing), hors de la requête.
         """
-        if self.file:
+        process = self._state.adding or (self.file and not self.file._committed)
+        if self.file and not self.file._committed:
             # Nom de fichier stocké
-            self.filename = self.file.name
+            self.filename = os.path.basename(self.file.name)
 
             # Taille du fichier
             try:
@@ -61,15 +125,22 @@ class Document(models.Model):
             except Exception:
                 self.size = 0
 
-            # Type MIME
-            try:
-                head = self.file.read(1024)
-                self.content_type = magic.from_buffer(head, mime=True) or 'application/octet-stream'
-                self.file.seek(0)
-            except Exception:
-                self.content_type = 'application/octet-stream'
+            # Type MIME provisoire
+            self.content_type = mimetypes.guess_type(self.filename)[0] or 'application/octet-stream'
+
+            # Empreintes du contenu
+            self.sha256, self.crc32 = file_checksums(self.file)
 
+            blob = Document.objects.filter(sha256=self.sha256, size=self.size).exclude(file='').first()
+            if blob is not None:
+                # Le FileField ne réécrit pas un fichier déjà stocké
+                self.file = blob.file.name
+
+        if process:
+            self.status = self.PENDING
         super().save(*args, **kwargs)
+        if process:
+            enqueue(PROCESS_TASK, document_id=self.pk)
 
     @property
     def file_extension(self):
@@ -87,6 +158,91 @@ class Document(models.Model):
         return f"{size:.1f} TB"
 
 
+class DocumentContent(models.Model):
+    """Texte extrait d'un document (apps.documents.processing)."""
+    document = models.OneToOneField(
+        Document,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='content',
+    )
+    text = models.TextField(blank=True)
+    # Maintenu par un trigger (voir la migration 0007_document_content_search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='document_content_search_idx'),
+        ]
+
+    def __str__(self):
+        return f"Content of {self.document_id}"
+
+
+class DocumentUpload(models.Model):
+    """
+    Upload in progress (see DocumentUploadViewSet).
+
+    Chunked: chunks are appended in order to a staging file, ``received``
+    bytes so far, so that an interrupted upload resumes from there.
+    Completing it creates the Document from the staging file, streamed to
+    the storage backend (or deduplicated, see Document.save).
+
+    Direct (``storage_key`` set): the client PUTs the file straight into the
+    bucket under ``storage_key``, completing it checks the stored object's
+    size and SHA-256 against the declared ones.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    deal = models.ForeignKey(
+        'deals.Deal',
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        null=True,
+        blank=True,
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(help_text="Total size in bytes")
+    received = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    storage_key = models.CharField(max_length=500, blank=True)
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='document_uploads',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['uploaded_by', '-created_at'], name='document_upload_user_idx'),
+            models.Index(fields=['updated_at'], name='document_upload_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    def direct_upload_name(self):
+        """Storage name of a direct upload, unique per upload"""
+        return default_storage.generate_filename(document_upload_path(self, f'{self.pk.hex}/{self.filename}'))
+
+    @property
+    def staging_path(self):
+        return os.path.join(settings.DOCUMENT_UPLOAD_DIR, f'{self.pk}.part')
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
+
+    def delete_staging_file(self):
+        try:
+            os.remove(self.staging_path)
+        except FileNotFoundError:
+            pass
+
+
 class NDA(models.Model):
     COUNTERPARTY_CHOICES = [
         ('buyer', 'Buyer'),
@@ -124,6 +280,11 @@ class NDA(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['deal', '-created_at'], name='nda_deal_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='nda_status_created_idx'),
+            models.Index(fields=['-created_at'], name='nda_created_idx'),
+        ]
         verbose_name = 'NDA'
         verbose_name_plural = 'NDAs'
 
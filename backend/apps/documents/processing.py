@@ -0,0 +1,283 @@
+import os
+import tempfile
+import zipfile
+import zlib
+from contextlib import ExitStack
+from io import BytesIO
+from xml.etree import ElementTree
+
+import magic
+import pypdfium2 as pdfium
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from apps.jobs.queue import PermanentError
+
+from .models import Document, DocumentContent
+from .storage import read_file
+
+PDF_TYPES = {'application/pdf'}
+OOXML_TYPES = {
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'pptx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+OOXML_EXTENSIONS = {'.docx': 'docx', '.pptx': 'pptx', '.xlsx': 'xlsx'}
+# libmagic reports some Office files as plain zip archives
+ZIP_TYPES = {'application/zip', 'application/octet-stream'}
+
+
+class Analysis:
+    """What processing found out about a document's file"""
+
+    def __init__(self, content_type, text='', page_count=None, thumbnail=None):
+        self.content_type = content_type
+        self.text = text
+        self.page_count = page_count
+        self.thumbnail = thumbnail
+        # Storage name of the thumbnail, once saved
+        self.thumbnail_name = ''
+        # CRC-32 of the file, for documents stored without one (direct uploads)
+        self.crc32 = None
+
+
+class TextBuffer:
+    """Extracted text, capped at DOCUMENT_TEXT_MAX_LENGTH characters"""
+
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+        self.max_length = settings.DOCUMENT_TEXT_MAX_LENGTH
+
+    @property
+    def full(self):
+        return self.length >= self.max_length
+
+    def add(self, text):
+        if text and not self.full:
+            text = text[:self.max_length - self.length]
+            self.parts.append(text)
+            self.length += len(text)
+
+    def value(self):
+        return ''.join(self.parts).strip()
+
+
+def local_path(file, stack):
+    """Path of the file on local disk, copied to a temporary file for remote storages"""
+    try:
+        return file.path
+    except NotImplementedError:
+        pass
+    copy = stack.enter_context(tempfile.NamedTemporaryFile(suffix=os.path.splitext(file.name)[1]))
+    with file.open('rb') as source:
+        for chunk in source.chunks():
+            copy.write(chunk)
+    copy.flush()
+    return copy.name
+
+
+def thumbnail_jpeg(image):
+    image.thumbnail((settings.DOCUMENT_THUMBNAIL_SIZE, settings.DOCUMENT_THUMBNAIL_SIZE))
+    output = BytesIO()
+    image.convert('RGB').save(output, format='JPEG', quality=80)
+    return output.getvalue()
+
+
+def analyze_pdf(path, content_type):
+    try:
+        pdf = pdfium.PdfDocument(path)
+    except pdfium.PdfiumError as exc:
+        # Damaged or password protected
+        raise PermanentError(f'Unreadable PDF: {exc}')
+    try:
+        text = TextBuffer()
+        for index in range(len(pdf)):
+            if text.full:
+                break
+            page = pdf[index]
+            textpage = page.get_textpage()
+            text.add(textpage.get_text_range() + '\n')
+            textpage.close()
+            page.close()
+
+        thumbnail = None
+        if len(pdf):
+            page = pdf[0]
+            scale = settings.DOCUMENT_THUMBNAIL_SIZE / max(page.get_size())
+            thumbnail = thumbnail_jpeg(page.render(scale=scale).to_pil())
+            page.close()
+        return Analysis(content_type, text.value(), len(pdf), thumbnail)
+    finally:
+        pdf.close()
+
+
+def xml_text(stream, text, paragraph_tags):
+    """Text of the <t> elements of an OOXML part, a line per paragraph"""
+    for _, element in ElementTree.iterparse(stream):
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 't':
+            text.add(element.text)
+        elif tag in paragraph_tags:
+            text.add('\n')
+            element.clear()
+        if text.full:
+            break
+
+
+def slide_number(name):
+    return int(''.join(char for char in os.path.basename(name) if char.isdigit()) or 0)
+
+
+def analyze_ooxml(path, content_type, kind):
+    text = TextBuffer()
+    page_count = None
+    thumbnail = None
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            if kind == 'docx':
+                parts = ['word/document.xml']
+            elif kind == 'pptx':
+                parts = sorted(
+                    (name for name in names if name.startswith('ppt/slides/slide') and name.endswith('.xml')),
+                    key=slide_number,
+                )
+                page_count = len(parts)
+            else:
+                parts = ['xl/sharedStrings.xml']
+            for part in parts:
+                if part in names and not text.full:
+                    with archive.open(part) as stream:
+                        xml_text(stream, text, {'p', 'si'})
+
+            if kind == 'docx' and 'docProps/app.xml' in names:
+                pages = ElementTree.fromstring(archive.read('docProps/app.xml')).find(
+                    '{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}Pages'
+                )
+                if pages is not None and (pages.text or '').isdigit():
+                    page_count = int(pages.text)
+            # Preview saved by Office, when there is one
+            if 'docProps/thumbnail.jpeg' in names:
+                thumbnail = thumbnail_jpeg(Image.open(BytesIO(archive.read('docProps/thumbnail.jpeg'))))
+    except (zipfile.BadZipFile, ElementTree.ParseError, OSError) as exc:
+        raise PermanentError(f'Unreadable {kind} file: {exc}')
+    return Analysis(content_type, text.value(), page_count, thumbnail)
+
+
+def path_crc32(path):
+    crc = 0
+    with open(path, 'rb') as source:
+        while block := source.read(1024 * 1024):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+def analyze_text(path, content_type):
+    with open(path, 'rb') as source:
+        raw = source.read(settings.DOCUMENT_TEXT_MAX_LENGTH * 4)
+    text = TextBuffer()
+    text.add(raw.decode('utf-8', errors='replace'))
+    return Analysis(content_type, text.value())
+
+
+def analyze(path, filename):
+    """MIME type (from the content), text, page count and thumbnail of a file"""
+    with open(path, 'rb') as source:
+        content_type = magic.from_buffer(source.read(2048), mime=True) or 'application/octet-stream'
+
+    extension = os.path.splitext(filename)[1].lower()
+    if content_type in PDF_TYPES:
+        return analyze_pdf(path, content_type)
+    kind = OOXML_TYPES.get(content_type)
+    if kind is None and content_type in ZIP_TYPES and extension in OOXML_EXTENSIONS:
+        kind = OOXML_EXTENSIONS[extension]
+        content_type = next(mime for mime, value in OOXML_TYPES.items() if value == kind)
+    if kind is not None:
+        return analyze_ooxml(path, content_type, kind)
+    if content_type.startswith('text/'):
+        return analyze_text(path, content_type)
+    # Legacy Office formats and anything else: type only
+    return Analysis(content_type)
+
+
+def processed_copy(document):
+    """Analysis of an already processed document sharing the same blob, None if there is none"""
+    if not document.sha256:
+        return None
+    source = (
+        Document.objects.filter(sha256=document.sha256, size=document.size, status=Document.READY)
+        .exclude(pk=document.pk)
+        .select_related('content')
+        .first()
+    )
+    if source is None:
+        return None
+    analysis = Analysis(source.content_type, page_count=source.page_count)
+    analysis.thumbnail_name = source.thumbnail.name
+    analysis.crc32 = source.crc32
+    try:
+        analysis.text = source.content.text
+    except DocumentContent.DoesNotExist:
+        pass
+    return analysis
+
+
+def process_document(document_id):
+    """
+    Job: detect the MIME type of a document from its content, extract its
+    text (indexed by search), count its pages and render a thumbnail.
+    """
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None:
+        # Deleted since it was queued
+        return
+    Document.objects.filter(pk=document.pk).update(status=Document.PROCESSING, updated_at=timezone.now())
+
+    try:
+        analysis = processed_copy(document)
+        if analysis is None:
+            with ExitStack() as stack:
+                path = local_path(document.file, stack)
+                analysis = analyze(path, document.filename)
+                if document.crc32 is None:
+                    analysis.crc32 = path_crc32(path)
+            if analysis.thumbnail:
+                analysis.thumbnail_name = document.thumbnail.storage.save(
+                    f'thumbnails/{document.sha256 or document.pk}.jpg', ContentFile(analysis.thumbnail),
+                )
+    except PermanentError:
+        raise
+    except Exception:
+        # Retried by the queue
+        Document.objects.filter(pk=document.pk).update(status=Document.PENDING, updated_at=timezone.now())
+        raise
+
+    with transaction.atomic():
+        DocumentContent.objects.update_or_create(document=document, defaults={'text': analysis.text})
+        document.content_type = analysis.content_type
+        document.page_count = analysis.page_count
+        document.thumbnail = analysis.thumbnail_name
+        document.status = Document.READY
+        if document.crc32 is None:
+            document.crc32 = analysis.crc32
+        # Reindexes the document with its text (apps.search.signals)
+        document.save(update_fields=['content_type', 'page_count', 'thumbnail', 'crc32', 'status', 'updated_at'])
+
+
+def checksum_document(document_id):
+    """
+    Job: CRC-32 of a document stored before it was computed at upload,
+    needed to put the document in a zip archive (apps.documents.archive)
+    """
+    document = Document.objects.filter(pk=document_id, crc32__isnull=True).exclude(file='').first()
+    if document is None:
+        # Deleted, or its checksum was filled in since it was queued
+        return
+    crc = 0
+    for block in read_file(document.file.name, 0, document.size):
+        crc = zlib.crc32(block, crc)
+    Document.objects.filter(pk=document.pk, crc32__isnull=True).update(crc32=crc)
@@ -1,7 +1,25 @@
+import mimetypes
+import re
+
+from django.conf import settings
+from django.utils.html import escape
 from rest_framework import serializers
-from .models import Document, NDA
+from .models import Document, DocumentUpload, NDA
+from .storage import download_url, presigned_upload, uses_object_storage
 from apps.users.serializers import UserSerializer
 
+ALLOWED_EXTENSIONS = ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt']
+
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def validate_extension(filename):
+    file_extension = filename.lower().split('.')[-1]
+    if f'.{file_extension}' not in ALLOWED_EXTENSIONS:
+        raise serializers.ValidationError(
+            f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
 
 class DocumentSerializer(serializers.ModelSerializer):
     uploaded_by_name = serializers.CharField(source='uploaded_by.full_name', read_only=True)
@@ -9,23 +27,51 @@ class DocumentSerializer(serializers.ModelSerializer):
     size_human = serializers.ReadOnlyField()
     file_extension = serializers.ReadOnlyField()
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Document
         fields = ['id', 'deal', 'deal_title', 'filename', 'file', 'file_url', 
-                 'size', 'size_human', 'content_type', 'file_extension',
-                 'uploaded_by', 'uploaded_by_name', 'uploaded_at']
-        read_only_fields = ['id', 'size', 'content_type', 'uploaded_at']
+                 'size', 'size_human', 'content_type', 'file_extension', 'sha256',
+                 'status', 'page_count', 'thumbnail_url',
+                 'uploaded_by', 'uploaded_by_name', 'uploaded_at', 'updated_at']
+        read_only_fields = ['id', 'size', 'content_type', 'sha256', 'status', 'page_count',
+                            'uploaded_at', 'updated_at']
     
     def get_file_url(self, obj):
         if obj.file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.file.url)
-            return obj.file.url
+            return download_url(obj, self.context.get('request'))
+        return None
+    
+    def get_thumbnail_url(self, obj):
+        if obj.thumbnail:
+            return download_url(obj, self.context.get('request'), thumbnail=True)
         return None
 
 
+# Delimiters of the matches in content_search snippets, swapped for <mark>
+# once the text around them is HTML escaped
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+
+class DocumentContentHitSerializer(DocumentSerializer):
+    """Document matched by DocumentViewSet.content_search"""
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.SerializerMethodField()
+    
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ['rank', 'snippet']
+    
+    def get_snippet(self, obj):
+        """Matching passages, HTML escaped, matches wrapped in <mark>"""
+        return (
+            escape(obj.snippet)
+            .replace(HIGHLIGHT_START, '<mark>')
+            .replace(HIGHLIGHT_STOP, '</mark>')
+        )
+
+
 class DocumentUploadSerializer(serializers.ModelSerializer):
     """Serializer for file uploads"""
     
@@ -40,14 +86,74 @@ class DocumentUploadSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("File size cannot exceed 10MB")
         
         # Add file type validation if needed
-        allowed_extensions = ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt']
-        file_extension = value.name.lower().split('.')[-1]
-        if f'.{file_extension}' not in allowed_extensions:
+        validate_extension(value.name)
+        
+        return value
+
+
+class DocumentUploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Upload declared at init, then followed through received (chunked) or
+    sent to the ``upload`` URL (direct)
+    """
+    direct = serializers.BooleanField(default=False, write_only=True)
+    upload = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DocumentUpload
+        fields = ['id', 'deal', 'filename', 'size', 'sha256', 'direct', 'upload', 'received',
+                  'created_at', 'updated_at']
+        read_only_fields = ['id', 'received', 'created_at', 'updated_at']
+    
+    def get_upload(self, obj):
+        """Presigned PUT of a direct upload, issued again on every read so that it does not expire"""
+        if not obj.storage_key:
+            return None
+        content_type = mimetypes.guess_type(obj.filename)[0] or 'application/octet-stream'
+        url, headers = presigned_upload(obj.storage_key, content_type, obj.sha256)
+        return {'method': 'PUT', 'url': url, 'headers': headers}
+    
+    def validate_filename(self, value):
+        validate_extension(value)
+        return value
+    
+    def validate_deal(self, value):
+        """Only the deals the user can see (DealViewSet scoping): analysts, their own"""
+        user = self.context['request'].user
+        if value is not None and not (
+            user.is_admin() or user.is_associate() or (user.is_analyst() and value.owner_id == user.pk)
+        ):
+            raise serializers.ValidationError(f'Invalid pk "{value.pk}" - object does not exist.')
+        return value
+    
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and not SHA256_PATTERN.fullmatch(value):
+            raise serializers.ValidationError("Expected the hex SHA-256 of the file")
+        return value
+    
+    def validate_size(self, value):
+        if value > settings.DOCUMENT_UPLOAD_MAX_SIZE:
             raise serializers.ValidationError(
-                f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
+                f"File size cannot exceed {settings.DOCUMENT_UPLOAD_MAX_SIZE} bytes"
             )
-        
         return value
+    
+    def validate(self, attrs):
+        if attrs.get('direct'):
+            if not uses_object_storage():
+                raise serializers.ValidationError({'direct': "Direct uploads require object storage (S3, MinIO)"})
+            if not attrs.get('sha256'):
+                raise serializers.ValidationError({'sha256': "Required for direct uploads"})
+        return attrs
+    
+    def create(self, validated_data):
+        direct = validated_data.pop('direct')
+        upload = DocumentUpload(**validated_data)
+        if direct:
+            upload.storage_key = upload.direct_upload_name()
+        upload.save()
+        return upload
 
 
 class NDASerializer(serializers.ModelSerializer):
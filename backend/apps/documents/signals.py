@@ -0,0 +1,16 @@
+from django.utils import timezone
+
+from apps.jobs.queue import job_failed
+
+from .models import PROCESS_TASK, Document
+
+
+def mark_processing_failed(sender, job, **kwargs):
+    # Signal senders are matched by identity, the task path is compared here
+    if sender == PROCESS_TASK:
+        Document.objects.filter(pk=job.payload.get('document_id')).update(
+            status=Document.FAILED, updated_at=timezone.now(),
+        )
+
+
+job_failed.connect(mark_processing_failed, dispatch_uid='documents_processing_failed')
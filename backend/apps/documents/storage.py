@@ -0,0 +1,179 @@
+import base64
+from functools import lru_cache
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from apps.core.streaming import aiter_blocks
+
+DOWNLOAD_SALT = 'documents.download'
+
+
+def uses_object_storage():
+    """Files stored in an S3 compatible bucket (S3, MinIO) rather than on local disk"""
+    return isinstance(default_storage, S3Boto3Storage)
+
+
+def object_key(name):
+    return default_storage._normalize_name(clean_name(name))
+
+
+@lru_cache(maxsize=None)
+def presign_client():
+    """
+    Client signing the URLs handed to browsers. AWS_S3_PRESIGN_ENDPOINT_URL
+    is the bucket endpoint as reached from outside (the signature covers the
+    host), e.g. MinIO published on localhost while the backend reaches it as
+    minio:9000.
+    """
+    endpoint_url = getattr(settings, 'AWS_S3_PRESIGN_ENDPOINT_URL', None) or default_storage.endpoint_url
+    return default_storage._create_session().client(
+        's3',
+        region_name=default_storage.region_name,
+        use_ssl=default_storage.use_ssl,
+        endpoint_url=endpoint_url,
+        config=default_storage.config,
+        verify=default_storage.verify,
+    )
+
+
+def presigned_upload(name, content_type, sha256):
+    """
+    URL and headers of a PUT storing a file as ``name`` straight into the
+    bucket. The headers are signed: the storage rejects a body whose
+    SHA-256 is not the declared one.
+    """
+    checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+    params = {
+        'Bucket': default_storage.bucket_name,
+        'Key': object_key(name),
+        'ContentType': content_type,
+        'ChecksumSHA256': checksum,
+    }
+    url = presign_client().generate_presigned_url(
+        'put_object', Params=params, ExpiresIn=settings.DOCUMENT_URL_EXPIRE, HttpMethod='PUT',
+    )
+    headers = {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum}
+    return url, headers
+
+
+def head_object(name):
+    """Size, content type and SHA-256 (hex, '' when not stored) of an object, None if missing"""
+    try:
+        head = default_storage.bucket.meta.client.head_object(
+            Bucket=default_storage.bucket_name, Key=object_key(name), ChecksumMode='ENABLED',
+        )
+    except ClientError as exc:
+        if exc.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    checksum = head.get('ChecksumSHA256', '')
+    return {
+        'size': head['ContentLength'],
+        'content_type': head.get('ContentType') or 'application/octet-stream',
+        'sha256': base64.b64decode(checksum).hex() if checksum and '-' not in checksum else '',
+    }
+
+
+def download_url(document, request=None, thumbnail=False):
+    """
+    Short-lived URL the document (or its thumbnail) is downloaded from
+    without a worker reading it: a presigned GET on object storage, a
+    signed link served by nginx (see download_response) on local storage.
+    """
+    if uses_object_storage():
+        if thumbnail:
+            params = {'Bucket': default_storage.bucket_name, 'Key': object_key(document.thumbnail.name)}
+        else:
+            params = {
+                'Bucket': default_storage.bucket_name,
+                'Key': object_key(document.file.name),
+                # Blobs are shared by identical documents: the name is the document's
+                'ResponseContentDisposition': content_disposition_header(True, document.filename),
+                'ResponseContentType': document.content_type,
+            }
+        return presign_client().generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=settings.DOCUMENT_URL_EXPIRE,
+        )
+    token = signing.dumps(f'{document.pk}:thumbnail' if thumbnail else document.pk, salt=DOWNLOAD_SALT)
+    url = f"{reverse('document-file', kwargs={'pk': document.pk})}?token={token}"
+    return request.build_absolute_uri(url) if request else url
+
+
+def check_download_token(token, pk):
+    """
+    What a token issued by download_url for document pk gives access to:
+    'file', 'thumbnail', or None if it is invalid or expired
+    """
+    try:
+        value = signing.loads(token, salt=DOWNLOAD_SALT, max_age=settings.DOCUMENT_URL_EXPIRE)
+    except signing.BadSignature:
+        return None
+    if value == pk:
+        return 'file'
+    if value == f'{pk}:thumbnail':
+        return 'thumbnail'
+    return None
+
+
+def download_response(request, document, thumbnail=False):
+    """
+    Local storage: hand the file over to nginx with X-Accel-Redirect when
+    DOCUMENT_X_ACCEL_REDIRECT is set, stream it from the worker otherwise
+    (development server).
+    """
+    if thumbnail:
+        file, content_type, disposition = document.thumbnail, 'image/jpeg', None
+    else:
+        file, content_type = document.file, document.content_type
+        disposition = content_disposition_header(True, document.filename)
+    if settings.DOCUMENT_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f'{settings.DOCUMENT_X_ACCEL_REDIRECT}{quote(file.name)}'
+    else:
+        response = FileResponse(file.open('rb'), content_type=content_type)
+        if isinstance(request, ASGIRequest):
+            # Django would read the whole file before sending it: stream it
+            # by blocks (storage reads, any thread will do)
+            response.streaming_content = aiter_blocks(response.streaming_content, thread_sensitive=False)
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return response
+
+
+def read_file(name, offset, length, block_size=1024 * 1024):
+    """
+    ``length`` bytes of a stored file from ``offset``, block by block: a
+    ranged GET on object storage (S3Boto3Storage.open would first download
+    the whole object), a seek on local storage
+    """
+    if length <= 0:
+        return
+    if uses_object_storage():
+        body = default_storage.bucket.meta.client.get_object(
+            Bucket=default_storage.bucket_name,
+            Key=object_key(name),
+            Range=f'bytes={offset}-{offset + length - 1}',
+        )['Body']
+        try:
+            yield from body.iter_chunks(block_size)
+        finally:
+            body.close()
+        return
+    with default_storage.open(name, 'rb') as file:
+        file.seek(offset)
+        while length > 0:
+            block = file.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
@@ -0,0 +1,180 @@
+"""
+Deal document archives (apps.documents.archive): the streamed zip must be
+readable whole, by byte ranges and with ZIP64 records, which are forced on
+small archives by lowering the thresholds.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from apps.companies.models import Company
+from apps.deals.models import Deal, Stage
+from apps.documents import archive
+from apps.documents.models import CHECKSUM_TASK, Document
+from apps.documents.processing import checksum_document
+from apps.jobs.models import Job
+from apps.users.models import User
+
+CONTENTS = {
+    'Report.pdf': os.urandom(300_000),
+    'report.pdf': b'Second report',
+    'Notes é.txt': 'Notes de réunion'.encode(),
+    'empty.txt': b'',
+}
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(archive.parse_range('bytes=0-99', 1000), (0, 100))
+        self.assertEqual(archive.parse_range('bytes=900-', 1000), (900, 1000))
+        self.assertEqual(archive.parse_range('bytes=900-5000', 1000), (900, 1000))
+        self.assertEqual(archive.parse_range('bytes=-50', 1000), (950, 1000))
+        self.assertEqual(archive.parse_range('bytes=-5000', 1000), (0, 1000))
+
+    def test_whole_resource(self):
+        for header in [None, '', 'bytes=-', 'bytes=10-5', 'bytes=0-1,5-6', 'items=0-5']:
+            with self.subTest(header=header):
+                self.assertIsNone(archive.parse_range(header, 1000))
+
+    def test_not_satisfiable(self):
+        for header in ['bytes=1000-', 'bytes=-0']:
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                archive.parse_range(header, 1000)
+
+
+class DocumentArchiveTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='admin@example.com', username='admin', password='admin123', role='admin',
+        )
+        cls.deal = Deal.objects.create(
+            title='Project Atlas',
+            company=Company.objects.create(name='Atlas', legal_id='AT000001'),
+            owner=cls.user,
+            stage=Stage.objects.create(name='Sourcing', order=1),
+        )
+        cls.documents = Document.objects.bulk_create([
+            Document(
+                deal=cls.deal,
+                filename=name,
+                file=default_storage.save(f'documents/{cls.deal.pk}/{i}.bin', ContentFile(content)),
+                size=len(content),
+                content_type='text/plain',
+                crc32=zlib.crc32(content),
+                uploaded_by=cls.user,
+            )
+            for i, (name, content) in enumerate(CONTENTS.items())
+        ])
+        cls.url = f'/api/v1/deals/{cls.deal.pk}/documents/archive/'
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get_body(self, byte_range=None, if_range=None):
+        headers = {}
+        if byte_range:
+            headers['Range'] = f'bytes={byte_range}'
+        if if_range:
+            headers['If-Range'] = if_range
+        response = self.client.get(self.url, headers=headers)
+        return response, b''.join(response.streaming_content)
+
+    def assert_archive(self, body):
+        with zipfile.ZipFile(BytesIO(body)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(
+                sorted(zip_file.namelist()), ['Notes é.txt', 'Report.pdf', 'empty.txt', 'report (2).pdf'],
+            )
+            self.assertEqual(zip_file.read('Report.pdf'), CONTENTS['Report.pdf'])
+            self.assertEqual(zip_file.read('report (2).pdf'), CONTENTS['report.pdf'])
+            self.assertEqual(zip_file.read('Notes é.txt'), CONTENTS['Notes é.txt'])
+            self.assertEqual(zip_file.read('empty.txt'), b'')
+
+    def test_whole_archive(self):
+        response, body = self.get_body()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assert_archive(body)
+
+    def test_ranges(self):
+        response, body = self.get_body()
+        etag = response['ETag']
+        parts = []
+        # Boundaries inside headers, inside files and inside the central directory
+        for byte_range in ['0-9', '10-150000', f'150001-{len(body) - 30}', f'{len(body) - 29}-']:
+            response, part = self.get_body(byte_range, if_range=etag)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(int(response['Content-Length']), len(part))
+            start = len(b''.join(parts))
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{start + len(part) - 1}/{len(body)}')
+            parts.append(part)
+        self.assertEqual(b''.join(parts), body)
+
+        response, part = self.get_body('-50')
+        self.assertEqual(part, body[-50:])
+
+    def test_stale_if_range_sends_the_whole_archive(self):
+        response, body = self.get_body('10-20', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assert_archive(body)
+
+    def test_range_not_satisfiable(self):
+        size = int(self.client.head(self.url)['Content-Length'])
+        response = self.client.get(self.url, headers={'Range': f'bytes={size}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_zip64(self):
+        _, classic = self.get_body()
+        with mock.patch.object(archive, 'ZIP64_LIMIT', 1000), mock.patch.object(archive, 'ZIP64_COUNT_LIMIT', 2):
+            response, body = self.get_body()
+            etag = response['ETag']
+            # Across the ZIP64 extra fields and end records
+            middle = len(body) - 100
+            _, first = self.get_body(f'0-{middle - 1}', if_range=etag)
+            _, last = self.get_body(f'{middle}-', if_range=etag)
+        self.assertGreater(len(body), len(classic))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(b'PK\x06\x06', body)
+        self.assertEqual(first + last, body)
+        self.assert_archive(body)
+
+    def test_missing_checksums(self):
+        document = self.documents[1]
+        Document.objects.filter(pk=document.pk).update(crc32=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['documents'], [document.pk])
+
+        call_command('checksum_documents', stdout=StringIO())
+        job = Job.objects.get(task=CHECKSUM_TASK)
+        self.assertEqual(job.payload, {'document_id': document.pk})
+        checksum_document(**job.payload)
+        self.assertEqual(Document.objects.get(pk=document.pk).crc32, zlib.crc32(CONTENTS['report.pdf']))
+        _, body = self.get_body()
+        self.assert_archive(body)
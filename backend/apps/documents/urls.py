@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DocumentViewSet, NDAViewSet
+from .views import DocumentViewSet, DocumentUploadViewSet, NDAViewSet, document_file
 
 router = DefaultRouter()
 router.register(r'documents', DocumentViewSet)
+router.register(r'document-uploads', DocumentUploadViewSet)
 router.register(r'ndas', NDAViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('documents/upload/', DocumentViewSet.as_view({'post': 'upload'}), name='document-upload'),
+    path('documents/<int:pk>/file/', document_file, name='document-file'),
 ]
\ No newline at end of file
@@ -1,26 +1,53 @@
-from rest_framework import viewsets, status
+import fcntl
+import os
+
+from rest_framework import mixins, permissions, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Q
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchRank
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
-from .models import Document, NDA
-from .serializers import DocumentSerializer, DocumentUploadSerializer, NDASerializer
+from .models import Document, DocumentUpload, NDA, file_sha256
+from .serializers import (
+    HIGHLIGHT_START, HIGHLIGHT_STOP, DocumentContentHitSerializer, DocumentSerializer,
+    DocumentUploadSerializer, DocumentUploadSessionSerializer, NDASerializer,
+)
+from .storage import check_download_token, download_response, download_url, head_object
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.pagination import KeysetPagination
+from apps.core.search import SEARCH_CONFIG, prefix_search_query, search_words
 from apps.users.permissions import CanAccessDocument, CanAccessDeal
 
 
-class DocumentViewSet(viewsets.ModelViewSet):
-    queryset = Document.objects.select_related('deal', 'uploaded_by').all()
+class DocumentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Document.objects.select_related('deal', 'uploaded_by').defer('deal__search_vector')
+    etag_dependencies = ['deals.deal', 'users.user']
     serializer_class = DocumentSerializer
     permission_classes = [CanAccessDocument]
+    pagination_class = KeysetPagination
+    etag_from_page = True
     parser_classes = [MultiPartParser, FormParser]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['deal', 'content_type', 'uploaded_by']
     search_fields = ['filename']
     ordering_fields = ['filename', 'size', 'uploaded_at']
     ordering = ['-uploaded_at']
+    content_search_limit = 20
+    content_search_max_limit = 50
+    
+    def get_etag_lifetime(self):
+        # file_url / thumbnail_url are signed for DOCUMENT_URL_EXPIRE seconds
+        return settings.DOCUMENT_URL_EXPIRE
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -42,6 +69,55 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
     
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Redirect to a fresh short-lived download URL (see file_url)"""
+        document = self.get_object()
+        return HttpResponseRedirect(download_url(document, request))
+    
+    @action(detail=False, methods=['get'])
+    def content_search(self, request):
+        """
+        Full-text search in the extracted text of the documents, best
+        matches first, with highlighted snippets.
+
+        Query params:
+        - q: search text (required), every word matched as a prefix
+        - deal, content_type, uploaded_by: same filters as the list
+        - limit: max number of hits (default 20, max 50)
+        """
+        words = search_words([request.query_params.get('q', '')])
+        if not words:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.content_search_limit))
+        except ValueError:
+            limit = self.content_search_limit
+        limit = max(1, min(limit, self.content_search_max_limit))
+        
+        query = prefix_search_query(words)
+        queryset = DjangoFilterBackend().filter_queryset(request, self.get_queryset(), self)
+        # ts_headline re-parses the whole text: PostgreSQL only evaluates
+        # it for the rows left after ORDER BY ... LIMIT
+        hits = (
+            queryset.filter(status=Document.READY, content__search_vector=query)
+            .annotate(
+                rank=SearchRank(F('content__search_vector'), query),
+                snippet=SearchHeadline(
+                    'content__text',
+                    query,
+                    config=SEARCH_CONFIG,
+                    start_sel=HIGHLIGHT_START,
+                    stop_sel=HIGHLIGHT_STOP,
+                    max_fragments=3,
+                    fragment_delimiter=' … ',
+                ),
+            )
+            .order_by('-rank', '-uploaded_at')[:limit]
+        )
+        serializer = DocumentContentHitSerializer(hits, many=True, context=self.get_serializer_context())
+        return Response({'results': serializer.data})
+    
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload(self, request):
         """Handle file upload"""
@@ -53,8 +129,228 @@ class DocumentViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class NDAViewSet(viewsets.ModelViewSet):
-    queryset = NDA.objects.select_related('deal', 'file').all()
+def lock_staging_file(staging):
+    """Exclusive lock on an open staging file, False if another request holds it"""
+    try:
+        fcntl.flock(staging, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class DocumentUploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Resumable chunked upload of large documents:
+
+    - POST /document-uploads/ with filename, size and deal starts an upload
+    - PUT /document-uploads/<id>/append/?offset=<received> with a chunk as
+      the raw request body (at most DOCUMENT_UPLOAD_MAX_CHUNK_SIZE bytes);
+      after an interruption, GET /document-uploads/<id>/ gives ``received``
+      to resume from
+    - POST /document-uploads/<id>/complete/ creates the document
+    - DELETE /document-uploads/<id>/ abandons the upload
+
+    Chunks are written to a staging file as they are read, never buffered
+    whole. Completing hashes the staging file, then either references an
+    existing blob with the same content or streams the file to the storage
+    backend (see Document.save).
+
+    On object storage, ``direct`` uploads (with the file's ``sha256``)
+    bypass the workers: the session's ``upload`` is a presigned PUT into
+    the bucket, and completing reads size, content type and checksum from a
+    HEAD of the stored object.
+    """
+    queryset = DocumentUpload.objects.all()
+    serializer_class = DocumentUploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    read_block_size = 1024 * 1024
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(uploaded_by=self.request.user)
+    
+    def perform_create(self, serializer):
+        upload = serializer.save(uploaded_by=self.request.user)
+        if not upload.storage_key:
+            os.makedirs(settings.DOCUMENT_UPLOAD_DIR, exist_ok=True)
+            open(upload.staging_path, 'wb').close()
+    
+    def perform_destroy(self, instance):
+        if instance.storage_key:
+            default_storage.delete(instance.storage_key)
+        else:
+            instance.delete_staging_file()
+        instance.delete()
+    
+    def write_chunk(self, request, staging, upload, offset):
+        """Write the request body at offset, return its size (ValueError if too large)"""
+        limit = min(settings.DOCUMENT_UPLOAD_MAX_CHUNK_SIZE, upload.size - offset)
+        # Drop what an interrupted chunk may have left past offset
+        staging.seek(offset)
+        staging.truncate()
+        written = 0
+        stream = request.stream
+        while stream is not None:
+            block = stream.read(self.read_block_size)
+            if not block:
+                break
+            written += len(block)
+            if written > limit:
+                staging.truncate(offset)
+                raise ValueError(f'A chunk cannot exceed {limit} bytes here')
+            staging.write(block)
+        return written
+    
+    def staging_lost(self):
+        return Response(
+            {'error': 'The uploaded data is no longer available, start the upload again'},
+            status=status.HTTP_410_GONE,
+        )
+    
+    @action(detail=True, methods=['put'])
+    def append(self, request, pk=None):
+        """Append a chunk at ?offset=, the number of bytes received so far"""
+        upload = self.get_object()
+        if upload.storage_key:
+            return Response(
+                {'error': 'Direct uploads are sent to their upload URL'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            offset = int(request.query_params.get('offset', ''))
+        except ValueError:
+            return Response({'error': 'offset is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            staging = open(upload.staging_path, 'r+b')
+        except FileNotFoundError:
+            return self.staging_lost()
+        with staging:
+            if not lock_staging_file(staging):
+                return Response(
+                    {'error': 'Another chunk of this upload is being written'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            upload.refresh_from_db(fields=['received'])
+            if offset != upload.received:
+                return Response(
+                    {'error': f'offset must be {upload.received}', 'received': upload.received},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            try:
+                written = self.write_chunk(request, staging, upload, offset)
+            except ValueError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            staging.flush()
+            os.fsync(staging.fileno())
+            upload.received = offset + written
+            upload.updated_at = timezone.now()
+            DocumentUpload.objects.filter(pk=upload.pk).update(
+                received=F('received') + written, updated_at=upload.updated_at,
+            )
+        
+        return Response(self.get_serializer(upload).data)
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Create the document once every byte has been received"""
+        upload = self.get_object()
+        if upload.storage_key:
+            return self.complete_direct(request, upload)
+        if not upload.is_complete:
+            return Response(
+                {'error': f'{upload.received} of {upload.size} bytes received', 'received': upload.received},
+                status=status.HTTP_409_CONFLICT,
+            )
+        
+        try:
+            staging = open(upload.staging_path, 'rb')
+        except FileNotFoundError:
+            return self.staging_lost()
+        with staging:
+            if not lock_staging_file(staging):
+                return Response({'error': 'This upload is being completed'}, status=status.HTTP_409_CONFLICT)
+            file = File(staging, name=upload.filename)
+            if upload.sha256 and file_sha256(file) != upload.sha256:
+                upload.delete_staging_file()
+                upload.delete()
+                return self.content_mismatch()
+            document = Document(deal=upload.deal, uploaded_by=upload.uploaded_by, file=file)
+            document.save()
+            upload.delete_staging_file()
+        upload.delete()
+        
+        serializer = DocumentSerializer(document, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def complete_direct(self, request, upload):
+        """
+        Record a file PUT straight into the bucket: size, content type and
+        SHA-256 come from a HEAD of the object, the storage having checked
+        the signed checksum on upload
+        """
+        stored = head_object(upload.storage_key)
+        if stored is None:
+            return Response(
+                {'error': 'The file has not been uploaded yet', 'upload': self.get_serializer(upload).data['upload']},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if stored['size'] != upload.size or stored['sha256'] != upload.sha256:
+            default_storage.delete(upload.storage_key)
+            upload.delete()
+            return self.content_mismatch()
+        
+        with transaction.atomic():
+            # Concurrent completions: only the one deleting the session goes on
+            deleted, _ = DocumentUpload.objects.filter(pk=upload.pk).delete()
+            if not deleted:
+                return Response({'error': 'This upload is being completed'}, status=status.HTTP_409_CONFLICT)
+            blob = Document.objects.filter(sha256=upload.sha256, size=upload.size).exclude(file='').first()
+            document = Document.objects.create(
+                deal=upload.deal,
+                uploaded_by=upload.uploaded_by,
+                filename=upload.filename,
+                file=blob.file.name if blob else upload.storage_key,
+                size=stored['size'],
+                content_type=stored['content_type'],
+                sha256=stored['sha256'],
+            )
+        if blob is not None:
+            default_storage.delete(upload.storage_key)
+        
+        serializer = DocumentSerializer(document, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def content_mismatch(self):
+        return Response(
+            {'error': 'The uploaded file does not match the declared size and SHA-256, start the upload again'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+def document_file(request, pk):
+    """
+    Local storage download, through the signed link of the document's
+    file_url (see apps.documents.storage.download_url)
+    """
+    variant = check_download_token(request.GET.get('token', ''), pk)
+    if variant is None:
+        raise Http404
+    document = get_object_or_404(Document.objects.only('filename', 'file', 'content_type', 'thumbnail'), pk=pk)
+    if variant == 'thumbnail' and not document.thumbnail:
+        raise Http404
+    return download_response(request, document, thumbnail=variant == 'thumbnail')
+
+
+class NDAViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = NDA.objects.select_related('deal', 'file__deal', 'file__uploaded_by').defer(
+        'deal__search_vector', 'file__deal__search_vector',
+    )
+    etag_dependencies = ['deals.deal', Document, 'users.user']
     serializer_class = NDASerializer
     permission_classes = [CanAccessDeal]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -63,6 +359,11 @@ class NDAViewSet(viewsets.ModelViewSet):
     ordering_fields = ['counterparty', 'status', 'signed_at', 'created_at']
     ordering = ['-created_at']
     
+    def get_etag_lifetime(self):
+        # file_details carries file_url / thumbnail_url, signed for
+        # DOCUMENT_URL_EXPIRE seconds
+        return settings.DOCUMENT_URL_EXPIRE
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0002_list_indexes"),
+        ("deals", "0002_list_indexes"),
+        ("interactions", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["deal", "-occurred_at"], name="interaction_deal_occ_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["company", "-occurred_at"], name="interaction_company_occ_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["contact", "-occurred_at"], name="interaction_contact_occ_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["author", "-occurred_at"], name="interaction_author_occ_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["type", "-occurred_at"], name="interaction_type_occ_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interaction",
+            index=models.Index(
+                fields=["-occurred_at"], name="interaction_occurred_idx"
+            ),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 
@@ -42,11 +44,24 @@ class Interaction(models.Model):
         on_delete=models.CASCADE, 
         related_name='authored_interactions'
     )
+    # Maintained by a database trigger over SEARCH_VECTOR_FIELDS (see
+    # migration 0003_search_vector), which FullTextSearchFilter relies on
+    SEARCH_VECTOR_FIELDS = ['subject', 'body']
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-occurred_at']
+        indexes = [
+            models.Index(fields=['deal', '-occurred_at'], name='interaction_deal_occ_idx'),
+            models.Index(fields=['company', '-occurred_at'], name='interaction_company_occ_idx'),
+            models.Index(fields=['contact', '-occurred_at'], name='interaction_contact_occ_idx'),
+            models.Index(fields=['author', '-occurred_at'], name='interaction_author_occ_idx'),
+            models.Index(fields=['type', '-occurred_at'], name='interaction_type_occ_idx'),
+            models.Index(fields=['-occurred_at'], name='interaction_occurred_idx'),
+            GinIndex(fields=['search_vector'], name='interaction_search_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()}: {self.subject}"
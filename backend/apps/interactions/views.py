@@ -1,21 +1,34 @@
 from rest_framework import viewsets
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django.db.models import Q
 
 from .models import Interaction
 from .serializers import InteractionSerializer, InteractionDetailSerializer, InteractionCreateSerializer
+from apps.core.conditional import ConditionalGetMixin
+from apps.core.export import ExportMixin
+from apps.core.filters import FullTextSearchFilter
+from apps.core.pagination import KeysetPagination
 from apps.users.permissions import CanAccessDeal
 
 
-class InteractionViewSet(viewsets.ModelViewSet):
-    queryset = Interaction.objects.select_related('deal', 'company', 'contact', 'author').all()
+class InteractionViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Interaction.objects.select_related('deal', 'company', 'contact', 'author').defer(
+        'search_vector', 'deal__search_vector', 'company__search_vector', 'contact__search_vector',
+    )
+    etag_dependencies = ['deals.deal', 'companies.company', 'companies.contact', 'users.user']
     permission_classes = [CanAccessDeal]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = KeysetPagination
+    etag_from_page = True
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['type', 'deal', 'company', 'contact', 'author']
     search_fields = ['subject', 'body']
     ordering_fields = ['subject', 'occurred_at', 'created_at']
     ordering = ['-occurred_at']
+    export_fields = [
+        'id', 'type', 'subject', 'occurred_at', 'deal_id', 'deal__title', 'company_id', 'company__name',
+        'contact__email', 'author__email', 'body', 'created_at',
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
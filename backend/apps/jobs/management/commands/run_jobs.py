@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.jobs.queue import claim, run, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the queued background jobs (document processing...). Run as many '
+        'workers as needed; SIGTERM lets the current job finish.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of polling')
+        parser.add_argument(
+            '--sleep', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds between polls while the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        worker = worker_name()
+        done = failed = 0
+
+        while not self.stopping:
+            # Long-lived process: drop connections that are broken or past CONN_MAX_AGE
+            close_old_connections()
+            job = claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if run(job):
+                done += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{done} jobs done, {failed} failed'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,44 @@
+from django.db import models
+from django.db.models import Q
+
+
+class Job(models.Model):
+    """
+    Background task queued in the database (see apps.jobs.queue), run by
+    ``manage.py run_jobs`` workers.
+
+    ``task`` is the dotted path of the function called with ``payload`` as
+    keyword arguments. Done jobs are deleted; failed ones are kept with
+    their last error.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(help_text="Not run before this time (retry backoff)")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            # Queue polling (see apps.jobs.queue.claim)
+            models.Index(fields=['run_at'], condition=Q(status='queued'), name='job_queued_run_at_idx'),
+            models.Index(fields=['locked_at'], condition=Q(status='running'), name='job_running_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
@@ -0,0 +1,136 @@
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Sent when a job fails for good (attempts exhausted or PermanentError).
+# Arguments: sender (task dotted path), job. Connect without a sender and
+# compare the path: senders are matched by identity, not equality
+job_failed = Signal()
+
+
+class PermanentError(Exception):
+    """Raised by a task that retrying cannot fix: the job fails at once"""
+
+
+def enqueue(task, run_at=None, max_attempts=None, **payload):
+    """
+    Queue ``task`` (dotted path) to be called with ``payload`` (JSON
+    serializable keyword arguments). Inside a transaction, workers only see
+    the job once it is committed, with the rows it refers to.
+    """
+    return Job.objects.create(
+        task=task,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_many(task, payloads, max_attempts=None):
+    """enqueue() for a batch of jobs, one INSERT per 1000"""
+    now = timezone.now()
+    jobs = [
+        Job(task=task, payload=payload, run_at=now, max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS)
+        for payload in payloads
+    ]
+    return Job.objects.bulk_create(jobs, batch_size=1000)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def fail_stale(now):
+    """
+    Fail the running jobs whose worker died (locked for more than
+    JOBS_LOCK_TIMEOUT) on their last attempt: a file crashing or OOM-killing
+    the worker would otherwise be run again forever
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+        attempts__gte=F('max_attempts'),
+    )
+    with transaction.atomic():
+        for job in stale.select_for_update(skip_locked=True):
+            job.status = Job.FAILED
+            logger.error('Job %s failed: its worker stopped during the last attempt', job)
+            job.last_error = f'Lock timed out: the worker ({job.locked_by}) stopped during the last attempt'
+            job.locked_at = None
+            job.save(update_fields=['status', 'last_error', 'locked_at', 'updated_at'])
+            job_failed.send(sender=job.task, job=job)
+
+
+def claim(worker):
+    """
+    Lock the next due job for ``worker``, None if there is none. SKIP
+    LOCKED lets concurrent workers poll without waiting on each other;
+    running jobs whose worker died (locked for more than JOBS_LOCK_TIMEOUT)
+    are claimed again, unless that was their last attempt (see fail_stale).
+    """
+    now = timezone.now()
+    fail_stale(now)
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+        attempts__lt=F('max_attempts'),
+    )
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(due).order_by('run_at').first()
+        if job is None:
+            return None
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, locked_at=now, locked_by=worker, updated_at=now,
+        )
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.locked_at = now
+    job.locked_by = worker
+    return job
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    delay = min(settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+def run(job):
+    """Run a claimed job; True if it succeeded"""
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception as exc:
+        error = traceback.format_exc()
+        jobs = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+        if isinstance(exc, PermanentError) or job.attempts >= job.max_attempts:
+            logger.error('Job %s failed: %s', job, exc)
+            jobs.update(status=Job.FAILED, last_error=error, locked_at=None, updated_at=timezone.now())
+            job.status = Job.FAILED
+            job_failed.send(sender=job.task, job=job)
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning('Job %s failed, retrying in %ds: %s', job, delay, exc)
+            jobs.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+                locked_at=None,
+                updated_at=timezone.now(),
+            )
+        return False
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).delete()
+    return True
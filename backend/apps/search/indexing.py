@@ -0,0 +1,160 @@
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr
+
+from apps.companies.models import Company, Contact
+from apps.deals.models import Deal
+from apps.documents.models import Document, DocumentContent
+from apps.interactions.models import Interaction
+
+from .models import SearchEntry
+
+UPSERT_FIELDS = ['title', 'subtitle', 'body', 'deal_id', 'owner_id', 'author_id', 'updated_at']
+
+
+def _join(*parts):
+    return ' · '.join(part for part in parts if part)[:255]
+
+
+def company_entry(company):
+    return SearchEntry(
+        entity_type=SearchEntry.COMPANY,
+        object_id=company.pk,
+        title=company.name[:255],
+        subtitle=_join(company.sector, company.country),
+        body=f"{company.legal_id} {company.notes}".strip(),
+    )
+
+
+def contact_entry(contact):
+    return SearchEntry(
+        entity_type=SearchEntry.CONTACT,
+        object_id=contact.pk,
+        title=contact.full_name[:255],
+        subtitle=_join(contact.role, contact.company.name),
+        body=f"{contact.email} {contact.notes}".strip(),
+    )
+
+
+def deal_entry(deal):
+    return SearchEntry(
+        entity_type=SearchEntry.DEAL,
+        object_id=deal.pk,
+        title=deal.title[:255],
+        subtitle=deal.company.name[:255],
+        body=deal.description,
+        deal_id=deal.pk,
+        owner_id=deal.owner_id,
+    )
+
+
+def interaction_entry(interaction):
+    return SearchEntry(
+        entity_type=SearchEntry.INTERACTION,
+        object_id=interaction.pk,
+        title=interaction.subject[:255],
+        subtitle=interaction.get_type_display(),
+        body=interaction.body,
+        deal_id=interaction.deal_id,
+        owner_id=interaction.deal.owner_id if interaction.deal_id else None,
+        author_id=interaction.author_id,
+    )
+
+
+def document_text(document):
+    """Text extracted by document processing, '' until it is done"""
+    if document.status != Document.READY:
+        return ''
+    try:
+        return document.content.text
+    except DocumentContent.DoesNotExist:
+        return ''
+
+
+def document_entry(document):
+    return SearchEntry(
+        entity_type=SearchEntry.DOCUMENT,
+        object_id=document.pk,
+        title=document.filename[:255],
+        subtitle=document.deal.title[:255] if document.deal_id else '',
+        body=document_text(document),
+        deal_id=document.deal_id,
+        owner_id=document.deal.owner_id if document.deal_id else None,
+        author_id=document.uploaded_by_id,
+    )
+
+
+# model -> (entity type, entry builder, select_related needed by the builder)
+INDEXERS = {
+    Company: (SearchEntry.COMPANY, company_entry, []),
+    Contact: (SearchEntry.CONTACT, contact_entry, ['company']),
+    Deal: (SearchEntry.DEAL, deal_entry, ['company']),
+    Interaction: (SearchEntry.INTERACTION, interaction_entry, ['deal']),
+    Document: (SearchEntry.DOCUMENT, document_entry, ['deal', 'content']),
+}
+
+
+def upsert_entries(entries):
+    if entries:
+        SearchEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['entity_type', 'object_id'],
+            update_fields=UPSERT_FIELDS,
+        )
+
+
+def index_queryset(queryset, batch_size=1000):
+    """(Re)index every object of a queryset, one upsert per batch"""
+    _, build_entry, related = INDEXERS[queryset.model]
+    entries = []
+    count = 0
+    for obj in queryset.select_related(*related).order_by().iterator(chunk_size=batch_size):
+        entries.append(build_entry(obj))
+        if len(entries) >= batch_size:
+            upsert_entries(entries)
+            count += len(entries)
+            entries = []
+    upsert_entries(entries)
+    return count + len(entries)
+
+
+def index_instance(instance):
+    _, build_entry, _ = INDEXERS[type(instance)]
+    upsert_entries([build_entry(instance)])
+
+    # Propagate denormalized data to dependent entries
+    if isinstance(instance, Company):
+        index_queryset(instance.contacts.all())
+        index_queryset(instance.deals.all())
+    elif isinstance(instance, Deal):
+        children = SearchEntry.objects.filter(
+            deal_id=instance.pk,
+            entity_type__in=[SearchEntry.INTERACTION, SearchEntry.DOCUMENT],
+        )
+        children.update(owner_id=instance.owner_id)
+        children.filter(entity_type=SearchEntry.DOCUMENT).update(subtitle=instance.title[:255])
+
+
+def index_instances(model, instances):
+    """Set-based index_instance for a batch of objects of the same model"""
+    pks = [instance.pk for instance in instances]
+    index_queryset(model._default_manager.filter(pk__in=pks))
+
+    if model is Company:
+        index_queryset(Contact.objects.filter(company_id__in=pks))
+        index_queryset(Deal.objects.filter(company_id__in=pks))
+    elif model is Deal:
+        children = SearchEntry.objects.filter(
+            deal_id__in=pks,
+            entity_type__in=[SearchEntry.INTERACTION, SearchEntry.DOCUMENT],
+        )
+        deals = Deal.objects.filter(pk=OuterRef('deal_id'))
+        children.update(owner_id=Subquery(deals.values('owner_id')[:1]))
+        children.filter(entity_type=SearchEntry.DOCUMENT).update(
+            subtitle=Subquery(deals.annotate(short_title=Substr('title', 1, 255)).values('short_title')[:1])
+        )
+
+
+def remove_instance(instance):
+    entity_type, _, _ = INDEXERS[type(instance)]
+    SearchEntry.objects.filter(entity_type=entity_type, object_id=instance.pk).delete()
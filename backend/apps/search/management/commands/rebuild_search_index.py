@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.search.indexing import INDEXERS, index_queryset
+from apps.search.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the global search index from companies, contacts, deals, interactions and documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete all entries before indexing')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = SearchEntry.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} entries')
+
+        for model, (entity_type, _, _) in INDEXERS.items():
+            count = index_queryset(model._base_manager.all(), batch_size=options['batch_size'])
+            self.stdout.write(f'Indexed {count} {entity_type} entries')
+
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+from apps.core.search import search_vector_trigger
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        # pg_trgm extension
+        ("companies", "0003_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entity_type",
+                    models.CharField(
+                        choices=[
+                            ("company", "Company"),
+                            ("contact", "Contact"),
+                            ("deal", "Deal"),
+                            ("interaction", "Interaction"),
+                            ("document", "Document"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("title", models.CharField(max_length=255)),
+                ("subtitle", models.CharField(blank=True, max_length=255)),
+                ("body", models.TextField(blank=True)),
+                ("deal_id", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "owner_id",
+                    models.BigIntegerField(
+                        blank=True, help_text="Owner of the related deal", null=True
+                    ),
+                ),
+                (
+                    "author_id",
+                    models.BigIntegerField(
+                        blank=True,
+                        help_text="Interaction author or document uploader",
+                        null=True,
+                    ),
+                ),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "search entries",
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="search_entry_vector_idx"
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["title"],
+                        name="search_entry_title_trgm_idx",
+                        opclasses=["gin_trgm_ops"],
+                    ),
+                    models.Index(fields=["deal_id"], name="search_entry_deal_idx"),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="searchentry",
+            constraint=models.UniqueConstraint(
+                fields=("entity_type", "object_id"), name="search_entry_unique_object"
+            ),
+        ),
+        search_vector_trigger(
+            "search_searchentry", [("title", "A"), ("subtitle", "B"), ("body", "C")]
+        ),
+    ]
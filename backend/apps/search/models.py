@@ -0,0 +1,88 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchRank, SearchVectorField, TrigramSimilarity
+from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from apps.core.search import prefix_search_query, search_words
+
+
+class SearchEntryQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Same row filters as the viewsets' get_queryset for each entity type"""
+        if user.is_admin() or user.is_associate():
+            return self
+        if user.is_analyst():
+            return self.filter(
+                Q(entity_type__in=[SearchEntry.COMPANY, SearchEntry.CONTACT])
+                | Q(entity_type=SearchEntry.DEAL, owner_id=user.pk)
+                | Q(
+                    Q(owner_id=user.pk) | Q(author_id=user.pk) | Q(deal_id__isnull=True),
+                    entity_type__in=[SearchEntry.INTERACTION, SearchEntry.DOCUMENT],
+                )
+            )
+        return self.none()
+
+    def search(self, text):
+        """Prefix full-text match or fuzzy title match, best hits first"""
+        words = search_words([text])
+        if not words:
+            return self.none()
+        query = prefix_search_query(words)
+        return (
+            self.filter(Q(search_vector=query) | Q(title__trigram_similar=text))
+            .annotate(rank=(
+                Coalesce(SearchRank(F('search_vector'), query), Value(0.0))
+                + TrigramSimilarity('title', text)
+            ))
+            .order_by('-rank', 'title')
+        )
+
+
+class SearchEntry(models.Model):
+    """
+    Denormalized, cross-entity search row. Kept in sync by the signals in
+    apps.search.signals; search_vector is maintained by a database trigger.
+    """
+    COMPANY = 'company'
+    CONTACT = 'contact'
+    DEAL = 'deal'
+    INTERACTION = 'interaction'
+    DOCUMENT = 'document'
+    ENTITY_TYPE_CHOICES = [
+        (COMPANY, 'Company'),
+        (CONTACT, 'Contact'),
+        (DEAL, 'Deal'),
+        (INTERACTION, 'Interaction'),
+        (DOCUMENT, 'Document'),
+    ]
+
+    entity_type = models.CharField(max_length=20, choices=ENTITY_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+
+    # Row-level access data, see SearchEntryQuerySet.visible_to
+    deal_id = models.BigIntegerField(null=True, blank=True)
+    owner_id = models.BigIntegerField(null=True, blank=True, help_text="Owner of the related deal")
+    author_id = models.BigIntegerField(null=True, blank=True, help_text="Interaction author or document uploader")
+
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SearchEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'search entries'
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'object_id'], name='search_entry_unique_object'),
+        ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='search_entry_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='search_entry_title_trgm_idx'),
+            models.Index(fields=['deal_id'], name='search_entry_deal_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_entity_type_display()}: {self.title}"
@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+from .models import SearchEntry
+
+
+class SearchHitSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='entity_type', read_only=True)
+    id = serializers.IntegerField(source='object_id', read_only=True)
+    deal = serializers.IntegerField(source='deal_id', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SearchEntry
+        fields = ['type', 'id', 'title', 'subtitle', 'deal', 'rank']
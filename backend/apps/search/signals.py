@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+
+from apps.core.signals import bulk_saved
+
+from .indexing import INDEXERS, index_instance, index_instances, remove_instance
+
+
+def update_search_entry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instance(instance)
+
+
+def update_search_entries(sender, instances, **kwargs):
+    if sender in INDEXERS and instances:
+        index_instances(sender, instances)
+
+
+def delete_search_entry(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+for model in INDEXERS:
+    post_save.connect(update_search_entry, sender=model, dispatch_uid=f'search_index_{model._meta.label}')
+    post_delete.connect(delete_search_entry, sender=model, dispatch_uid=f'search_remove_{model._meta.label}')
+
+
+bulk_saved.connect(update_search_entries, dispatch_uid='search_index_bulk_saved')
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import SearchViewSet
+from apps.core.async_views import async_action_path
+
+router = DefaultRouter()
+router.register(r'search', SearchViewSet, basename='search')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
+
+if settings.ASYNC_API_VIEWS:
+    # Async versions of the read hot paths, matched before the router's
+    urlpatterns = [
+        async_action_path('search/', SearchViewSet, 'list', name='search-list'),
+    ] + urlpatterns
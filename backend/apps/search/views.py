@@ -0,0 +1,62 @@
+from rest_framework import viewsets, permissions, status
+from rest_framework.response import Response
+
+from .models import SearchEntry
+from .serializers import SearchHitSerializer
+
+
+class SearchViewSet(viewsets.GenericViewSet):
+    """
+    Global search across companies, contacts, deals, interactions and
+    documents, served by a single ranked query on the search index.
+
+    Query params:
+    - q: search text (required)
+    - type: comma separated entity types to restrict to
+    - limit: max number of hits (default 20, max 50)
+    """
+    serializer_class = SearchHitSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 20
+    max_limit = 50
+
+    def get_queryset(self):
+        return SearchEntry.objects.visible_to(self.request.user)
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_search_queryset(self, text):
+        queryset = self.get_queryset().search(text).only(
+            'entity_type', 'object_id', 'title', 'subtitle', 'deal_id'
+        )
+
+        types = self.request.query_params.get('type')
+        if types:
+            valid_types = dict(SearchEntry.ENTITY_TYPE_CHOICES)
+            requested = [t.strip() for t in types.split(',') if t.strip() in valid_types]
+            queryset = queryset.filter(entity_type__in=requested)
+
+        return queryset[:self.get_limit()]
+
+    def list(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(self.get_search_queryset(text), many=True)
+        return Response({'results': serializer.data})
+
+    async def alist(self, request):
+        """list with the async ORM (ASYNC_API_VIEWS)"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        hits = [hit async for hit in self.get_search_queryset(text)]
+        serializer = self.get_serializer(hits, many=True)
+        return Response({'results': serializer.data})
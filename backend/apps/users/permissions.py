@@ -43,7 +43,11 @@ class CanAccessDeal(permissions.BasePermission):
         
         if user.is_analyst():
             # Analyst can only access deals they own or are assigned to
-            return obj.owner == user
+            if obj._meta.label == 'deals.Deal':
+                return obj.owner_id == user.pk
+            # Tasks, interactions and NDAs: the view querysets already limit
+            # analysts to those of their deals (or assigned to / authored by them)
+            return True
         
         return False
 
@@ -62,6 +66,6 @@ class CanAccessDocument(permissions.BasePermission):
             return True
         
         if user.is_analyst():
-            return obj.deal and obj.deal.owner == user
+            return obj.deal is not None and obj.deal.owner_id == user.pk
         
         return False
\ No newline at end of file
@@ -1,10 +1,18 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet
+from apps.core.async_views import async_action_path
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_API_VIEWS:
+    # Async versions of the read hot paths, matched before the router's
+    urlpatterns = [
+        async_action_path('users/me/', UserViewSet, 'me', name='user-me'),
+    ] + urlpatterns
@@ -7,9 +7,12 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import User
 from .serializers import UserSerializer, UserCreateSerializer
 from .permissions import IsAdminOrReadOnly
+from apps.core.async_views import AsyncActionsMixin
+from apps.core.cache import cache_response
+from apps.core.conditional import ConditionalGetMixin
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(AsyncActionsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -24,7 +27,14 @@ class UserViewSet(viewsets.ModelViewSet):
         return UserSerializer
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    @cache_response(User)
     def me(self, request):
         """Get current user profile"""
         serializer = UserSerializer(request.user)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+    
+    @cache_response(User)
+    async def ame(self, request):
+        """me as a native async view (ASYNC_API_VIEWS), the user is loaded by authentication"""
+        serializer = UserSerializer(request.user)
+        return Response(serializer.data)
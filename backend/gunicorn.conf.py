@@ -0,0 +1,24 @@
+# Gunicorn settings: gunicorn -c gunicorn.conf.py ma_crm.asgi:application
+#
+# Uvicorn workers serve the ASGI application: requests waiting on the
+# database (async views, see ASYNC_API_VIEWS) or on slow clients do not
+# hold a worker. For the previous sync stack use
+# GUNICORN_WORKER_CLASS=sync with ma_crm.wsgi:application.
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+# Only used by the sync / gthread worker classes
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then (memory growth), not all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
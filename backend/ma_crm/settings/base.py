@@ -22,6 +22,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -32,16 +33,20 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'apps.core',
     'apps.users',
     'apps.companies',
     'apps.deals',
     'apps.interactions',
+    'apps.jobs',
     'apps.documents',
+    'apps.search',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.core.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,9 +86,63 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='ma_crm_password'),
         'HOST': config('DB_HOST', default='db'),
         'PORT': config('DB_PORT', default='5432'),
+        # Persistent connections, reused by a worker thread for up to
+        # DB_CONN_MAX_AGE seconds and checked before reuse. Under ASGI every
+        # request runs in a new thread: set DB_CONN_MAX_AGE=0 there and pool
+        # with PgBouncer instead (DB_PGBOUNCER, see docker-compose.prod.yml)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # PgBouncer in transaction pooling mode cannot keep the named cursors
+        # of QuerySet.iterator() open across transactions
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
     }
 }
 
+# Read replica: safe-method API requests read from it when DB_REPLICA_HOST
+# is set (see apps.core.db.PrimaryReplicaRouter), clients that just wrote
+# are pinned to the primary for DB_REPLICA_PIN_SECONDS
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=10, cast=int)
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['apps.core.db.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(2, 'apps.core.middleware.ReplicaRoutingMiddleware')
+
+# Cache
+# Local memory by default (per process, fine for development and tests),
+# Redis when REDIS_URL is set
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# API response cache (apps.core.cache.cache_response)
+API_CACHE_ENABLED = config('API_CACHE_ENABLED', default=True, cast=bool)
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = config('API_CACHE_TIMEOUT', default=300, cast=int)
+
+# Serve the hottest read endpoints (kanban, my_tasks, users/me, search) with
+# native async views (apps.core.async_views); enable when running ma_crm.asgi
+ASYNC_API_VIEWS = config('ASYNC_API_VIEWS', default=False, cast=bool)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,6 +173,38 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Chunked document uploads (/api/v1/document-uploads/): chunks are staged in
+# DOCUMENT_UPLOAD_DIR (local disk shared by the workers) until the upload is
+# completed and streamed to the storage backend. A chunk must fit in the
+# proxy's request body limit (client_max_body_size in infra/nginx/nginx.conf)
+DOCUMENT_UPLOAD_DIR = config('DOCUMENT_UPLOAD_DIR', default=str(BASE_DIR / 'uploads'))
+DOCUMENT_UPLOAD_MAX_SIZE = config('DOCUMENT_UPLOAD_MAX_SIZE', default=2 * 1024 ** 3 - 1, cast=int)
+DOCUMENT_UPLOAD_MAX_CHUNK_SIZE = config('DOCUMENT_UPLOAD_MAX_CHUNK_SIZE', default=16 * 1024 ** 2, cast=int)
+
+# Document downloads (and direct uploads to object storage) go through
+# short-lived URLs: presigned on S3 / MinIO, signed links to
+# /api/v1/documents/<id>/file/ on local storage. Behind nginx, set
+# DOCUMENT_X_ACCEL_REDIRECT to the internal location serving MEDIA_ROOT
+# (infra/nginx/nginx.conf) so that workers never stream the files
+DOCUMENT_URL_EXPIRE = config('DOCUMENT_URL_EXPIRE', default=900, cast=int)
+DOCUMENT_X_ACCEL_REDIRECT = config('DOCUMENT_X_ACCEL_REDIRECT', default='')
+
+# Document processing (apps.documents.processing), run by the job workers:
+# extracted text is capped at DOCUMENT_TEXT_MAX_LENGTH characters (it is
+# indexed by search), thumbnails fit in DOCUMENT_THUMBNAIL_SIZE pixels
+DOCUMENT_TEXT_MAX_LENGTH = config('DOCUMENT_TEXT_MAX_LENGTH', default=100_000, cast=int)
+DOCUMENT_THUMBNAIL_SIZE = config('DOCUMENT_THUMBNAIL_SIZE', default=320, cast=int)
+
+# Background jobs (apps.jobs), run by `manage.py run_jobs` workers. Failed
+# jobs are retried JOBS_MAX_ATTEMPTS times, after an exponential backoff
+# from JOBS_RETRY_BASE_DELAY up to JOBS_RETRY_MAX_DELAY seconds; a job still
+# running after JOBS_LOCK_TIMEOUT seconds is assumed lost with its worker
+JOBS_POLL_INTERVAL = config('JOBS_POLL_INTERVAL', default=2, cast=float)
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=5, cast=int)
+JOBS_RETRY_BASE_DELAY = config('JOBS_RETRY_BASE_DELAY', default=30, cast=int)
+JOBS_RETRY_MAX_DELAY = config('JOBS_RETRY_MAX_DELAY', default=3600, cast=int)
+JOBS_LOCK_TIMEOUT = config('JOBS_LOCK_TIMEOUT', default=900, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -137,6 +228,16 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Request metrics (see apps.core.metrics): SQL count and time, rendering time
+# and latency per view. A METRICS_SAMPLE_RATE share of the requests is added
+# to the counters scraped from /metrics (with Authorization: Bearer
+# METRICS_TOKEN). METRICS_SERVER_TIMING instruments every request and sends
+# its figures to the client in a Server-Timing header: off by default, on in
+# development (dev.py)
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=0.1, cast=float)
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(seconds=config('JWT_ACCESS_TOKEN_LIFETIME', default=3600, cast=int)),
@@ -165,6 +266,8 @@ if STORAGE_TYPE == 'minio':
     AWS_SECRET_ACCESS_KEY = config('MINIO_SECRET_KEY', default='password123')
     AWS_STORAGE_BUCKET_NAME = config('MINIO_BUCKET_NAME', default='ma-crm-documents')
     AWS_S3_ENDPOINT_URL = f"http://{config('MINIO_ENDPOINT', default='localhost:9000')}"
+    # MinIO as reached by the browsers, in the presigned URLs
+    AWS_S3_PRESIGN_ENDPOINT_URL = f"http://{config('MINIO_PUBLIC_ENDPOINT', default='localhost:9000')}"
     AWS_S3_USE_SSL = config('MINIO_SECURE', default=False, cast=bool)
     AWS_S3_SIGNATURE_VERSION = 's3v4'
     AWS_S3_FILE_OVERWRITE = False
@@ -4,8 +4,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from apps.core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/v1/', include('apps.companies.urls')),
@@ -13,6 +16,7 @@ urlpatterns = [
     path('api/v1/', include('apps.interactions.urls')),
     path('api/v1/', include('apps.documents.urls')),
     path('api/v1/', include('apps.users.urls')),
+    path('api/v1/', include('apps.search.urls')),
 ]
 
 if settings.DEBUG: